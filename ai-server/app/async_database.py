@@ -0,0 +1,177 @@
+import time
+import weakref
+from typing import List, Dict, Any, Optional
+
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
+
+from app import vector_index
+from app.database import (
+    DB_CONFIG,
+    DB_POOL_MIN,
+    DB_POOL_MAX,
+    DB_POOL_TIMEOUT,
+    DB_POOL_STALE_SECONDS,
+    SEARCH_CASES_BY_ID_SQL,
+    SEARCH_CASES_BY_TEXT_SQL,
+    SEARCH_LAWS_BY_ID_SQL,
+    SEARCH_LAWS_BY_TEXT_SQL,
+    STORED_EMBEDDING_SQL,
+    ROUTING_RANK_SQL,
+    REFERENCE_ANSWER_SQL,
+    INSERT_CHAT_LOG_SQL,
+    SELECT_CHAT_LOGS_SQL,
+    _parse_results,
+    _extract_related_case,
+    _reference_answer_from_row,
+    _batch_search_query,
+    _parse_batch_results,
+)
+
+# app/database.py의 asyncio 버전입니다.
+# 동기 psycopg2 호출은 벡터 검색이 끝날 때까지 uvicorn 이벤트 루프를 멈추게 하므로
+# async 엔드포인트에서는 이 모듈(psycopg 3 + AsyncConnectionPool)을 사용합니다.
+
+# 연결 객체를 키로 약하게 참조 → 풀이 닫아 버린 연결(max_lifetime, 오류 등)은 자동으로 빠짐
+_last_used: "weakref.WeakKeyDictionary[Any, float]" = weakref.WeakKeyDictionary()
+
+
+# 새로 만든 연결은 지금 막 연결된 것이므로 사용 시각을 지금으로 기록
+async def _mark_created(conn):
+    _last_used[conn] = time.monotonic()
+
+
+# 반납된 연결의 마지막 사용 시각 기록
+async def _mark_returned(conn):
+    _last_used[conn] = time.monotonic()
+
+
+# 오래 놀던 연결만 체크아웃 전에 점검 (동기 풀과 동일한 정책)
+async def _check_stale(conn):
+    now = time.monotonic()
+    idle_for = now - _last_used.setdefault(conn, now)
+    if idle_for >= DB_POOL_STALE_SECONDS:
+        await conn.execute("SELECT 1")
+
+
+async_pool = AsyncConnectionPool(
+    conninfo=make_conninfo(**DB_CONFIG, client_encoding='UTF8'),
+    min_size=DB_POOL_MIN,
+    max_size=DB_POOL_MAX,
+    timeout=DB_POOL_TIMEOUT,
+    configure=_mark_created,
+    check=_check_stale,
+    reset=_mark_returned,
+    open=False,
+)
+
+
+# FastAPI 시작/종료 시 호출
+async def init_pool():
+    await async_pool.open(wait=False)
+    print(f"[*] Async DB 커넥션 풀 생성 (min={DB_POOL_MIN}, max={DB_POOL_MAX})")
+
+
+async def close_pool():
+    await async_pool.close()
+    _last_used.clear()
+    print("[*] Async DB 커넥션 풀 종료")
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    return async_pool.get_stats()
+
+
+# 조회 쿼리 실행 (연결을 얻지 못하면 None)
+# search_limit을 주면 같은 트랜잭션에서 목표 재현율에 맞는 ANN 검색 파라미터를 먼저 설정
+async def _fetchall(sql: str, params: tuple, search_limit: Optional[int] = None) -> Optional[List[tuple]]:
+    try:
+        async with async_pool.connection() as conn:
+            async with conn.cursor() as cur:
+                if search_limit is not None:
+                    await cur.execute(vector_index.SET_SEARCH_PARAMS_SQL, vector_index.search_params_args(search_limit))
+                await cur.execute(sql, params)
+                return await cur.fetchall()
+    except Exception as e:
+        print(f" DB 조회 실패: {e}")
+        return None
+
+
+# 특정 민원 ID를 기준으로 유사한 과거 사례를 검색
+async def search_cases_by_id(complaint_id: int, limit: int = 3) -> List[Dict]:
+    rows = await _fetchall(SEARCH_CASES_BY_ID_SQL, (complaint_id, complaint_id, limit), search_limit=limit)
+    return _parse_results(rows or [], type="case")
+
+
+# 문맥 유사도로 찾기
+async def search_cases_by_text(embedding_vector: List[float], limit: int = 3) -> List[Dict]:
+    rows = await _fetchall(SEARCH_CASES_BY_TEXT_SQL, (embedding_vector, limit), search_limit=limit)
+    return _parse_results(rows or [], type="case")
+
+
+# 민원 id 기준 법령 검색
+async def search_laws_by_id(complaint_id: int, limit: int = 3) -> List[Dict]:
+    rows = await _fetchall(SEARCH_LAWS_BY_ID_SQL, (complaint_id, limit), search_limit=limit)
+    return _parse_results(rows or [], type="law")
+
+
+# 텍스트 임베딩 기준 법령 검색
+async def search_laws_by_text(embedding_vector: List[float], limit: int = 3, keyword: str = None) -> List[Dict]:
+    rows = await _fetchall(SEARCH_LAWS_BY_TEXT_SQL, (embedding_vector, limit), search_limit=limit)
+    return _parse_results(rows or [], type="law")
+
+
+# 민원에 저장된 정규화 임베딩 조회 (없거나, 다른 모델로 만들었거나, 차원이 다르면 None)
+async def get_stored_embedding(complaint_id: int, dimensions: int, model: str) -> Optional[List[float]]:
+    rows = await _fetchall(STORED_EMBEDDING_SQL, (complaint_id,))
+    if not rows:
+        return None
+    embedding, stored_dims, stored_model = rows[0]
+    if stored_model != model:
+        print(f"⚠️ [DB] 민원 {complaint_id}의 저장된 임베딩 모델({stored_model})이 {model}이 아니어서 재사용하지 않습니다.")
+        return None
+    if stored_dims != dimensions:
+        print(f"⚠️ [DB] 민원 {complaint_id}의 저장된 임베딩 차원({stored_dims})이 {dimensions}과 달라 재사용하지 않습니다.")
+        return None
+    return list(embedding)
+
+
+# 여러 민원 ID(또는 벡터)에 대한 법령/유사 사례 top-k를 한 번의 쿼리로 검색
+async def search_batch(complaint_ids: Optional[List[int]] = None, vectors: Optional[List[List[float]]] = None,
+                       limit: int = 3) -> List[Dict[str, Any]]:
+    sql, params, keys = _batch_search_query(complaint_ids, vectors, limit)
+    if not keys:
+        return []
+    rows = await _fetchall(sql, params, search_limit=limit)
+    return _parse_batch_results(rows or [], keys)
+
+
+# AI 분석 결과에서 연관 민원 추출, 해당 민원과 일치하는 과거 민원을 반환
+async def get_reference_answer(complaint_id: int) -> Optional[str]:
+    try:
+        async with async_pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(ROUTING_RANK_SQL, (complaint_id,))
+                target_core_request = _extract_related_case(complaint_id, await cur.fetchone())
+                if not target_core_request:
+                    return None
+                await cur.execute(REFERENCE_ANSWER_SQL, (target_core_request, complaint_id))
+                return _reference_answer_from_row(await cur.fetchone())
+    except Exception as e:
+        print(f"❌ [DB] 과거 답변 조회 실패: {e}")
+        return None
+
+
+# 민원인과의 채팅 로그 저장
+async def save_chat_log(complaint_id: int, role: str, message: str):
+    try:
+        async with async_pool.connection() as conn:
+            await conn.execute(INSERT_CHAT_LOG_SQL, (complaint_id, role, message))
+    except Exception as e:
+        print(f"❌ 채팅 로그 저장 실패: {e}")
+
+
+# 과거 채팅 기록 조회
+async def get_chat_logs(complaint_id: int) -> List[Dict]:
+    rows = await _fetchall(SELECT_CHAT_LOGS_SQL, (complaint_id,))
+    return [{"role": row[0], "content": row[1]} for row in rows or []]
@@ -1,9 +1,16 @@
 from fastapi import FastAPI
 import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
 from psycopg2.extras import Json
+import json
 import os
+import threading
+import time
+from collections import deque
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
+from app import vector_index
 
 load_dotenv()
 
@@ -17,18 +24,235 @@ DB_CONFIG = {
     "port": int(os.getenv("DB_PORT", 5432))
 }
 
-# db 연결
+# 커넥션 풀 설정
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5))              # 빈 연결을 기다리는 최대 시간(초)
+DB_POOL_STALE_SECONDS = float(os.getenv("DB_POOL_STALE_SECONDS", 30))  # 이 시간 이상 놀던 연결은 재사용 전 점검
+
+
+class ConnectionPool:
+    """
+    psycopg2 ThreadedConnectionPool에 대기열, 오래된 연결 점검, 지표 수집을 더한 풀.
+    ThreadedConnectionPool은 연결이 모두 사용 중이면 바로 예외를 던지므로
+    세마포어로 최대 연결 수만큼만 체크아웃을 허용하고 나머지는 대기시킵니다.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float, stale_seconds: float, **conn_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.stale_seconds = stale_seconds
+        self.conn_kwargs = conn_kwargs
+
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used: Dict[int, float] = {}
+
+        # 지표
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._latencies = deque(maxlen=1000)
+
+    def open(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = pg_pool.ThreadedConnectionPool(self.minconn, self.maxconn, **self.conn_kwargs)
+                print(f"[*] DB 커넥션 풀 생성 (min={self.minconn}, max={self.maxconn})")
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._last_used.clear()
+                print("[*] DB 커넥션 풀 종료")
+
+    @property
+    def is_open(self) -> bool:
+        return self._pool is not None
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            # 처음 보는 연결은 풀이 방금 만든 것이므로 점검하지 않음
+            last_used = self._last_used.setdefault(id(conn), now)
+        idle_for = now - last_used
+        if idle_for < self.stale_seconds:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _release(self, conn, discard: bool = False):
+        pool = self._pool
+        if pool is None:
+            # 풀이 이미 닫혔으면 (closeall이 연결도 닫았음) 반납할 곳이 없음
+            return
+        if not discard and not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        discard = discard or bool(conn.closed)
+        with self._lock:
+            if discard:
+                self._last_used.pop(id(conn), None)
+                self._discarded += 1
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+        pool.putconn(conn, close=discard)
+
+    def getconn(self):
+        """연결 하나를 체크아웃합니다. 반드시 putconn으로 반납해야 합니다."""
+        if not self.is_open:
+            self.open()
+
+        started = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            with self._lock:
+                self._timeouts += 1
+            raise pg_pool.PoolError(f"{self.timeout}초 안에 사용 가능한 DB 연결을 얻지 못했습니다.")
+
+        try:
+            conn = self._pool.getconn()
+            while not self._is_healthy(conn):
+                self._release(conn, discard=True)
+                conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._latencies.append(time.monotonic() - started)
+        return conn
+
+    def putconn(self, conn, discard: bool = False):
+        try:
+            self._release(conn, discard=discard)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            in_use = self._in_use
+            waiting = self._waiting
+            checkouts = self._checkouts
+            timeouts = self._timeouts
+            discarded = self._discarded
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            idx = min(len(latencies) - 1, int(round(p * (len(latencies) - 1))))
+            return round(latencies[idx] * 1000, 3)
+
+        return {
+            "open": self.is_open,
+            "max_size": self.maxconn,
+            "in_use": in_use,
+            "waiting": waiting,
+            "checkouts": checkouts,
+            "timeouts": timeouts,
+            "discarded": discarded,
+            "checkout_ms_avg": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            "checkout_ms_p50": percentile(0.50),
+            "checkout_ms_p99": percentile(0.99),
+            "checkout_ms_max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        }
+
+
+db_pool = ConnectionPool(
+    DB_POOL_MIN,
+    DB_POOL_MAX,
+    timeout=DB_POOL_TIMEOUT,
+    stale_seconds=DB_POOL_STALE_SECONDS,
+    client_encoding='UTF8',
+    **DB_CONFIG
+)
+
+
+# FastAPI 시작/종료 시 호출 (DB가 아직 없으면 첫 요청 때 다시 시도)
+def init_pool():
+    try:
+        db_pool.open()
+    except Exception as e:
+        print(f" DB 커넥션 풀 생성 실패: {e}")
+
+
+def close_pool():
+    db_pool.close()
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    return db_pool.stats()
+
+
+# db 연결 (풀에서 체크아웃, 사용 후 release_db_connection으로 반납)
 def get_db_connection():
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        return conn
+        return db_pool.getconn()
     except Exception as e:
         print(f" DB 연결 실패: {e}")
         return None
 
+
+def release_db_connection(conn, discard: bool = False):
+    db_pool.putconn(conn, discard=discard)
+
+
+# complaint_normalizations.embedding_model 열이 없으면 추가
+# ALTER TABLE은 테이블 전체 잠금을 잡으므로 열이 이미 있으면 실행하지 않음
+def ensure_embedding_model_column(default_model: str):
+    conn = db_pool.getconn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(EMBEDDING_MODEL_COLUMN_EXISTS_SQL)
+            row = cur.fetchone()
+            if row is None:
+                print("[*] complaint_normalizations.embedding_model 열 추가")
+                cur.execute(ADD_EMBEDDING_MODEL_COLUMN_SQL)
+            if row is None or row[0] is None:
+                print(f"[*] complaint_normalizations.embedding_model 기본값 설정: {default_model}")
+                cur.execute(SET_EMBEDDING_MODEL_DEFAULT_SQL, (default_model,))
+        conn.commit()
+    finally:
+        release_db_connection(conn)
+
+
+# 서버 시작 시 백그라운드에서 호출 (실패해도 서버는 계속 동작, 저장 벡터는 재사용하지 않음)
+def ensure_embedding_model_column_safely(default_model: str):
+    try:
+        ensure_embedding_model_column(default_model)
+    except Exception as e:
+        print(f"⚠️ embedding_model 열 확인/추가 실패: {e}")
+
+
 # 원본 내용 저장
 def save_complaint(title, body, district=None, address_text=None):
-    conn = psycopg2.connect(**DB_CONFIG, client_encoding='UTF8')
+    conn = db_pool.getconn()
     cur = conn.cursor()
     
     try:
@@ -48,12 +272,12 @@ def save_complaint(title, body, district=None, address_text=None):
         raise e
     finally:
         cur.close()
-        conn.close()
+        release_db_connection(conn)
 
 
 # 임베딩 벡터 저장
 def save_normalization(complaint_id, analysis, embedding):
-    conn = psycopg2.connect(**DB_CONFIG, client_encoding='UTF8')
+    conn = db_pool.getconn()
     cur = conn.cursor()
     
     try:
@@ -90,7 +314,155 @@ def save_normalization(complaint_id, analysis, embedding):
         raise e
     finally:
         cur.close()
-        conn.close()
+        release_db_connection(conn)
+
+
+# 검색/조회 쿼리 (동기 모듈과 async_database 모듈이 함께 사용)
+# 벡터 검색은 인덱스를 탈 수 있도록 정규화/법령 테이블만으로 top-k를 먼저 뽑은 뒤 조인합니다.
+# (ORDER BY <=> ... LIMIT 이 조인 바깥에 있으면 플래너가 순차 스캔을 고를 수 있음)
+SEARCH_CASES_BY_ID_SQL = """
+    SELECT c.id, c.body, c.answer, nn.neutral_summary, nn.distance
+    FROM (
+        SELECT 
+            cn.complaint_id, cn.neutral_summary,
+            (cn.embedding <=> (
+                SELECT embedding FROM complaint_normalizations 
+                WHERE complaint_id = %s AND is_current = true LIMIT 1
+            )) as distance
+        FROM complaint_normalizations cn
+        WHERE cn.complaint_id != %s
+          AND cn.is_current = true
+        ORDER BY distance ASC
+        LIMIT %s
+    ) nn
+    JOIN complaints c ON nn.complaint_id = c.id
+    ORDER BY nn.distance ASC;
+"""
+
+SEARCH_CASES_BY_TEXT_SQL = """
+    SELECT c.id, c.body, c.answer, nn.neutral_summary, nn.distance
+    FROM (
+        SELECT 
+            cn.complaint_id, cn.neutral_summary, 
+            (cn.embedding <=> %s::vector) as distance
+        FROM complaint_normalizations cn
+        WHERE cn.is_current = true
+        ORDER BY distance ASC
+        LIMIT %s
+    ) nn
+    JOIN complaints c ON nn.complaint_id = c.id
+    ORDER BY nn.distance ASC;
+"""
+
+SEARCH_LAWS_BY_ID_SQL = """
+    SELECT d.title, nn.article_no, nn.chunk_text, nn.distance
+    FROM (
+        SELECT 
+            lc.document_id, lc.article_no, lc.chunk_text,
+            (lc.embedding <=> (
+                SELECT embedding FROM complaint_normalizations 
+                WHERE complaint_id = %s AND is_current = true LIMIT 1
+            )) as distance
+        FROM law_chunks lc
+        ORDER BY distance ASC
+        LIMIT %s
+    ) nn
+    JOIN law_documents d ON nn.document_id = d.id
+    ORDER BY nn.distance ASC;
+"""
+
+SEARCH_LAWS_BY_TEXT_SQL = """
+    SELECT d.title, nn.article_no, nn.chunk_text, nn.distance
+    FROM (
+        SELECT lc.document_id, lc.article_no, lc.chunk_text, (lc.embedding <=> %s::vector) as distance
+        FROM law_chunks lc
+        ORDER BY distance ASC
+        LIMIT %s
+    ) nn
+    JOIN law_documents d ON nn.document_id = d.id
+    ORDER BY nn.distance ASC;
+"""
+
+# 여러 질의(민원 ID 또는 벡터)의 법령/사례 top-k를 한 번에 조회
+# queries CTE(query_key, exclude_id, embedding)만 바꿔 끼워 사용합니다.
+BATCH_QUERIES_BY_ID_CTE = """
+    SELECT DISTINCT ON (q.complaint_id)
+        q.complaint_id AS query_key, q.complaint_id AS exclude_id, cn.embedding
+    FROM unnest(%(complaint_ids)s::bigint[]) AS q(complaint_id)
+    JOIN complaint_normalizations cn
+      ON cn.complaint_id = q.complaint_id AND cn.is_current = true
+    ORDER BY q.complaint_id
+"""
+
+BATCH_QUERIES_BY_VECTOR_CTE = """
+    SELECT q.ord - 1 AS query_key, NULL::bigint AS exclude_id, q.vec::vector AS embedding
+    FROM unnest(%(vectors)s::text[]) WITH ORDINALITY AS q(vec, ord)
+"""
+
+BATCH_SEARCH_SQL = """
+    WITH queries AS ({queries})
+    SELECT q.query_key, 'law' AS kind,
+           jsonb_build_object('title', d.title, 'section', nn.article_no, 'content', nn.chunk_text),
+           nn.distance
+    FROM queries q
+    CROSS JOIN LATERAL (
+        SELECT lc.document_id, lc.article_no, lc.chunk_text, (lc.embedding <=> q.embedding) as distance
+        FROM law_chunks lc
+        ORDER BY distance ASC
+        LIMIT %(law_limit)s
+    ) nn
+    JOIN law_documents d ON nn.document_id = d.id
+    UNION ALL
+    SELECT q.query_key, 'case' AS kind,
+           jsonb_build_object('id', c.id, 'body', c.body, 'answer', c.answer, 'summary', nn.neutral_summary),
+           nn.distance
+    FROM queries q
+    CROSS JOIN LATERAL (
+        SELECT cn.complaint_id, cn.neutral_summary, (cn.embedding <=> q.embedding) as distance
+        FROM complaint_normalizations cn
+        WHERE cn.is_current = true
+          AND cn.complaint_id IS DISTINCT FROM q.exclude_id
+        ORDER BY distance ASC
+        LIMIT %(case_limit)s
+    ) nn
+    JOIN complaints c ON nn.complaint_id = c.id
+    ORDER BY 1, 2, 4;
+"""
+
+BATCH_SEARCH_MAX = int(os.getenv("BATCH_SEARCH_MAX", 500))
+
+# 정규화 단계에서 저장된 현재 임베딩과 차원 수, 만든 모델
+STORED_EMBEDDING_SQL = """
+    SELECT embedding::real[], vector_dims(embedding), embedding_model
+    FROM complaint_normalizations
+    WHERE complaint_id = %s AND is_current = true AND embedding IS NOT NULL
+    LIMIT 1
+"""
+
+# 행마다 임베딩을 만든 모델 기록 (기존 행은 알 수 없으므로 NULL, 이후 기본값 없이 들어오는 행은 전처리 API 모델)
+EMBEDDING_MODEL_COLUMN_EXISTS_SQL = """
+    SELECT column_default FROM information_schema.columns
+    WHERE table_name = 'complaint_normalizations' AND column_name = 'embedding_model'
+"""
+ADD_EMBEDDING_MODEL_COLUMN_SQL = "ALTER TABLE complaint_normalizations ADD COLUMN IF NOT EXISTS embedding_model TEXT"
+SET_EMBEDDING_MODEL_DEFAULT_SQL = "ALTER TABLE complaint_normalizations ALTER COLUMN embedding_model SET DEFAULT %s"
+
+ROUTING_RANK_SQL = "SELECT routing_rank FROM complaint_normalizations WHERE complaint_id = %s"
+
+REFERENCE_ANSWER_SQL = """
+    SELECT c.answer
+    FROM complaint_normalizations cn
+    JOIN complaints c ON cn.complaint_id = c.id
+    WHERE cn.core_request = %s
+      AND c.id != %s
+      AND c.answer IS NOT NULL
+      AND c.answer != ''
+    LIMIT 1
+"""
+
+INSERT_CHAT_LOG_SQL = "INSERT INTO complaint_chat_logs (complaint_id, role, message) VALUES (%s, %s, %s)"
+
+SELECT_CHAT_LOGS_SQL = "SELECT role, message FROM complaint_chat_logs WHERE complaint_id = %s ORDER BY id ASC"
 
 
 # 특정 민원 ID를 기준으로 유사한 과거 사례를 검색
@@ -100,26 +472,12 @@ def search_cases_by_id(complaint_id: int, limit: int = 3) -> List[Dict]:
     cur = conn.cursor()
     
     try:
-        query = """
-        WITH current_vec AS (
-            SELECT embedding FROM complaint_normalizations 
-            WHERE complaint_id = %s AND is_current = true LIMIT 1
-        )
-        SELECT 
-            c.id, c.body, c.answer, cn.neutral_summary,
-            (cn.embedding <=> (SELECT embedding FROM current_vec)) as distance
-        FROM complaint_normalizations cn
-        JOIN complaints c ON cn.complaint_id = c.id
-        WHERE cn.complaint_id != %s
-          AND cn.is_current = true
-        ORDER BY distance ASC
-        LIMIT %s;
-        """
-        cur.execute(query, (complaint_id, complaint_id, limit))
+        cur.execute(vector_index.SET_SEARCH_PARAMS_SQL, vector_index.search_params_args(limit))
+        cur.execute(SEARCH_CASES_BY_ID_SQL, (complaint_id, complaint_id, limit))
         return _parse_results(cur.fetchall(), type="case")
     finally:
         cur.close()
-        conn.close()
+        release_db_connection(conn)
 
 # 문맥 유사도로 찾기
 def search_cases_by_text(embedding_vector: List[float], limit: int = 3) -> List[Dict]:
@@ -128,21 +486,12 @@ def search_cases_by_text(embedding_vector: List[float], limit: int = 3) -> List[
     cur = conn.cursor()
     
     try:
-        query = """
-        SELECT 
-            c.id, c.body, c.answer, cn.neutral_summary, 
-            (cn.embedding <=> %s::vector) as distance
-        FROM complaint_normalizations cn
-        JOIN complaints c ON cn.complaint_id = c.id
-        WHERE cn.is_current = true
-        ORDER BY distance ASC
-        LIMIT %s;
-        """
-        cur.execute(query, (embedding_vector, limit))
+        cur.execute(vector_index.SET_SEARCH_PARAMS_SQL, vector_index.search_params_args(limit))
+        cur.execute(SEARCH_CASES_BY_TEXT_SQL, (embedding_vector, limit))
         return _parse_results(cur.fetchall(), type="case")
     finally:
         cur.close()
-        conn.close()
+        release_db_connection(conn)
 
 # 민원 id 기준 법령 검색
 def search_laws_by_id(complaint_id: int, limit: int = 3) -> List[Dict]:
@@ -151,24 +500,12 @@ def search_laws_by_id(complaint_id: int, limit: int = 3) -> List[Dict]:
     cur = conn.cursor()
     
     try:
-        query = """
-        WITH current_vec AS (
-            SELECT embedding FROM complaint_normalizations 
-            WHERE complaint_id = %s AND is_current = true LIMIT 1
-        )
-        SELECT 
-            d.title, lc.article_no, lc.chunk_text,
-            (lc.embedding <=> (SELECT embedding FROM current_vec)) as distance
-        FROM law_chunks lc
-        JOIN law_documents d ON lc.document_id = d.id
-        ORDER BY distance ASC
-        LIMIT %s;
-        """
-        cur.execute(query, (complaint_id, limit))
+        cur.execute(vector_index.SET_SEARCH_PARAMS_SQL, vector_index.search_params_args(limit))
+        cur.execute(SEARCH_LAWS_BY_ID_SQL, (complaint_id, limit))
         return _parse_results(cur.fetchall(), type="law")
     finally:
         cur.close()
-        conn.close()
+        release_db_connection(conn)
 
 # 텍스트 임베딩 기준 법령 검색
 def search_laws_by_text(embedding_vector: List[float], limit: int = 3, keyword: str = None) -> List[Dict]:
@@ -177,19 +514,13 @@ def search_laws_by_text(embedding_vector: List[float], limit: int = 3, keyword:
     cur = conn.cursor()
 
     try:
-        query = """
-        SELECT d.title, lc.article_no, lc.chunk_text, (lc.embedding <=> %s::vector) as distance
-        FROM law_chunks lc
-        JOIN law_documents d ON lc.document_id = d.id
-        ORDER BY distance ASC
-        LIMIT %s;
-        """
-        cur.execute(query, (embedding_vector, limit))
+        cur.execute(vector_index.SET_SEARCH_PARAMS_SQL, vector_index.search_params_args(limit))
+        cur.execute(SEARCH_LAWS_BY_TEXT_SQL, (embedding_vector, limit))
 
         return _parse_results(cur.fetchall(), type="law")
     finally:
         cur.close()
-        conn.close()
+        release_db_connection(conn)
 
 # 코사인 거리를 백분율 유사도로 변환
 def _cosine_distance_to_percent(distance: float) -> float:
@@ -227,6 +558,34 @@ def _parse_results(rows: List[tuple], type: str = "case") -> List[Dict[str, Any]
             })
     return results
 
+# routing_rank(JSON)에서 연관 민원(related_case) 추출
+def _extract_related_case(complaint_id: int, row) -> Optional[str]:
+    if not row or not row[0]:
+        print(f"❌ [DB] 민원 {complaint_id}의 routing_rank가 없습니다.")
+        return None
+    # JSON 파싱
+    routing_data = row[0]
+    if isinstance(routing_data, str):
+        routing_data = json.loads(routing_data)
+    # 연관 민원 추출
+    target_core_request = None
+    if isinstance(routing_data, list) and len(routing_data) > 0:
+        target_core_request = routing_data[0].get("related_case")
+    elif isinstance(routing_data, dict):
+        target_core_request = routing_data.get("related_case")
+    if not target_core_request:
+        print(f"⚠️ [DB] routing_rank에서 related_case를 찾을 수 없습니다.")
+        return None
+    print(f"🔎 [DB] 참고할 과거 민원 키워드: {target_core_request}")
+    return target_core_request
+
+def _reference_answer_from_row(ref_row) -> Optional[str]:
+    if ref_row:
+        print("✅ [DB] 유사한 과거 답변을 찾았습니다.")
+        return ref_row[0]
+    print("⚠️ [DB] 키워드는 찾았으나, 답변이 달린 과거 사례가 없습니다.")
+    return None
+
 # AI 분석 결과에서 연관 민원 추출, 해당 민원과 일치하는 과거 민원을 반환
 def get_reference_answer(complaint_id: int) -> Optional[str]:
     conn = get_db_connection()
@@ -235,51 +594,72 @@ def get_reference_answer(complaint_id: int) -> Optional[str]:
     try:
         with conn.cursor() as cur:
             # 현재 민원의 routing_rank 조회
-            cur.execute(
-                "SELECT routing_rank FROM complaint_normalizations WHERE complaint_id = %s",
-                (complaint_id,)
-            )
+            cur.execute(ROUTING_RANK_SQL, (complaint_id,))
             row = cur.fetchone()
-            if not row or not row[0]:
-                print(f"❌ [DB] 민원 {complaint_id}의 routing_rank가 없습니다.")
-                return None
-            # JSON 파싱
-            routing_data = row[0]
-            if isinstance(routing_data, str):
-                import json
-                routing_data = json.loads(routing_data)
-            # 연관 민원 추출
-            target_core_request = None
-            if isinstance(routing_data, list) and len(routing_data) > 0:
-                target_core_request = routing_data[0].get("related_case")
-            elif isinstance(routing_data, dict):
-                target_core_request = routing_data.get("related_case")
+            target_core_request = _extract_related_case(complaint_id, row)
             if not target_core_request:
-                print(f"⚠️ [DB] routing_rank에서 related_case를 찾을 수 없습니다.")
                 return None
-            print(f"🔎 [DB] 참고할 과거 민원 키워드: {target_core_request}")
             # 키워드가 일치하는 과거 민원 답변 조회
-            sql = """
-                SELECT c.answer
-                FROM complaint_normalizations cn
-                JOIN complaints c ON cn.complaint_id = c.id
-                WHERE cn.core_request = %s
-                  AND c.id != %s
-                  AND c.answer IS NOT NULL
-                  AND c.answer != ''
-                LIMIT 1
-            """
-            cur.execute(sql, (target_core_request, complaint_id))
-            ref_row = cur.fetchone()
-            if ref_row:
-                print("✅ [DB] 유사한 과거 답변을 찾았습니다.")
-                return ref_row[0]
-            else:
-                print("⚠️ [DB] 키워드는 찾았으나, 답변이 달린 과거 사례가 없습니다.")
-                return None
+            cur.execute(REFERENCE_ANSWER_SQL, (target_core_request, complaint_id))
+            return _reference_answer_from_row(cur.fetchone())
     except Exception as e:
         print(f"❌ [DB] 과거 답변 조회 실패: {e}")
         return None
+    finally:
+        release_db_connection(conn)
+
+# pgvector 텍스트 표현 '[x,y,...]'
+def _vector_literal(vector: List[float]) -> str:
+    return "[" + ",".join(repr(float(v)) for v in vector) + "]"
+
+# 배치 검색 SQL과 파라미터 구성
+def _batch_search_query(complaint_ids: Optional[List[int]], vectors: Optional[List[List[float]]],
+                        limit: int) -> tuple:
+    if (complaint_ids is None) == (vectors is None):
+        raise ValueError("complaint_ids와 vectors 중 하나만 지정해야 합니다.")
+    keys = complaint_ids if complaint_ids is not None else list(range(len(vectors)))
+    if len(keys) > BATCH_SEARCH_MAX:
+        raise ValueError(f"한 번에 최대 {BATCH_SEARCH_MAX}건까지 조회할 수 있습니다.")
+
+    params = {"law_limit": limit, "case_limit": limit}
+    if complaint_ids is not None:
+        queries = BATCH_QUERIES_BY_ID_CTE
+        params["complaint_ids"] = list(complaint_ids)
+    else:
+        queries = BATCH_QUERIES_BY_VECTOR_CTE
+        params["vectors"] = [_vector_literal(v) for v in vectors]
+    return BATCH_SEARCH_SQL.format(queries=queries), params, keys
+
+# 배치 결과를 입력 순서대로 [{"query", "laws", "cases"}] 형태로 정리
+def _parse_batch_results(rows: List[tuple], keys: List[Any]) -> List[Dict[str, Any]]:
+    grouped = {key: {"query": key, "laws": [], "cases": []} for key in keys}
+    for query_key, kind, doc, distance in rows:
+        if isinstance(doc, str):
+            doc = json.loads(doc)
+        if kind == "law":
+            row = (doc["title"], doc["section"], doc["content"], distance)
+            grouped[query_key]["laws"].extend(_parse_results([row], type="law"))
+        else:
+            row = (doc["id"], doc["body"], doc["answer"], doc["summary"], distance)
+            grouped[query_key]["cases"].extend(_parse_results([row], type="case"))
+    return [grouped[key] for key in keys]
+
+# 여러 민원 ID(또는 벡터)에 대한 법령/유사 사례 top-k를 한 번의 쿼리로 검색
+def search_batch(complaint_ids: Optional[List[int]] = None, vectors: Optional[List[List[float]]] = None,
+                 limit: int = 3) -> List[Dict[str, Any]]:
+    sql, params, keys = _batch_search_query(complaint_ids, vectors, limit)
+    if not keys: return []
+    conn = get_db_connection()
+    if not conn: return []
+    cur = conn.cursor()
+
+    try:
+        cur.execute(vector_index.SET_SEARCH_PARAMS_SQL, vector_index.search_params_args(limit))
+        cur.execute(sql, params)
+        return _parse_batch_results(cur.fetchall(), keys)
+    finally:
+        cur.close()
+        release_db_connection(conn)
 
 # 민원인과의 채팅 로그 저장
 def save_chat_log(complaint_id: int, role: str, message: str):
@@ -287,15 +667,12 @@ def save_chat_log(complaint_id: int, role: str, message: str):
     if not conn: return
     try:
         with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO complaint_chat_logs (complaint_id, role, message) VALUES (%s, %s, %s)",
-                (complaint_id, role, message)
-            )
+            cur.execute(INSERT_CHAT_LOG_SQL, (complaint_id, role, message))
             conn.commit()
     except Exception as e:
         print(f"❌ 채팅 로그 저장 실패: {e}")
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 # 과거 채팅 기록 조회
 def get_chat_logs(complaint_id: int) -> List[Dict]:
@@ -303,14 +680,11 @@ def get_chat_logs(complaint_id: int) -> List[Dict]:
     if not conn: return []
     try:
         with conn.cursor() as cur:
-            cur.execute(
-                "SELECT role, message FROM complaint_chat_logs WHERE complaint_id = %s ORDER BY id ASC",
-                (complaint_id,)
-            )
+            cur.execute(SELECT_CHAT_LOGS_SQL, (complaint_id,))
             rows = cur.fetchall()
             return [{"role": row[0], "content": row[1]} for row in rows]
     except Exception as e:
         print(f"❌ 채팅 로그 조회 실패: {e}")
         return []
     finally:
-        conn.close()
\ No newline at end of file
+        release_db_connection(conn)
\ No newline at end of file
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Any
+
+from app import async_database
+
+# 임베딩 캐시 설정
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 5000))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", 60 * 60 * 24))
+EMBEDDING_CACHE_BACKEND = os.getenv("EMBEDDING_CACHE_BACKEND", "memory")  # memory | postgres
+# DB 캐시(2차) 상한: 보관 기간과 최대 행 수, 저장 몇 번마다 정리할지
+EMBEDDING_CACHE_DB_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_DB_TTL_SECONDS", 60 * 60 * 24 * 30))
+EMBEDDING_CACHE_DB_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_DB_MAX_ENTRIES", 200000))
+EMBEDDING_CACHE_DB_PRUNE_EVERY = int(os.getenv("EMBEDDING_CACHE_DB_PRUNE_EVERY", 500))
+
+CREATE_CACHE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS embedding_cache (
+        cache_key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        dimensions INTEGER NOT NULL,
+        embedding vector NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+"""
+
+CREATE_CACHE_INDEX_SQL = "CREATE INDEX IF NOT EXISTS embedding_cache_created_at_idx ON embedding_cache (created_at)"
+
+SELECT_CACHE_SQL = """
+    SELECT embedding::real[] FROM embedding_cache
+    WHERE cache_key = %s AND created_at > now() - make_interval(secs => %s)
+"""
+
+# 만료된 행과, 최신 순으로 상한을 넘는 행을 삭제
+PRUNE_EXPIRED_SQL = "DELETE FROM embedding_cache WHERE created_at <= now() - make_interval(secs => %s)"
+PRUNE_OVERFLOW_SQL = """
+    DELETE FROM embedding_cache
+    WHERE created_at < (
+        SELECT created_at FROM embedding_cache ORDER BY created_at DESC OFFSET %s LIMIT 1
+    )
+"""
+
+UPSERT_CACHE_SQL = """
+    INSERT INTO embedding_cache (cache_key, model, dimensions, embedding)
+    VALUES (%s, %s, %s, %s::vector)
+    ON CONFLICT (cache_key) DO UPDATE SET embedding = EXCLUDED.embedding, created_at = now()
+"""
+
+
+class EmbeddingCache:
+    """
+    텍스트 내용 해시(모델명, 차원 포함)를 키로 하는 임베딩 캐시.
+    1차: 프로세스 메모리 LRU (개수/TTL 제한)
+    2차: Postgres embedding_cache 테이블 (EMBEDDING_CACHE_BACKEND=postgres 일 때만, 보관 기간/행 수 제한)
+    같은 키에 대한 동시 요청은 한 번만 API를 호출합니다.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        backend: str = "memory",
+        db_ttl_seconds: float = EMBEDDING_CACHE_DB_TTL_SECONDS,
+        db_max_entries: int = EMBEDDING_CACHE_DB_MAX_ENTRIES,
+        db_prune_every: int = EMBEDDING_CACHE_DB_PRUNE_EVERY
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.db_ttl_seconds = db_ttl_seconds
+        self.db_max_entries = db_max_entries
+        self.db_prune_every = db_prune_every
+        self._writes_since_prune = 0
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._table_ready = False
+
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, dimensions: int, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{dimensions}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _get_memory(self, key: str) -> Optional[List[float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, embedding = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return embedding
+
+    def _set_memory(self, key: str, embedding: List[float]):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _ensure_table(self, conn):
+        if not self._table_ready:
+            await conn.execute(CREATE_CACHE_TABLE_SQL)
+            await conn.execute(CREATE_CACHE_INDEX_SQL)
+            self._table_ready = True
+
+    async def _get_persistent(self, key: str) -> Optional[List[float]]:
+        if self.backend != "postgres":
+            return None
+        try:
+            async with async_database.async_pool.connection() as conn:
+                await self._ensure_table(conn)
+                cur = await conn.execute(SELECT_CACHE_SQL, (key, self.db_ttl_seconds))
+                row = await cur.fetchone()
+                return list(row[0]) if row else None
+        except Exception as e:
+            print(f"⚠️ 임베딩 캐시(DB) 조회 실패: {e}")
+            return None
+
+    async def _set_persistent(self, key: str, model: str, dimensions: int, embedding: List[float]):
+        if self.backend != "postgres":
+            return
+        try:
+            async with async_database.async_pool.connection() as conn:
+                await self._ensure_table(conn)
+                await conn.execute(UPSERT_CACHE_SQL, (key, model, dimensions, embedding))
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= self.db_prune_every:
+                    self._writes_since_prune = 0
+                    await conn.execute(PRUNE_EXPIRED_SQL, (self.db_ttl_seconds,))
+                    await conn.execute(PRUNE_OVERFLOW_SQL, (self.db_max_entries,))
+        except Exception as e:
+            print(f"⚠️ 임베딩 캐시(DB) 저장 실패: {e}")
+
+    async def get_or_create(
+        self,
+        model: str,
+        dimensions: int,
+        text: str,
+        create: Callable[[], Awaitable[List[float]]]
+    ) -> List[float]:
+        key = self.make_key(model, dimensions, text)
+
+        embedding = self._get_memory(key)
+        if embedding is not None:
+            self.hits += 1
+            return embedding
+
+        # 같은 텍스트를 이미 임베딩 중이면 그 결과를 기다림
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            embedding = await self._get_persistent(key)
+            if embedding is not None:
+                self.persistent_hits += 1
+            else:
+                self.misses += 1
+                embedding = await create()
+                if embedding:
+                    await self._set_persistent(key, model, dimensions, embedding)
+
+            # 실패(빈 결과)는 캐시하지 않음
+            if embedding:
+                self._set_memory(key, embedding)
+            future.set_result(embedding)
+            return embedding
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 기다리는 쪽이 없어도 경고가 남지 않도록 소비
+            raise
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.persistent_hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "db_ttl_seconds": self.db_ttl_seconds,
+            "db_max_entries": self.db_max_entries,
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.persistent_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+embedding_cache = EmbeddingCache(
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_TTL_SECONDS,
+    backend=EMBEDDING_CACHE_BACKEND
+)
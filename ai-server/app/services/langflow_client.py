@@ -0,0 +1,175 @@
+import asyncio
+import os
+import time
+from typing import Dict, Any
+
+import httpx
+
+# LangFlow 호출 전용 HTTP 클라이언트
+# - keep-alive 커넥션 풀을 공유 (요청마다 새 연결을 만들지 않음)
+# - 동시 호출 수 제한 (LANGFLOW_MAX_CONCURRENCY), 자리가 나지 않으면 빠르게 실패
+# - 연속 실패 시 회로 차단 (LANGFLOW_BREAKER_FAILURES회 → LANGFLOW_BREAKER_COOLDOWN_SECONDS 동안 즉시 실패)
+
+LANGFLOW_MAX_CONCURRENCY = int(os.getenv("LANGFLOW_MAX_CONCURRENCY", 8))
+LANGFLOW_ACQUIRE_TIMEOUT = float(os.getenv("LANGFLOW_ACQUIRE_TIMEOUT", 10))  # 동시 호출 자리 대기 한도(초)
+LANGFLOW_CONNECT_TIMEOUT = float(os.getenv("LANGFLOW_CONNECT_TIMEOUT", 5))
+LANGFLOW_READ_TIMEOUT = float(os.getenv("LANGFLOW_READ_TIMEOUT", 120))
+LANGFLOW_BREAKER_FAILURES = int(os.getenv("LANGFLOW_BREAKER_FAILURES", 5))
+LANGFLOW_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LANGFLOW_BREAKER_COOLDOWN_SECONDS", 30))
+
+
+class LangflowUnavailable(Exception):
+    """회로가 열려 있거나 동시 호출 자리가 없어 LangFlow를 호출하지 않은 경우"""
+
+
+class CircuitBreaker:
+    """
+    closed: 정상 호출
+    open: cooldown 동안 호출하지 않고 즉시 실패
+    half_open: cooldown 이후 한 번만 시험 호출, 성공하면 closed / 실패하면 다시 open
+    """
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown_seconds:
+            return "open"
+        return "half_open"
+
+    def before_call(self) -> bool:
+        """호출해도 되면 반환, 반환값은 이 호출이 half_open 시험 호출인지 여부"""
+        state = self.state
+        if state == "open":
+            raise LangflowUnavailable("LangFlow 회로 차단 중 (최근 연속 실패)")
+        if state == "half_open":
+            if self.trial_in_flight:
+                raise LangflowUnavailable("LangFlow 회로 복구 확인 중")
+            self.trial_in_flight = True
+            return True
+        return False
+
+    # 회로 상태(open/closed)는 시험 호출만 바꿈
+    # 회로가 열리기 전에 들어간 호출의 결과는 연속 실패 횟수에만 반영
+    def record_success(self, is_trial: bool = False):
+        self.consecutive_failures = 0
+        if is_trial:
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self, is_trial: bool = False):
+        self.consecutive_failures += 1
+        if is_trial or (self.opened_at is None and self.consecutive_failures >= self.failure_threshold):
+            self.times_opened += 1
+            print(f"⚠️ [LangFlow] 회로 차단 ({self.consecutive_failures}회 연속 실패, {self.cooldown_seconds:.0f}초)")
+            self.opened_at = time.monotonic()
+        if is_trial:
+            self.trial_in_flight = False
+
+    # 시험 호출이 결과 없이 끝남 (자리 대기 초과, 취소) → 다음 호출이 다시 확인할 수 있도록 자리만 비움
+    def release_trial(self, is_trial: bool):
+        if is_trial:
+            self.trial_in_flight = False
+
+
+class LangflowClient:
+
+    def __init__(self, max_concurrency: int, acquire_timeout: float,
+                 connect_timeout: float, read_timeout: float, breaker: CircuitBreaker):
+        self.max_concurrency = max_concurrency
+        self.acquire_timeout = acquire_timeout
+        self.breaker = breaker
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency
+            )
+        )
+
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+
+    async def run(self, url: str, payload: Dict[str, Any], api_key: str = None) -> Dict[str, Any]:
+        try:
+            is_trial = self.breaker.before_call()
+        except LangflowUnavailable:
+            self.rejected += 1
+            raise
+
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.acquire_timeout)
+        except asyncio.CancelledError:
+            self.breaker.release_trial(is_trial)
+            raise
+        except asyncio.TimeoutError:
+            # 자리를 못 얻은 것은 LangFlow 장애가 아니므로 회로 상태에는 반영하지 않음
+            self.breaker.release_trial(is_trial)
+            self.rejected += 1
+            raise LangflowUnavailable(f"LangFlow 동시 호출 한도({self.max_concurrency}) 초과")
+
+        self.in_flight += 1
+        self.calls += 1
+        try:
+            headers = {"x-api-key": api_key} if api_key else {}
+            response = await self._client.post(url, json=payload, headers=headers)
+            response.raise_for_status()
+            result = response.json()
+        except httpx.HTTPStatusError as e:
+            # 4xx는 요청 문제이므로 회로에는 5xx만 반영
+            self.failures += 1
+            if e.response.status_code >= 500:
+                self.breaker.record_failure(is_trial)
+            else:
+                self.breaker.record_success(is_trial)
+            raise
+        except asyncio.CancelledError:
+            # 호출한 쪽이 취소(클라이언트 연결 끊김 등)한 것은 성공/실패 어느 쪽도 아님
+            # 복구 확인 호출이었다면 다음 호출이 다시 확인할 수 있도록 자리만 비움
+            self.breaker.release_trial(is_trial)
+            raise
+        except Exception:
+            self.failures += 1
+            self.breaker.record_failure(is_trial)
+            raise
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+        self.breaker.record_success(is_trial)
+        return result
+
+    async def close(self):
+        await self._client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "times_opened": self.breaker.times_opened,
+        }
+
+
+langflow_client = LangflowClient(
+    LANGFLOW_MAX_CONCURRENCY,
+    LANGFLOW_ACQUIRE_TIMEOUT,
+    LANGFLOW_CONNECT_TIMEOUT,
+    LANGFLOW_READ_TIMEOUT,
+    CircuitBreaker(LANGFLOW_BREAKER_FAILURES, LANGFLOW_BREAKER_COOLDOWN_SECONDS)
+)
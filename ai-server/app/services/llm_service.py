@@ -1,7 +1,10 @@
 import os
-from app import database
-from typing import List, Dict, Any
-from openai import OpenAI
+import asyncio
+import httpx
+from app import async_database
+from app.services.embedding_cache import embedding_cache
+from typing import List, Dict, Any, AsyncIterator
+from openai import AsyncOpenAI
 
 # 환경 변수에서 키 가져오기
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -9,29 +12,67 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     print("⚠️ 경고: OPENAI_API_KEY가 설정되지 않았습니다. .env 파일을 확인하세요.")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# 초안 작성 시 법령 검색 벡터 선택
+# stored: complaint_normalizations에 저장된 벡터를 우선 사용 (없으면 본문을 새로 임베딩)
+# live: 항상 본문을 새로 임베딩
+DRAFT_RETRIEVAL_MODE = os.getenv("DRAFT_RETRIEVAL_MODE", "stored")
+# 전처리 API가 임베딩할 때 쓰는 모델 (백엔드가 저장하는 행의 embedding_model 기본값)
+# 저장된 벡터는 행의 embedding_model이 현재 임베딩 모델과 같을 때만 재사용
+STORED_EMBEDDING_MODEL = os.getenv("STORED_EMBEDDING_MODEL", "text-embedding-3-large")
+
+# 요청마다 TCP/TLS 연결을 새로 맺지 않도록 keep-alive 연결 풀을 공유하는 비동기 클라이언트
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 20))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 60))
+
+client = AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    timeout=OPENAI_TIMEOUT,
+    http_client=httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_CONNECTIONS
+        ),
+        timeout=OPENAI_TIMEOUT
+    )
+)
+
+
+# 서버 종료 시 연결 풀 정리
+async def close_client():
+    await client.close()
 
 
 class LLMService:
     def __init__(self):
         self.embed_model = "text-embedding-3-large"
+        self.embed_dims = 1024
         self.chat_model = "gpt-4o-mini"
 
-    # 텍스트를 벡터로 변환
+    # 텍스트를 벡터로 변환 (같은 텍스트는 캐시에서 재사용)
     async def get_embedding(self, text: str) -> List[float]:
+        text = text.replace("\n", " ")
+        return await embedding_cache.get_or_create(
+            self.embed_model,
+            self.embed_dims,
+            text,
+            lambda: self._create_embedding(text)
+        )
+
+    async def _create_embedding(self, text: str) -> List[float]:
         try:
-            text = text.replace("\n", " ")
-            response = client.embeddings.create(
+            response = await client.embeddings.create(
                 input=[text],
                 model=self.embed_model,
-                dimensions=1024
+                dimensions=self.embed_dims
             )
             return response.data[0].embedding
         except Exception as e:
             print(f"❌ OpenAI 임베딩 생성 실패: {e}")
             return []
 
-    async def generate_response(self, complaint_id: int, user_query: str = None, action: str = "chat") -> Dict[
+    # 액션별 참고 자료 검색 및 프롬프트 구성
+    # (LLM 호출 없이 바로 돌려줄 답변이 있으면 answer에 담아 반환)
+    async def _prepare_response(self, complaint_id: int, user_query: str = None, action: str = "chat") -> Dict[
         str, Any]:
         laws = []
         cases = []
@@ -41,7 +82,7 @@ class LLMService:
         # 법령 찾기 
         if action == "search_law":
             print(f"민원 #{complaint_id} 법령 검색")
-            laws = database.search_laws_by_id(complaint_id, limit=3)
+            laws = await async_database.search_laws_by_id(complaint_id, limit=3)
 
             context_text = ""
             for i, law in enumerate(laws, 1):
@@ -55,7 +96,7 @@ class LLMService:
         elif action == "search_case":
             print(f"민원 #{complaint_id} 유사 사례 검색")
             # DB에서 유사 사례 조회
-            raw_cases = database.search_cases_by_id(complaint_id, limit=3)
+            raw_cases = await async_database.search_cases_by_id(complaint_id, limit=3)
 
             print(f"   --> 1차 검색된 개수: {len(raw_cases)}개")
             for idx, c in enumerate(raw_cases):
@@ -67,7 +108,9 @@ class LLMService:
                 print("   --> 필터링 후 남은 사례가 0개여서 즉시 리턴합니다.")
                 return {
                     "answer": "과거 데이터 분석 결과, 현재 민원과 유사도가 높은 처리 사례가 없습니다. (유사도 60% 이상 건 없음)",
-                    "documents": []
+                    "documents": [],
+                    "system_role": "",
+                    "user_msg": ""
                 }
             # 사례가 있으면 요약
             context_text = ""
@@ -85,7 +128,7 @@ class LLMService:
             if user_query:
                 vec = await self.get_embedding(user_query)
                 if vec:
-                    laws = database.search_laws_by_text(vec, limit=3, keyword=user_query)
+                    laws = await async_database.search_laws_by_text(vec, limit=3, keyword=user_query)
 
             context_text = ""
             for i, law in enumerate(laws, 1):
@@ -96,14 +139,27 @@ class LLMService:
             system_role = "당신은 법률 상담 AI입니다. [참고 자료]를 근거로 답변하세요. 근거가 없으면 없다고 하세요."
             user_msg = f"질문: {user_query}\n\n[참고 자료]:\n{context_text}"
 
+        return {
+            "answer": None,
+            "documents": laws if action != 'search_case' else cases,  # 사례 검색이면 사례를 반환
+            "system_role": system_role,
+            "user_msg": user_msg
+        }
+
+    async def generate_response(self, complaint_id: int, user_query: str = None, action: str = "chat") -> Dict[
+        str, Any]:
+        prepared = await self._prepare_response(complaint_id, user_query, action)
+        if prepared["answer"] is not None:
+            return {"answer": prepared["answer"], "documents": prepared["documents"]}
+
         # LLM 호출
         ai_answer = ""
         try:
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=self.chat_model,
                 messages=[
-                    {"role": "system", "content": system_role},
-                    {"role": "user", "content": user_msg}
+                    {"role": "system", "content": prepared["system_role"]},
+                    {"role": "user", "content": prepared["user_msg"]}
                 ],
                 temperature=0.3
             )
@@ -113,25 +169,78 @@ class LLMService:
 
         return {
             "answer": ai_answer,
-            "documents": laws if action != 'search_case' else cases  # 사례 검색이면 사례를 반환
+            "documents": prepared["documents"]
         }
 
-    # AI 초안 작성
-    async def generate_draft(self, complaint_id: int, complaint_body: str) -> str:
+    # 스트리밍 답변: 검색된 문서를 먼저 보내고, 이후 토큰 단위로 전송
+    # {"event": "documents" | "delta" | "done", "data": ...} 형태로 yield
+    async def stream_response(self, complaint_id: int, user_query: str = None, action: str = "chat") -> AsyncIterator[
+        Dict[str, Any]]:
+        prepared = await self._prepare_response(complaint_id, user_query, action)
+        yield {"event": "documents", "data": prepared["documents"]}
 
-        past_answer = database.get_reference_answer(complaint_id)
+        if prepared["answer"] is not None:
+            ai_answer = prepared["answer"]
+            yield {"event": "delta", "data": ai_answer}
+        else:
+            ai_answer = ""
+            async for delta in self._stream_completion(self.chat_model, prepared["system_role"], prepared["user_msg"],
+                                                       error_prefix="오류 발생"):
+                ai_answer += delta
+                yield {"event": "delta", "data": delta}
+
+        yield {"event": "done", "data": {"answer": ai_answer, "documents": prepared["documents"]}}
+
+    # 토큰 단위 LLM 호출 (오류가 나면 오류 문구를 마지막 조각으로 전송)
+    async def _stream_completion(self, model: str, system_role: str, user_msg: str,
+                                 error_prefix: str) -> AsyncIterator[str]:
+        try:
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_role},
+                    {"role": "user", "content": user_msg}
+                ],
+                temperature=0.3,
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            yield f"{error_prefix}: {str(e)}"
 
-        # 관련 법령 검색
-        law_text = ""
-        if complaint_body:
-            vec = await self.get_embedding(complaint_body)
+    # 초안용 검색 벡터: 저장된 정규화 벡터가 현재 모델/차원과 맞으면(행마다 기록된 모델 확인) 재사용, 아니면 본문 임베딩
+    async def _get_draft_vector(self, complaint_id: int, complaint_body: str) -> List[float]:
+        if DRAFT_RETRIEVAL_MODE == "stored":
+            vec = await async_database.get_stored_embedding(complaint_id, self.embed_dims, self.embed_model)
             if vec:
-                laws = database.search_laws_by_text(vec, limit=3)
-                # 텍스트로 변환
-                law_text = "\n\n".join([
-                    f"- {law.get('title')} {law.get('section', '')}: {law.get('content', '')[:200]}..."
-                    for law in laws
-                ])
+                return vec
+        if not complaint_body:
+            return []
+        return await self.get_embedding(complaint_body)
+
+    # 초안에 넣을 관련 법령 검색
+    async def _search_draft_laws(self, complaint_id: int, complaint_body: str) -> List[Dict]:
+        vec = await self._get_draft_vector(complaint_id, complaint_body)
+        if not vec:
+            return []
+        return await async_database.search_laws_by_text(vec, limit=3)
+
+    # 초안 프롬프트 구성
+    async def _prepare_draft(self, complaint_id: int, complaint_body: str) -> Dict[str, Any]:
+
+        # 과거 답변 조회와 법령 검색(임베딩 + 벡터 검색)은 서로 독립적이므로 동시에 실행
+        past_answer, laws = await asyncio.gather(
+            async_database.get_reference_answer(complaint_id),
+            self._search_draft_laws(complaint_id, complaint_body)
+        )
+
+        # 텍스트로 변환
+        law_text = "\n\n".join([
+            f"- {law.get('title')} {law.get('section', '')}: {law.get('content', '')[:200]}..."
+            for law in laws
+        ])
 
         system_role = "당신은 강동구청의 베테랑 주무관입니다. 민원인에게 정중하고 명확하게 답변해야 합니다."
 
@@ -174,17 +283,47 @@ class LLMService:
             """
             warning_msg = "(알림: 유사 사례가 없어 법령 기반으로만 작성되었습니다.)\n\n"
 
+        return {
+            "system_role": system_role,
+            "prompt": prompt,
+            "warning_msg": warning_msg,
+            "documents": laws,
+            "has_past_answer": bool(past_answer)
+        }
+
+    # AI 초안 작성
+    async def generate_draft(self, complaint_id: int, complaint_body: str) -> str:
+        prepared = await self._prepare_draft(complaint_id, complaint_body)
+
         try:
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model="gpt-4o-mini", 
                 messages=[
-                    {"role": "system", "content": system_role},
-                    {"role": "user", "content": prompt}
+                    {"role": "system", "content": prepared["system_role"]},
+                    {"role": "user", "content": prepared["prompt"]}
                 ],
                 temperature=0.3
             )
             draft_content = response.choices[0].message.content
-            return warning_msg + draft_content
+            return prepared["warning_msg"] + draft_content
 
         except Exception as e:
-            return f"오류가 발생하여 초안을 작성하지 못했습니다. ({str(e)})"
\ No newline at end of file
+            return f"오류가 발생하여 초안을 작성하지 못했습니다. ({str(e)})"
+
+    # 스트리밍 초안 작성 (참고 법령 → 토큰 → 완료 순서로 yield)
+    async def stream_draft(self, complaint_id: int, complaint_body: str) -> AsyncIterator[Dict[str, Any]]:
+        prepared = await self._prepare_draft(complaint_id, complaint_body)
+        yield {"event": "documents", "data": {
+            "laws": prepared["documents"],
+            "has_past_answer": prepared["has_past_answer"]
+        }}
+
+        draft = prepared["warning_msg"]
+        if draft:
+            yield {"event": "delta", "data": draft}
+        async for delta in self._stream_completion("gpt-4o-mini", prepared["system_role"], prepared["prompt"],
+                                                   error_prefix="오류가 발생하여 초안을 작성하지 못했습니다"):
+            draft += delta
+            yield {"event": "delta", "data": delta}
+
+        yield {"event": "done", "data": {"answer": draft}}
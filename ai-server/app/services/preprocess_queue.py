@@ -0,0 +1,276 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Any, List, Optional
+
+from psycopg.types.json import Jsonb
+
+from app import async_database
+
+# 민원 전처리 작업 큐 (Postgres preprocess_jobs 테이블)
+# - enqueue: 작업을 저장하고 바로 job_id 반환 (LangFlow 지연과 무관하게 접수)
+# - 워커 PREPROCESS_WORKERS개가 FOR UPDATE SKIP LOCKED로 작업을 하나씩 가져가 처리
+# - 실패하면 지수 백오프로 재시도, PREPROCESS_MAX_ATTEMPTS회 실패하면 failed
+# - 작업 하나는 PREPROCESS_JOB_TIMEOUT_SECONDS 안에 끝나야 하며(넘기면 실패로 재시도),
+#   running 상태로 PREPROCESS_RECLAIM_SECONDS를 넘긴 작업(워커/서버 중단 등)은 다시 가져감
+#   (시도 횟수를 다 쓴 작업은 다시 가져가지 않고 "worker lost"로 failed 처리)
+
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", 4))
+PREPROCESS_MAX_ATTEMPTS = int(os.getenv("PREPROCESS_MAX_ATTEMPTS", 3))
+PREPROCESS_RETRY_BASE_SECONDS = float(os.getenv("PREPROCESS_RETRY_BASE_SECONDS", 5))
+PREPROCESS_JOB_TIMEOUT_SECONDS = float(os.getenv("PREPROCESS_JOB_TIMEOUT_SECONDS", 300))
+# 작업 타임아웃보다 길어야 아직 실행 중인 작업을 다른 워커가 가져가지 않음
+PREPROCESS_RECLAIM_SECONDS = float(os.getenv("PREPROCESS_RECLAIM_SECONDS", 2 * PREPROCESS_JOB_TIMEOUT_SECONDS))
+PREPROCESS_POLL_SECONDS = float(os.getenv("PREPROCESS_POLL_SECONDS", 2))
+
+CREATE_JOBS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS preprocess_jobs (
+        id BIGSERIAL PRIMARY KEY,
+        complaint_id BIGINT NOT NULL,
+        payload JSONB NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        last_error TEXT,
+        result JSONB,
+        run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        started_at TIMESTAMPTZ,
+        finished_at TIMESTAMPTZ
+    )
+"""
+
+CREATE_JOBS_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS preprocess_jobs_pending_idx
+    ON preprocess_jobs (run_after) WHERE status IN ('queued', 'running')
+"""
+
+INSERT_JOB_SQL = """
+    INSERT INTO preprocess_jobs (complaint_id, payload, max_attempts)
+    VALUES (%s, %s, %s)
+    RETURNING id
+"""
+
+# 실행할 작업 하나를 가져와 running으로 표시 (다른 워커/서버와 겹치지 않음)
+CLAIM_JOB_SQL = """
+    UPDATE preprocess_jobs
+    SET status = 'running', attempts = attempts + 1, started_at = now()
+    WHERE id = (
+        SELECT id FROM preprocess_jobs
+        WHERE (status = 'queued' AND run_after <= now())
+           OR (status = 'running' AND started_at < now() - make_interval(secs => %s)
+               AND attempts < max_attempts)
+        ORDER BY run_after, id
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    RETURNING id, payload, attempts, max_attempts
+"""
+
+# 실행 중 워커가 죽은 채로 시도 횟수를 다 쓴 작업은 실패로 마감 (무한히 다시 가져가지 않음)
+FAIL_LOST_JOBS_SQL = """
+    UPDATE preprocess_jobs
+    SET status = 'failed', last_error = 'worker lost: 실행 중 워커/서버가 중단됨', finished_at = now()
+    WHERE status = 'running'
+      AND started_at < now() - make_interval(secs => %s)
+      AND attempts >= max_attempts
+    RETURNING id
+"""
+
+COMPLETE_JOB_SQL = """
+    UPDATE preprocess_jobs
+    SET status = 'done', result = %s, last_error = NULL, finished_at = now()
+    WHERE id = %s
+"""
+
+RETRY_JOB_SQL = """
+    UPDATE preprocess_jobs
+    SET status = 'queued', last_error = %s, run_after = now() + make_interval(secs => %s)
+    WHERE id = %s
+"""
+
+FAIL_JOB_SQL = """
+    UPDATE preprocess_jobs
+    SET status = 'failed', last_error = %s, finished_at = now()
+    WHERE id = %s
+"""
+
+SELECT_JOB_SQL = """
+    SELECT id, complaint_id, status, attempts, max_attempts, last_error, result,
+           created_at, started_at, finished_at
+    FROM preprocess_jobs
+    WHERE id = %s
+"""
+
+COUNT_PENDING_SQL = "SELECT status, COUNT(*) FROM preprocess_jobs WHERE status IN ('queued', 'running') GROUP BY status"
+
+
+class PreprocessQueue:
+    """
+    Postgres 기반 전처리 작업 큐와 워커 풀.
+    handler(payload) -> result(dict) 를 워커 수만큼만 동시에 실행합니다.
+    """
+
+    def __init__(self, workers: int, max_attempts: int, retry_base_seconds: float,
+                 job_timeout_seconds: float, reclaim_seconds: float, poll_seconds: float):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.job_timeout_seconds = job_timeout_seconds
+        self.reclaim_seconds = max(reclaim_seconds, job_timeout_seconds)
+        self.poll_seconds = poll_seconds
+
+        self._handler: Optional[Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._table_ready = False
+
+        self.running = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def _ensure_table(self, conn):
+        if not self._table_ready:
+            await conn.execute(CREATE_JOBS_TABLE_SQL)
+            await conn.execute(CREATE_JOBS_INDEX_SQL)
+            self._table_ready = True
+
+    # 작업 등록 → job_id
+    async def enqueue(self, complaint_id: int, payload: Dict[str, Any]) -> int:
+        async with async_database.async_pool.connection() as conn:
+            await self._ensure_table(conn)
+            cur = await conn.execute(INSERT_JOB_SQL, (complaint_id, Jsonb(payload), self.max_attempts))
+            job_id = (await cur.fetchone())[0]
+        self._wakeup.set()
+        return job_id
+
+    # 작업 상태 조회 (없으면 None)
+    async def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        async with async_database.async_pool.connection() as conn:
+            await self._ensure_table(conn)
+            cur = await conn.execute(SELECT_JOB_SQL, (job_id,))
+            row = await cur.fetchone()
+        if not row:
+            return None
+        return {
+            "job_id": row[0],
+            "complaint_id": row[1],
+            "status": row[2],
+            "attempts": row[3],
+            "max_attempts": row[4],
+            "last_error": row[5],
+            "result": row[6],
+            "created_at": row[7].isoformat() if row[7] else None,
+            "started_at": row[8].isoformat() if row[8] else None,
+            "finished_at": row[9].isoformat() if row[9] else None,
+        }
+
+    async def _claim(self) -> Optional[tuple]:
+        async with async_database.async_pool.connection() as conn:
+            await self._ensure_table(conn)
+            cur = await conn.execute(FAIL_LOST_JOBS_SQL, (self.reclaim_seconds,))
+            lost = [row[0] for row in await cur.fetchall()]
+            if lost:
+                print(f"❌ [전처리 작업 {lost}] 실행 중 워커 중단, 시도 횟수 소진 → 최종 실패")
+                self.failed += len(lost)
+            cur = await conn.execute(CLAIM_JOB_SQL, (self.reclaim_seconds,))
+            return await cur.fetchone()
+
+    async def _finish(self, sql: str, params: tuple):
+        async with async_database.async_pool.connection() as conn:
+            await conn.execute(sql, params)
+
+    async def _run_job(self, job_id: int, payload: Dict[str, Any], attempts: int, max_attempts: int):
+        self.running += 1
+        try:
+            result = await asyncio.wait_for(self._handler(payload), timeout=self.job_timeout_seconds)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempts < max_attempts:
+                delay = self.retry_base_seconds * (2 ** (attempts - 1))
+                print(f"⚠️ [전처리 작업 {job_id}] 실패 ({attempts}/{max_attempts}), {delay:.0f}초 후 재시도: {error}")
+                await self._finish(RETRY_JOB_SQL, (error, delay, job_id))
+                self.retried += 1
+            else:
+                print(f"❌ [전처리 작업 {job_id}] 최종 실패 ({attempts}/{max_attempts}): {error}")
+                await self._finish(FAIL_JOB_SQL, (error, job_id))
+                self.failed += 1
+            return
+        finally:
+            self.running -= 1
+
+        await self._finish(COMPLETE_JOB_SQL, (Jsonb(result), job_id))
+        self.completed += 1
+
+    async def _worker(self, worker_no: int):
+        while True:
+            # 조회 전에 신호를 지워야 조회와 대기 사이에 등록된 작업의 신호를 놓치지 않음
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ [전처리 워커 {worker_no}] 작업 조회 실패: {e}")
+                job = None
+
+            if job is None:
+                # 새 작업 등록 신호 또는 폴링 주기(재시도 예약/다른 서버 등록분)까지 대기
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, payload, attempts, max_attempts = job
+            try:
+                await self._run_job(job_id, payload, attempts, max_attempts)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 상태 저장 실패 시 running으로 남고, PREPROCESS_RECLAIM_SECONDS 후 다시 처리됨
+                print(f"⚠️ [전처리 작업 {job_id}] 상태 저장 실패: {e}")
+
+    # FastAPI 시작 시 호출
+    def start(self, handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]):
+        self._handler = handler
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        print(f"[*] 전처리 작업 워커 {self.workers}개 시작")
+
+    # FastAPI 종료 시 호출 (처리 중이던 작업은 PREPROCESS_RECLAIM_SECONDS 후 다른 워커가 다시 처리)
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        print("[*] 전처리 작업 워커 종료")
+
+    async def stats(self) -> Dict[str, Any]:
+        pending = {}
+        try:
+            async with async_database.async_pool.connection() as conn:
+                await self._ensure_table(conn)
+                cur = await conn.execute(COUNT_PENDING_SQL)
+                pending = {status: count for status, count in await cur.fetchall()}
+        except Exception as e:
+            print(f"⚠️ 전처리 작업 큐 조회 실패: {e}")
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "queued_in_db": pending.get("queued", 0),
+            "running_in_db": pending.get("running", 0),
+        }
+
+
+preprocess_queue = PreprocessQueue(
+    PREPROCESS_WORKERS,
+    PREPROCESS_MAX_ATTEMPTS,
+    PREPROCESS_RETRY_BASE_SECONDS,
+    PREPROCESS_JOB_TIMEOUT_SECONDS,
+    PREPROCESS_RECLAIM_SECONDS,
+    PREPROCESS_POLL_SECONDS
+)
@@ -0,0 +1,73 @@
+import json
+import os
+import re
+import uuid
+from typing import Dict, Any, Optional, List, Awaitable, Callable
+
+from app.services.langflow_client import langflow_client
+
+# LangFlow 민원 전처리(정규화) + 임베딩
+# /api/complaints/preprocess(동기)와 전처리 작업 큐 워커가 같이 사용합니다.
+
+LANGFLOW_KEY = os.getenv("LANGFLOW_KEY")
+# LANGFLOW_URL = "http://complaint-langflow:7860/api/v1/run/59369f82-0d62-414e-bd20-9bc5f9aa8a50"
+# 서버 전용 langflow api url
+LANGFLOW_URL = os.getenv(
+    "LANGFLOW_URL",
+    "http://complaint-langflow:7860/api/v1/run/86111065-2582-4a9f-a41c-ce2d8800d198"
+)
+
+
+def _build_payload(title: str, body: str) -> Dict[str, Any]:
+    return {
+        "output_type": "chat",
+        "input_type": "text",
+        "tweaks": {
+
+            # "TextInput-MBAG": {
+            #     "input_value": title
+            # },
+            # "TextInput-NNDwa": {
+            #     "input_value": body
+            # }
+
+            # 서버 전용
+            "TITLE-srPg5": {
+                "input_value": title
+            },
+            "BODY-hfM2I": {
+                "input_value": body
+            }
+        },
+        "session_id": str(uuid.uuid4())
+    }
+
+
+# LangFlow 결과에서 임베딩할 텍스트 추출 (topic + keywords + category)
+def _text_to_embed(ai_text: str) -> str:
+    clean_json_str = re.sub(r'```json\n|```', '', ai_text).strip()
+    inner_data = json.loads(clean_json_str)
+    original = inner_data.get("original_analysis", {})
+    return f"{original.get('topic', '')} {original.get('keywords', '')} {original.get('category', '')}"
+
+
+# 민원 제목/본문 → {"data": LangFlow 분석 결과 텍스트, "embedding": 벡터 또는 None}
+# LangFlow 호출 실패는 예외로 전달되고, 임베딩 단계의 파싱 오류는 embedding=None으로 처리합니다.
+async def preprocess(
+    title: str,
+    body: str,
+    get_embedding: Callable[[str], Awaitable[Optional[List[float]]]]
+) -> Dict[str, Any]:
+    result_json = await langflow_client.run(LANGFLOW_URL, _build_payload(title, body), api_key=LANGFLOW_KEY)
+    ai_text = result_json['outputs'][0]['outputs'][0]['results']['message']['data']['text']
+
+    embedding_vector = None
+    try:
+        text_to_embed = _text_to_embed(ai_text)
+        if text_to_embed.strip():
+            embedding_vector = await get_embedding(text_to_embed)
+            print(f"임베딩 생성 완료 (차원: {len(embedding_vector)})")
+    except Exception as parse_err:
+        print(f"임베딩 처리 중 파싱 오류: {parse_err}")
+
+    return {"data": ai_text, "embedding": embedding_vector}
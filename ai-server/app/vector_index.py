@@ -0,0 +1,216 @@
+import os
+import sys
+from typing import List, Dict, Any, Tuple
+
+# 벡터 검색용 ANN 인덱스 관리
+# - law_chunks / complaint_normalizations(is_current = true 부분 인덱스) 임베딩 인덱스 생성·재생성
+# - 목표 재현율(VECTOR_RECALL_TARGET)에 맞춰 쿼리마다 hnsw.ef_search / ivfflat.probes 설정
+# - pg_stat_user_indexes 기반 인덱스 사용 현황 보고
+#
+# 사용법: python -m app.vector_index [ensure|rebuild|report]
+
+VECTOR_INDEX_METHOD = os.getenv("VECTOR_INDEX_METHOD", "hnsw")  # hnsw | ivfflat
+VECTOR_RECALL_TARGET = float(os.getenv("VECTOR_RECALL_TARGET", 0.95))
+VECTOR_INDEX_AUTO_ENSURE = os.getenv("VECTOR_INDEX_AUTO_ENSURE", "true").lower() == "true"  # 서버 시작 시 인덱스 확인
+
+HNSW_M = int(os.getenv("HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 64))
+
+# 목표 재현율 → (hnsw.ef_search, ivfflat.probes)
+# 목표 이상을 만족하는 가장 가벼운 설정을 사용합니다.
+RECALL_PROFILES: List[Tuple[float, int, int]] = [
+    (0.90, 40, 5),
+    (0.95, 100, 10),
+    (0.98, 200, 20),
+    (0.99, 400, 40),
+]
+
+VECTOR_INDEXES: List[Dict[str, str]] = [
+    {
+        "name": "law_chunks_embedding_ann_idx",
+        "table": "law_chunks",
+        "column": "embedding",
+        "where": "",
+    },
+    {
+        "name": "complaint_normalizations_embedding_current_ann_idx",
+        "table": "complaint_normalizations",
+        "column": "embedding",
+        "where": "is_current = true",
+    },
+]
+
+# 민원 ID로 현재 벡터를 찾는 CTE(current_vec)용 보조 인덱스
+SUPPORT_INDEXES: List[Dict[str, str]] = [
+    {
+        "name": "complaint_normalizations_complaint_current_idx",
+        "sql": """CREATE INDEX CONCURRENTLY IF NOT EXISTS complaint_normalizations_complaint_current_idx
+                  ON complaint_normalizations (complaint_id) WHERE is_current = true""",
+    },
+]
+
+# 이미 있는 인덱스의 유효 여부와 접근 방식 (없으면 행 없음)
+INDEX_STATE_SQL = """
+    SELECT i.indisvalid, am.amname
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    JOIN pg_am am ON am.oid = c.relam
+    WHERE i.indexrelid = to_regclass(%s)
+"""
+
+INDEX_USAGE_SQL = """
+    SELECT s.indexrelname, s.relname, s.idx_scan, s.idx_tup_read,
+           pg_size_pretty(pg_relation_size(s.indexrelid)) AS size
+    FROM pg_stat_user_indexes s
+    WHERE s.indexrelname = ANY(%s)
+"""
+
+# 쿼리마다 트랜잭션 범위(SET LOCAL과 동일)로 검색 파라미터 설정
+SET_SEARCH_PARAMS_SQL = """
+    SELECT set_config('hnsw.ef_search', %s, true), set_config('ivfflat.probes', %s, true)
+"""
+
+
+def _ivfflat_lists(row_count: int) -> int:
+    # pgvector 권장값: 100만 건 이하 rows/1000, 그 이상 sqrt(rows)
+    if row_count <= 1_000_000:
+        return max(10, row_count // 1000)
+    return int(row_count ** 0.5)
+
+
+# 목표 재현율에 맞는 (ef_search, probes)
+def search_params(limit: int, recall_target: float = VECTOR_RECALL_TARGET) -> Tuple[int, int]:
+    profile = RECALL_PROFILES[-1]
+    for candidate in RECALL_PROFILES:
+        if candidate[0] >= recall_target:
+            profile = candidate
+            break
+    _, ef_search, probes = profile
+    # ef_search는 최소한 반환할 개수 이상이어야 함
+    return max(ef_search, limit), probes
+
+
+def search_params_args(limit: int) -> Tuple[str, str]:
+    ef_search, probes = search_params(limit)
+    return str(ef_search), str(probes)
+
+
+def _create_index_sql(spec: Dict[str, str], method: str, row_count: int) -> str:
+    if method == "ivfflat":
+        options = f"WITH (lists = {_ivfflat_lists(row_count)})"
+    else:
+        options = f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})"
+    where = f" WHERE {spec['where']}" if spec["where"] else ""
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {spec['name']} "
+        f"ON {spec['table']} USING {method} ({spec['column']} vector_cosine_ops) {options}{where}"
+    )
+
+
+def _count_rows(cur, spec: Dict[str, str]) -> int:
+    where = f" WHERE {spec['where']}" if spec["where"] else ""
+    cur.execute(f"SELECT COUNT(*) FROM {spec['table']}{where}")
+    return cur.fetchone()[0]
+
+
+def _maintenance_connection():
+    # CREATE/REINDEX CONCURRENTLY는 트랜잭션 밖에서만 실행 가능
+    from app import database
+    conn = database.db_pool.getconn()
+    conn.autocommit = True
+    return conn
+
+
+def _release(conn):
+    from app import database
+    conn.autocommit = False
+    database.release_db_connection(conn)
+
+
+# 중단된 CONCURRENTLY 생성이 남긴 INVALID 인덱스나 접근 방식이 다른 인덱스는 지움
+# (IF NOT EXISTS는 이런 인덱스도 있는 것으로 보고 건너뛰므로 먼저 정리해야 다시 만들어짐)
+def _drop_unusable_index(cur, name: str, method: str = None):
+    cur.execute(INDEX_STATE_SQL, (name,))
+    row = cur.fetchone()
+    if row is None:
+        return
+    valid, amname = row
+    if not valid:
+        print(f"[*] INVALID 인덱스 삭제 후 재생성: {name}")
+    elif method is not None and amname != method:
+        print(f"[*] 인덱스 방식 변경 ({amname} → {method}): {name} 삭제 후 재생성")
+    else:
+        return
+    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+# 인덱스가 없거나 쓸 수 없으면 생성
+def ensure_indexes(method: str = VECTOR_INDEX_METHOD):
+    conn = _maintenance_connection()
+    try:
+        with conn.cursor() as cur:
+            for spec in VECTOR_INDEXES:
+                _drop_unusable_index(cur, spec["name"], method)
+                row_count = _count_rows(cur, spec) if method == "ivfflat" else 0
+                sql = _create_index_sql(spec, method, row_count)
+                print(f"[*] 인덱스 확인/생성: {spec['name']} ({method})")
+                cur.execute(sql)
+            for spec in SUPPORT_INDEXES:
+                _drop_unusable_index(cur, spec["name"])
+                cur.execute(spec["sql"])
+    finally:
+        _release(conn)
+
+
+# 서버 시작 시 백그라운드에서 호출 (실패해도 서버는 계속 동작)
+def ensure_indexes_safely():
+    try:
+        ensure_indexes()
+    except Exception as e:
+        print(f"⚠️ 벡터 인덱스 확인/생성 실패: {e}")
+
+
+# 인덱스 재생성 (IVFFlat은 데이터가 늘면 lists를 다시 계산해야 하므로 새로 만듦)
+def rebuild_indexes(method: str = VECTOR_INDEX_METHOD):
+    conn = _maintenance_connection()
+    try:
+        with conn.cursor() as cur:
+            for spec in VECTOR_INDEXES:
+                if method == "ivfflat":
+                    print(f"[*] 인덱스 재생성: {spec['name']} (lists 재계산)")
+                    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {spec['name']}")
+                    cur.execute(_create_index_sql(spec, method, _count_rows(cur, spec)))
+                else:
+                    print(f"[*] 인덱스 재생성: {spec['name']}")
+                    cur.execute(f"REINDEX INDEX CONCURRENTLY {spec['name']}")
+    finally:
+        _release(conn)
+
+
+# 인덱스 사용 현황
+def index_usage() -> List[Dict[str, Any]]:
+    from app import database
+    conn = database.get_db_connection()
+    if not conn: return []
+    try:
+        with conn.cursor() as cur:
+            cur.execute(INDEX_USAGE_SQL, ([spec["name"] for spec in VECTOR_INDEXES],))
+            return [
+                {"index": row[0], "table": row[1], "scans": row[2], "tuples_read": row[3], "size": row[4]}
+                for row in cur.fetchall()
+            ]
+    finally:
+        database.release_db_connection(conn)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "report"
+    if command == "ensure":
+        ensure_indexes()
+    elif command == "rebuild":
+        rebuild_indexes()
+    ef_search, probes = search_params(3)
+    print(f"[*] 목표 재현율 {VECTOR_RECALL_TARGET} → hnsw.ef_search={ef_search}, ivfflat.probes={probes}")
+    for usage in index_usage():
+        print(f"   - {usage['index']} ({usage['table']}): scans={usage['scans']}, "
+              f"tuples_read={usage['tuples_read']}, size={usage['size']}")
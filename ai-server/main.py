@@ -1,25 +1,45 @@
 from fastapi import FastAPI, HTTPException, Request
-from openai import OpenAI
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app import database
+from app import database, async_database, vector_index
+from app.services import llm_service, preprocess_service
 from app.services.llm_service import LLMService
+from app.services.embedding_cache import embedding_cache
+from app.services.preprocess_queue import preprocess_queue
+from app.services.langflow_client import langflow_client
 from fastapi.middleware.cors import CORSMiddleware
-import requests
-import os
-import uuid
-import os
-import re
+import asyncio
 import json
-import uuid
-import requests
 import textwrap
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List, Optional
+from contextlib import asynccontextmanager
 from sqlalchemy import Integer, create_engine, Column, BigInteger, String, Text, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.dialects.postgresql import JSONB
 
-app = FastAPI(title="Complaint Analyzer AI")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 서버 시작 시 DB 커넥션 풀 생성, 종료 시 정리
+    database.init_pool()
+    await async_database.init_pool()
+    if vector_index.VECTOR_INDEX_AUTO_ENSURE:
+        # 인덱스 생성은 오래 걸릴 수 있으므로 기다리지 않음
+        asyncio.get_running_loop().run_in_executor(None, vector_index.ensure_indexes_safely)
+    asyncio.get_running_loop().run_in_executor(
+        None, database.ensure_embedding_model_column_safely, llm_service.STORED_EMBEDDING_MODEL
+    )
+    preprocess_queue.start(run_preprocess)
+    yield
+    await preprocess_queue.stop()
+    await langflow_client.close()
+    await llm_service.close_client()
+    await async_database.close_pool()
+    database.close_pool()
+
+
+app = FastAPI(title="Complaint Analyzer AI", lifespan=lifespan)
 
 
 # (CORS 설정)
@@ -32,28 +52,43 @@ app.add_middleware(
 )
 
 my_ai_bot = LLMService()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-def get_embedding(text: str):
-    try:
-        response = client.embeddings.create(
-            model="text-embedding-3-large",
-            input=text,
-            dimensions=1024
-        )
-
-        embedding_vector = response.data[0].embedding
-
-        return embedding_vector
-
-    except Exception as e:
-        print(f"OpenAI Embedding Error: {e}")
-        return None
+# LLMService와 같은 비동기 클라이언트와 임베딩 캐시를 재사용
+async def get_embedding(text: str):
+    embedding_vector = await my_ai_bot.get_embedding(text)
+    return embedding_vector or None
 
 @app.get("/")
 async def root():
     return {"message": "서버 연결 성공 "}
 
+# 커넥션 풀 등 서버 상태 지표
+@app.get("/api/v2/metrics")
+async def get_metrics():
+    return {"status": "success", "data": {
+        "db_pool": database.get_pool_stats(),
+        "async_db_pool": async_database.get_pool_stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "preprocess_queue": await preprocess_queue.stats(),
+        "langflow": langflow_client.stats(),
+    }}
+
+# 벡터 인덱스 사용 현황
+@app.get("/api/v2/metrics/vector-indexes")
+async def get_vector_index_metrics():
+    try:
+        usage = await asyncio.to_thread(vector_index.index_usage)
+        ef_search, probes = vector_index.search_params(3)
+        return {"status": "success", "data": {
+            "method": vector_index.VECTOR_INDEX_METHOD,
+            "recall_target": vector_index.VECTOR_RECALL_TARGET,
+            "ef_search": ef_search,
+            "probes": probes,
+            "indexes": usage,
+        }}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
 class ChatRequest(BaseModel):
     query: str = None
     action: str = "chat"
@@ -77,20 +112,104 @@ async def generate_draft_endpoint(complaint_id: int, request: ChatRequest):
         print(f"Error generating draft: {e}")
         return {"status": "error", "message": str(e)}
 
+# --- 스트리밍(SSE) 엔드포인트 ---
+# 검색된 문서(documents) → 토큰 조각(delta) → 완료(done) 순서로 이벤트 전송
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # nginx 프록시 버퍼링 끄기
+}
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/api/v2/complaints/{complaint_id}/generate-draft/stream")
+async def generate_draft_stream_endpoint(complaint_id: int, request: ChatRequest):
+    async def event_stream():
+        try:
+            async for event in my_ai_bot.stream_draft(complaint_id, request.query):
+                yield _sse(event["event"], event["data"])
+        except Exception as e:
+            print(f"Error streaming draft: {e}")
+            yield _sse("error", {"message": str(e)})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/api/v2/complaints/{complaint_id}/ai-chat/stream")
+async def chat_with_ai_stream(complaint_id: int, request: ChatRequest):
+    async def event_stream():
+        # 사용자 메시지는 검색과 동시에 저장
+        save_user_log = None
+        if request.query:
+            save_user_log = asyncio.create_task(
+                async_database.save_chat_log(complaint_id, "user", request.query)
+            )
+
+        answer = None
+        try:
+            async for event in my_ai_bot.stream_response(
+                complaint_id=complaint_id,
+                user_query=request.query,
+                action=request.action
+            ):
+                if event["event"] == "done":
+                    answer = event["data"]["answer"]
+                yield _sse(event["event"], event["data"])
+        except Exception as e:
+            print(f"Error: {e}")
+            yield _sse("error", {"message": str(e)})
+        finally:
+            if save_user_log:
+                await save_user_log
+
+        # 스트림이 끝나면 완성된 답변 저장
+        if answer:
+            await async_database.save_chat_log(complaint_id, "assistant", answer)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+# --- 배치 검색 엔드포인트 ---
+class BatchSearchRequest(BaseModel):
+    complaint_ids: Optional[List[int]] = None
+    vectors: Optional[List[List[float]]] = None
+    limit: int = 3
+
+@app.post("/api/v2/search/batch")
+async def search_batch_endpoint(request: BatchSearchRequest):
+    """
+    [배치 검색]
+    민원 ID 목록(complaint_ids) 또는 벡터 목록(vectors) 중 하나를 받아
+    각 항목의 관련 법령/유사 사례 top-k를 한 번의 쿼리로 반환합니다.
+    """
+    try:
+        results = await async_database.search_batch(
+            complaint_ids=request.complaint_ids,
+            vectors=request.vectors,
+            limit=request.limit
+        )
+        return {"status": "success", "data": results}
+    except Exception as e:
+        print(f"Error in batch search: {e}")
+        return {"status": "error", "message": str(e)}
+
 # AI 채팅 엔드포인트
 @app.post("/api/v2/complaints/{complaint_id}/ai-chat")
 async def chat_with_ai(complaint_id: int, request: ChatRequest):
     try:
-        if request.query:
-            database.save_chat_log(complaint_id, "user", request.query)
-
-        result = await my_ai_bot.generate_response(
+        # 사용자 메시지 저장과 답변 생성은 동시에 진행
+        generation = my_ai_bot.generate_response(
             complaint_id=complaint_id,
             user_query=request.query,
             action=request.action
         )
+        if request.query:
+            _, result = await asyncio.gather(
+                async_database.save_chat_log(complaint_id, "user", request.query),
+                generation
+            )
+        else:
+            result = await generation
         if result and "answer" in result:
-            database.save_chat_log(complaint_id, "assistant", result["answer"])
+            await async_database.save_chat_log(complaint_id, "assistant", result["answer"])
 
         return {"status": "success", "data": result}
     except Exception as e:
@@ -103,7 +222,7 @@ async def chat_with_ai(complaint_id: int, request: ChatRequest):
 async def get_chat_history(complaint_id: int):
     """민원별 과거 채팅 기록 조회"""
     try:
-        logs = database.get_chat_logs(complaint_id)
+        logs = await async_database.get_chat_logs(complaint_id)
         return {"status": "success", "data": logs}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -119,67 +238,24 @@ class ComplaintRequest(BaseModel):
     applicantId: int
     districtId: int
 
+# LangFlow 분석 + 임베딩 (동기 엔드포인트와 작업 큐 워커가 공용으로 사용)
+async def run_preprocess(payload: dict) -> dict:
+    return await preprocess_service.preprocess(payload["title"], payload["body"], get_embedding)
+
 @app.post("/api/complaints/preprocess")
 async def preprocess_complaint(req: ComplaintRequest, request: Request):
     body = await request.body()
     print(f"받은 원본 데이터: {body.decode()}")
     try:
-        api_key = os.getenv("LANGFLOW_KEY")
-        # url = "http://complaint-langflow:7860/api/v1/run/59369f82-0d62-414e-bd20-9bc5f9aa8a50"
-        # 서버 전용 langflow api url
-        url = "http://complaint-langflow:7860/api/v1/run/86111065-2582-4a9f-a41c-ce2d8800d198"
-
         for i in req:
             print(i)
 
-        payload = {
-            "output_type": "chat",
-            "input_type": "text",
-            "tweaks": {
-
-                # "TextInput-MBAG": {
-                #     "input_value": req.title
-                # },
-                # "TextInput-NNDwa": {
-                #     "input_value": req.body
-                # }
-                
-                # 서버 전용
-                "TITLE-srPg5": {
-                    "input_value": req.title
-                },
-                "BODY-hfM2I": {
-                    "input_value": req.body
-                }
-            }
-        }
-        payload["session_id"] = str(uuid.uuid4())
-        headers = {"x-api-key": api_key}
-        response = requests.request("POST", url, json=payload, headers=headers)
-        response.raise_for_status()
-        
-        # 결과 파싱
-        result_json = response.json()
-        ai_text = result_json['outputs'][0]['outputs'][0]['results']['message']['data']['text']
-        
-        embedding_vector = None
-        
-        try:
-            clean_json_str = re.sub(r'```json\n|```', '', ai_text).strip()
-            inner_data = json.loads(clean_json_str)
-            original = inner_data.get("original_analysis", {})
-            text_to_embed = f"{original.get('topic', '')} {original.get('keywords', '')} {original.get('category', '')}"
-        
-            if text_to_embed.strip():
-                embedding_vector = get_embedding(text_to_embed)
-                print(f"임베딩 생성 완료 (차원: {len(embedding_vector)})")
-        except Exception as parse_err:
-            print(f"임베딩 처리 중 파싱 오류: {parse_err}")
+        result = await run_preprocess(req.model_dump())
 
         return {
             "status": "success",
-            "data": ai_text,
-            "embedding": embedding_vector
+            "data": result["data"],
+            "embedding": result["embedding"]
         }
         
     except Exception as e:
@@ -189,6 +265,29 @@ async def preprocess_complaint(req: ComplaintRequest, request: Request):
             "message": str(e)
         }
 
+# --- 전처리 작업 큐 엔드포인트 ---
+# 접수 즉시 job_id를 반환하고, 결과는 상태 조회 엔드포인트로 확인합니다.
+@app.post("/api/complaints/preprocess/jobs", status_code=202)
+async def enqueue_preprocess_job(req: ComplaintRequest):
+    try:
+        job_id = await preprocess_queue.enqueue(req.id, req.model_dump())
+        return {"status": "accepted", "job_id": job_id}
+    except Exception as e:
+        print(f"전처리 작업 등록 실패: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"전처리 작업 등록 실패: {e}")
+
+@app.get("/api/complaints/preprocess/jobs/{job_id}")
+async def get_preprocess_job(job_id: int):
+    """
+    [전처리 작업 상태 조회]
+    status: queued | running | done | failed
+    done이면 result에 동기 엔드포인트와 같은 data/embedding이 들어 있습니다.
+    """
+    job = await preprocess_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return {"status": "success", "data": job}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -5,14 +5,17 @@ import json
 import time
 import logging
 import re
+import select
 import sys
 import warnings
 from datetime import datetime
 from collections import Counter
-from difflib import SequenceMatcher
 from sklearn.cluster import DBSCAN
-from sklearn.metrics.pairwise import cosine_similarity
-from sqlalchemy import create_engine
+import cluster_math
+import group_pool
+from embedding_store import EmbeddingStore
+import incident_representatives
+from incident_writer import IncidentWriter
 
 # 경고 메시지 숨기기
 warnings.filterwarnings("ignore")
@@ -30,8 +33,22 @@ DB_CONFIG = {
 }
 
 # [설정] 실행 주기 및 임계값
-CHECK_INTERVAL = 30         # 실행 주기 (초)
+CHECK_INTERVAL = 300        # 예비 폴링 주기 (초), 평소에는 신규 민원 알림(NOTIFY)으로 바로 실행
+LISTEN_RETRY_SECONDS = 30   # 알림 연결이 끊겼을 때 재연결 시도 간격 (그동안은 이 간격으로 폴링)
+NOTIFY_DEBOUNCE_SECONDS = 0.2  # 첫 알림 후 추가 알림이 없을 때까지 기다리는 시간 (한 번에 모아 처리)
+NOTIFY_MAX_WAIT_SECONDS = 1.0  # 알림이 계속 와도 이 시간이 지나면 처리 시작
 HYBRID_THRESHOLD = 0.65     # 하이브리드 검색 합격 점수 (0~1 사이, 높을수록 엄격)
+NEW_COMPLAINT_LIMIT = 5000  # 한 배치에 처리할 신규 민원 최대 건수
+HYBRID_MERGE_CHUNK = 500    # 하이브리드 검색 한 문장에 넣을 민원 수
+HYBRID_CANDIDATES = 50      # 민원마다 점수를 매길 사건 후보 수 (벡터 거리 순)
+HYBRID_KEYWORD_MAX = 0.2    # 키워드 점수 상한 (겹친 키워드당 0.1, 사건 키워드 합집합이 커도 0.2까지만)
+EMBEDDING_QUANTIZATION = None  # 신규 군집화 임베딩 양자화: None(float32) | "int8" | "binary" (후보만 근사 후 재계산)
+
+# [설정] 밀린 민원 소진 (배치 크기는 처리 시간을 보고 자동 조절)
+DRAIN_INITIAL_BATCH = 500   # 첫 배치 크기
+DRAIN_MIN_BATCH = 100       # 배치 최소 크기 (최대는 NEW_COMPLAINT_LIMIT)
+DRAIN_TARGET_SECONDS = 20   # 배치 하나의 목표 처리 시간 (초)
+DRAIN_PASS_ROWS = 50000     # 한 커서(스냅샷)로 읽을 최대 건수, 넘으면 마지막 id부터 커서를 다시 엶
 
 # 로깅 설정
 logging.basicConfig(
@@ -40,20 +57,9 @@ logging.basicConfig(
     datefmt='%H:%M:%S'
 )
 
-# SQLAlchemy 엔진
-db_url = f"postgresql+psycopg2://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['dbname']}"
-engine = create_engine(db_url)
-
 def get_db_connection():
     return psycopg2.connect(**DB_CONFIG)
 
-def parse_embedding(emb_str):
-    try:
-        if isinstance(emb_str, str): return np.array(json.loads(emb_str))
-        elif isinstance(emb_str, list): return np.array(emb_str)
-        return np.zeros(1024)
-    except: return np.zeros(1024)
-
 def clean_text_for_title(text):
     text = re.sub(r'[^\w\s가-힣]', ' ', text)
     return ' '.join(text.split())
@@ -62,140 +68,169 @@ def clean_text_for_title(text):
 # 2. 거리 계산 로직 (신규 군집 생성용)
 # ==========================================
 
-def calculate_hybrid_distance(embeddings, keywords_list, alpha=0.6):
-    n = len(embeddings)
-    if n == 0: return np.zeros((0, 0))
-    
-    emb_sim = cosine_similarity(embeddings)
-    key_sim = np.zeros((n, n))
-    keyword_sets = [set(k) if k else set() for k in keywords_list]
-
-    for i in range(n):
-        for j in range(i, n):
-            if i == j: key_sim[i][j] = 1.0; continue
-            u_len = len(keyword_sets[i].union(keyword_sets[j]))
-            sim = len(keyword_sets[i].intersection(keyword_sets[j])) / u_len if u_len > 0 else 0.0
-            key_sim[i][j] = key_sim[j][i] = sim
-            
-    dist = 1 - ((emb_sim * alpha) + (key_sim * (1 - alpha)))
-    dist[dist < 0] = 0
-    return dist
+# 거리 ≤ eps인 이웃만 담은 희소 그래프 (n × n 밀집 행렬을 만들지 않음)
+def calculate_hybrid_graph(embeddings, keywords_list, eps, alpha=0.6):
+    return cluster_math.hybrid_radius_graph(embeddings, keywords_list, eps=eps, alpha=alpha, quantization=EMBEDDING_QUANTIZATION)
 
 # ==========================================
 # 3. 핵심 로직: 하이브리드 검색 병합 (팀원 코드 적용)
 # ==========================================
 
-def try_merge_to_existing_incidents_hybrid(conn, new_df):
-    """
-    팀원분의 SQL 아이디어를 적용한 하이브리드 검색 함수.
-    Python 반복문 대신 DB 쿼리로 최적의 사건을 찾습니다.
-    """
-    cursor = conn.cursor()
-    merged_ids = []
-    
-    logging.info(f"🔍 [하이브리드 검색] 신규 민원 {len(new_df)}건을 DB 엔진으로 정밀 대조합니다.")
-
-    # ------------------------------------------------------------------
-    # [SQL 설명] 
-    # 1. v_score: pgvector의 코사인 거리 (1 - 거리 = 유사도)
-    # 2. k_score: JSONB 키워드가 얼마나 겹치는지 확인 (교집합 개수)
-    # 3. bonus: 지역구가 같으면 가산점 (+0.2)
-    # ------------------------------------------------------------------
-    hybrid_search_sql = """
-    WITH existing_incidents AS (
+# ------------------------------------------------------------------
+# [SQL 설명]
+# 신규 민원 묶음(new_complaints)을 한 번에 넘기고, 민원마다 LATERAL로 최고 점수 사건 1개를 찾습니다.
+# 비교 대상은 사건별 대표값(incident_representatives, OPEN 사건당 1행)이며,
+# HNSW 인덱스로 벡터가 가까운 사건 HYBRID_CANDIDATES개만 먼저 뽑아 점수를 매깁니다.
+# 1. v_score: pgvector의 코사인 거리 (1 - 거리 = 유사도), 사건 중심점 기준
+# 2. k_score: 사건 키워드 합집합과 겹치는 키워드 개수 × 0.1, HYBRID_KEYWORD_MAX까지만
+#    (민원이 많은 사건일수록 합집합이 커지므로 상한이 없으면 키워드+보너스만으로 기준을 넘을 수 있음)
+# 3. bonus: 지역구가 같으면 가산점 (+0.2)
+# ------------------------------------------------------------------
+HYBRID_SEARCH_BATCH_SQL = """
+WITH new_complaints AS (
+    SELECT q.complaint_id, q.embedding::vector AS embedding, q.keywords, q.district_id
+    FROM jsonb_to_recordset(%(complaints)s::jsonb)
+        AS q(complaint_id bigint, embedding real[], keywords text[], district_id bigint)
+)
+SELECT 
+    q.complaint_id,
+    best.incident_id,
+    best.title,
+    best.final_score,
+    best.v_score, best.k_score, best.bonus
+FROM new_complaints q
+CROSS JOIN LATERAL (
+    SELECT 
+        incident_id, 
+        title, 
+        (v_score * 0.6 + k_score + bonus) AS final_score,
+        v_score, k_score, bonus
+    FROM (
         SELECT 
-            i.id AS incident_id,
+            cand.incident_id,
             i.title,
-            n.embedding,
-            n.keywords_jsonb,
-            n.district_id
-        FROM incidents i
-        JOIN complaints c ON c.incident_id = i.id
-        JOIN complaint_normalizations n ON n.complaint_id = c.id
-        WHERE i.status = 'OPEN' 
-          AND i.opened_at > NOW() - INTERVAL '5 years'
-          AND n.embedding IS NOT NULL
-    ),
-    scores AS (
-        SELECT 
-            incident_id,
-            title,
             -- [1] 벡터 유사도 (비중 0.6)
-            (1 - (embedding <=> %s::vector)) AS v_score,
+            (1 - cand.distance) AS v_score,
             
             -- [2] 키워드 유사도 (비중 0.2)
-            (SELECT COUNT(*) 
-             FROM jsonb_array_elements_text(keywords_jsonb) k 
-             WHERE k = ANY(%s::text[])) * 0.1 AS k_score,
+            LEAST(cardinality(ARRAY(
+                SELECT unnest(cand.keywords) INTERSECT SELECT unnest(q.keywords)
+            )) * 0.1, %(keyword_max)s) AS k_score,
              
             -- [3] 보너스 (비중 0.2)
-            CASE WHEN district_id = %s THEN 0.2 ELSE 0 END AS bonus
-        FROM existing_incidents
-    )
-    SELECT 
-        incident_id, 
-        title, 
-        (v_score * 0.6 + k_score + bonus) AS final_score,
-        v_score, k_score, bonus
-    FROM scores
-    WHERE (v_score * 0.6 + k_score + bonus) > %s
+            CASE WHEN cand.district_id = q.district_id THEN 0.2 ELSE 0 END AS bonus
+        FROM (
+            SELECT r.incident_id, r.keywords, r.district_id, r.centroid <=> q.embedding AS distance
+            FROM incident_representatives r
+            ORDER BY r.centroid <=> q.embedding
+            LIMIT %(candidates)s
+        ) cand
+        JOIN incidents i ON i.id = cand.incident_id
+        WHERE i.status = 'OPEN' 
+          AND i.opened_at > NOW() - INTERVAL '5 years'
+    ) scores
+    WHERE (v_score * 0.6 + k_score + bonus) > %(threshold)s
     ORDER BY final_score DESC
-    LIMIT 1;
-    """
+    LIMIT 1
+) best;
+"""
+
+# 후보 수만큼 HNSW 탐색 폭 확보 (트랜잭션 범위)
+SET_EF_SEARCH_SQL = "SELECT set_config('hnsw.ef_search', %s, true)"
+
+# 병합 결과 반영 (민원 연결 + 사건별 건수 증가)을 각각 한 문장으로 처리
+LINK_COMPLAINTS_SQL = """
+    UPDATE complaints c
+    SET incident_id = m.incident_id, incident_linked_at = NOW(), incident_link_score = m.score
+    FROM unnest(%s::bigint[], %s::bigint[], %s::float8[]) AS m(complaint_id, incident_id, score)
+    WHERE c.id = m.complaint_id
+"""
+
+BUMP_INCIDENTS_SQL = """
+    UPDATE incidents i
+    SET complaint_count = i.complaint_count + m.cnt, status = 'OPEN'
+    FROM (
+        SELECT incident_id, COUNT(*) AS cnt
+        FROM unnest(%s::bigint[]) AS t(incident_id)
+        GROUP BY incident_id
+    ) m
+    WHERE i.id = m.incident_id
+"""
+
+def _hybrid_search_payload(chunk_df):
+    complaints = []
+    skipped = []
+    for _, row in chunk_df.iterrows():
+        # 1. 벡터: 문자열이면 리스트로 변환
+        # NULL/깨진/NaN 벡터는 대조에서 빼고 (매칭 없음 → 신규 군집화로) 청크 전체가 실패하지 않게 함
+        try:
+            emb_val = row['embedding']
+            if isinstance(emb_val, str): emb_val = json.loads(emb_val)
+            embedding = [float(v) for v in emb_val]
+            if not embedding or not np.isfinite(embedding).all():
+                raise ValueError("empty or non-finite")
+        except (TypeError, ValueError):
+            skipped.append(int(row['id']))
+            continue
 
-    for idx, row in new_df.iterrows():
-        # 파라미터 준비
-        # 1. 벡터: 리스트를 문자열로 변환 (PostgreSQL vector 형식)
-        emb_val = row['embedding']
-        if isinstance(emb_val, str): emb_val = json.loads(emb_val)
-        emb_str = str(emb_val).replace(' ', '') # 공백 제거 등 포맷팅
-        
-        # 2. 키워드: 리스트 (PostgreSQL 배열로 변환)
-        my_keywords = row['keywords_jsonb'] if row['keywords_jsonb'] else []
-        
-        # 3. 지역구 ID
-        my_dist_id = int(row['district_id']) if row['district_id'] > 0 else 0
+        complaints.append({
+            "complaint_id": int(row['id']),
+            "embedding": embedding,
+            # 2. 키워드: 리스트 (PostgreSQL 배열로 변환)
+            "keywords": row['keywords_jsonb'] if row['keywords_jsonb'] else [],
+            # 3. 지역구 ID
+            "district_id": int(row['district_id']) if row['district_id'] > 0 else 0,
+        })
+    if skipped:
+        logging.warning(f"   ⚠️ [하이브리드 검색] 임베딩이 없거나 잘못된 민원 {len(skipped)}건은 대조에서 제외: {skipped[:10]}")
+    return json.dumps(complaints, ensure_ascii=False)
 
-        # 로그용 ID
-        my_id = row['id']
+def try_merge_to_existing_incidents_hybrid(conn, new_df):
+    """
+    팀원분의 SQL 아이디어를 적용한 하이브리드 검색 함수.
+    신규 민원 HYBRID_MERGE_CHUNK건씩 한 문장으로 최적의 사건을 찾고, 결과를 한 번에 반영합니다.
+    사건 대표값은 민원 연결(UPDATE complaints) 시 트리거가 같은 트랜잭션에서 갱신합니다.
+    """
+    cursor = conn.cursor()
+    merged_ids = []
+    
+    logging.info(f"🔍 [하이브리드 검색] 신규 민원 {len(new_df)}건을 DB 엔진으로 정밀 대조합니다.")
 
+    for start in range(0, len(new_df), HYBRID_MERGE_CHUNK):
+        chunk_df = new_df.iloc[start:start + HYBRID_MERGE_CHUNK]
         try:
-            # SQL 실행 (Threshold 값 전달)
-            cursor.execute(hybrid_search_sql, (emb_str, my_keywords, my_dist_id, HYBRID_THRESHOLD))
-            result = cursor.fetchone()
-
-            if result:
-                best_inc_id, best_title, final_score, v, k, b = result
-                
-                print(f"   👉 [매칭 성공] 사건 #{best_inc_id} ('{best_title[:15]}...')")
+            cursor.execute(SET_EF_SEARCH_SQL, (str(max(HYBRID_CANDIDATES, 40)),))
+            cursor.execute(HYBRID_SEARCH_BATCH_SQL, {
+                "complaints": _hybrid_search_payload(chunk_df),
+                "candidates": HYBRID_CANDIDATES,
+                "threshold": HYBRID_THRESHOLD,
+                "keyword_max": HYBRID_KEYWORD_MAX
+            })
+            matches = cursor.fetchall()
+            if not matches:
+                continue
+
+            for my_id, best_inc_id, best_title, final_score, v, k, b in matches:
+                print(f"   👉 [매칭 성공] 민원 #{my_id} -> 사건 #{best_inc_id} ('{best_title[:15]}...')")
                 print(f"      - 최종 점수: {final_score:.4f} (기준: {HYBRID_THRESHOLD})")
                 print(f"      - 상세: 벡터({v:.2f}) + 키워드({k:.2f}) + 보너스({b:.2f})")
 
-                # DB 업데이트 (병합)
-                cursor.execute("""
-                    UPDATE complaints 
-                    SET incident_id = %s, incident_linked_at = NOW(), incident_link_score = %s 
-                    WHERE id = %s
-                """, (best_inc_id, float(final_score), int(my_id)))
-                
-                # 사건 상태 갱신 (OPEN 유지/전환)
-                cursor.execute("""
-                    UPDATE incidents 
-                    SET complaint_count = complaint_count + 1, status = 'OPEN' 
-                    WHERE id = %s
-                """, (best_inc_id,))
-                
-                logging.info(f"   🎉 [병합 완료] 민원 #{my_id} -> 사건 #{best_inc_id}")
-                merged_ids.append(my_id)
+            complaint_ids = [m[0] for m in matches]
+            incident_ids = [m[1] for m in matches]
+
+            # DB 업데이트 (병합) + 사건 상태 갱신 (OPEN 유지/전환)
+            cursor.execute(LINK_COMPLAINTS_SQL, (complaint_ids, incident_ids, [float(m[3]) for m in matches]))
+            cursor.execute(BUMP_INCIDENTS_SQL, (incident_ids,))
+            conn.commit()
+
+            logging.info(f"   🎉 [병합 완료] {len(matches)}건 (사건 {len(set(incident_ids))}개)")
+            merged_ids.extend(complaint_ids)
 
         except Exception as e:
             # 벡터 형식이 잘못되었거나 pgvector가 없으면 에러 발생 가능
             logging.error(f"   ❌ SQL 실행 에러: {e}")
-            conn.rollback() 
-        
-        time.sleep(0.1)
+            conn.rollback()
 
-    conn.commit()
     cursor.close()
     
     # 병합되지 않은 나머지 데이터프레임 반환
@@ -205,41 +240,57 @@ def try_merge_to_existing_incidents_hybrid(conn, new_df):
 # 4. 신규 군집 생성 (남은 것들끼리 뭉치기)
 # ==========================================
 
+# 지역구 하나의 DBSCAN 라벨 (DB 접근 없음, 프로세스 풀 워커에서도 실행)
+def cluster_district(embeddings, keywords_list):
+    # 여기서는 여전히 DBSCAN 사용 (우리끼리 뭉칠 때는 이게 최고)
+    l1_graph = calculate_hybrid_graph(embeddings, keywords_list, eps=0.2, alpha=0.6)
+    return DBSCAN(eps=0.2, min_samples=2, metric='precomputed').fit_predict(l1_graph)
+
 def cluster_remaining_complaints(conn, df):
     if df.empty: return
 
     logging.info(f"🧩 [신규 군집화] 남은 민원 {len(df)}건 처리 중...")
-    cursor = conn.cursor()
+    writer = IncidentWriter()
     
+    df = df.reset_index(drop=True)
     df['district_id'] = df['district_id'].fillna(0)
     grouped = df.groupby('district_id')
 
+    # 단독 민원 (Noise)
     for dist_id, group in grouped:
         if len(group) < 2:
-            # 단독 민원 (Noise)
-            save_incident(cursor, group, is_noise=True)
-            continue
+            save_incident(writer, group, is_noise=True)
 
-        embeddings = np.array([parse_embedding(e) for e in group['embedding']])
-        keywords_list = [k if k else [] for k in group['keywords_jsonb'].tolist()]
-        
-        # 여기서는 여전히 DBSCAN 사용 (우리끼리 뭉칠 때는 이게 최고)
-        l1_dist = calculate_hybrid_distance(embeddings, keywords_list, alpha=0.6)
-        l1_labels = DBSCAN(eps=0.2, min_samples=2, metric='precomputed').fit_predict(l1_dist)
+    # 지역구별 계산은 프로세스 풀에서 병렬로 (임베딩은 공유 메모리), 저장은 아래에서 한 트랜잭션으로
+    groups = [group for _, group in grouped if len(group) >= 2]
+    embeddings = EmbeddingStore.from_values(df['embedding']).vectors
+    tasks = [(group.index.to_numpy(), [k if k else [] for k in group['keywords_jsonb'].tolist()]) for group in groups]
+    results = group_pool.map_groups(cluster_district, embeddings, tasks)
 
+    for group, l1_labels in zip(groups, results):
         for l1_lab in set(l1_labels):
             l1_indices = np.where(l1_labels == l1_lab)[0]
             l1_df = group.iloc[l1_indices]
 
             if l1_lab == -1: 
-                save_incident(cursor, l1_df, is_noise=True)
+                save_incident(writer, l1_df, is_noise=True)
             else:
-                save_incident(cursor, l1_df, is_noise=False)
+                save_incident(writer, l1_df, is_noise=False)
 
-    conn.commit()
-    cursor.close()
+    # 새 사건 INSERT + 민원 연결을 한 번에 저장
+    cursor = conn.cursor()
+    try:
+        for inc_id, title, count in writer.flush(cursor):
+            logging.info(f"   🆕 [새 사건 생성] #{inc_id} : {title} ({count}건)")
+        conn.commit()
+    except Exception as e:
+        logging.error(f"   ❌ 사건 저장 실패: {e}")
+        conn.rollback()
+    finally:
+        cursor.close()
 
-def save_incident(cursor, df, is_noise=False):
+# 사건 하나를 저장 대기열(writer)에 추가 (실제 저장은 writer.flush에서 한 번에)
+def save_incident(writer, df, is_noise=False):
     if df.empty: return
 
     iterator = df.iterrows() if is_noise else [(None, df)]
@@ -248,11 +299,9 @@ def save_incident(cursor, df, is_noise=False):
         if is_noise:
             target_df = pd.DataFrame([row_data])
             row_item = row_data
-            count = 1
         else:
             target_df = row_data
             row_item = target_df.iloc[0]
-            count = len(target_df)
 
         dist_name = row_item['district_name'] if row_item['district_name'] else "서울시"
         
@@ -272,28 +321,11 @@ def save_incident(cursor, df, is_noise=False):
 
         d_id = int(row_item['district_id']) if row_item['district_id'] > 0 else None
         
-        try:
-            if is_noise:
-                # 노이즈는 저장 안 함 (필요 시 주석 해제)
-                pass
-            else:
-                cursor.execute("""
-                    INSERT INTO incidents (title, status, complaint_count, keywords, district_id, opened_at)
-                    VALUES (%s, 'OPEN', %s, %s, %s, NOW())
-                    RETURNING id
-                """, (title, count, keywords_str, d_id))
-                inc_id = cursor.fetchone()[0]
-
-                ids = tuple(target_df['id'].tolist())
-                cursor.execute(f"""
-                    UPDATE complaints 
-                    SET incident_id = %s, incident_linked_at = NOW(), incident_link_score = 0.95 
-                    WHERE id IN %s
-                """, (inc_id, ids))
-                
-                logging.info(f"   🆕 [새 사건 생성] #{inc_id} : {title} ({count}건)")
-        except Exception as e:
-            logging.error(f"   ❌ 사건 저장 실패: {e}")
+        if is_noise:
+            # 노이즈는 저장 안 함 (필요 시 주석 해제)
+            pass
+        else:
+            writer.add(title, target_df['id'].tolist(), keywords_str, d_id)
 
 # ==========================================
 # 5. 상태 동기화
@@ -328,53 +360,219 @@ def sync_incident_status(conn):
 # 6. 메인 실행 루프
 # ==========================================
 
-def run_daily_job():
-    with engine.begin() as conn:
-        try:
-            # 1. 신규 민원 조회 (아직 사건 번호 없는 것)
-            sql = """
-                SELECT n.complaint_id as id, n.core_request, n.embedding,
-                    n.keywords_jsonb, n.district_id, n.target_object, 
-                    d.name as district_name
-                FROM complaint_normalizations n
-                JOIN complaints c ON n.complaint_id = c.id
-                LEFT JOIN districts d ON n.district_id = d.id
-                WHERE c.incident_id IS NULL 
-                LIMIT 100        
-            """
-            new_df = pd.read_sql(sql, conn)
-            new_df['district_id'] = new_df['district_id'].fillna(0)
-
-            if not new_df.empty:
-                logging.info(f"🚀 신규 민원 {len(new_df)}건 감지 및 처리 시작")
-                
-                # psycopg2 전용 로직이 필요하다면 raw connection 활용
-                raw_conn = conn.connection
-                
-                # [Step 1] 하이브리드 병합
-                remaining_df = try_merge_to_existing_incidents_hybrid(raw_conn, new_df)
-                
-                # [Step 2] 신규 군집화
-                if not remaining_df.empty:
-                    cluster_remaining_complaints(raw_conn, remaining_df)
-                
-                logging.info("✅ 주기적 군집화 작업 완료")
-            
-            # 상태 동기화
-            sync_incident_status(raw_conn)
+# 신규 민원 (아직 사건 번호 없는 것)을 정규화 id 순으로 읽음 (keyset: 마지막으로 읽은 정규화 id 다음부터)
+# 정규화는 민원 id 순서와 다르게 커밋되므로 알림 워터마크도 정규화 id 기준으로 잡음
+NEW_COMPLAINTS_SQL = """
+    SELECT n.id as normalization_id, n.complaint_id as id, n.core_request, n.embedding,
+        n.keywords_jsonb, n.district_id, n.target_object, 
+        d.name as district_name
+    FROM complaint_normalizations n
+    JOIN complaints c ON n.complaint_id = c.id
+    LEFT JOIN districts d ON n.district_id = d.id
+    WHERE c.incident_id IS NULL 
+      AND n.id > %(after)s
+    ORDER BY n.id
+"""
+
+def process_batch(conn, new_df):
+    # [Step 1] 하이브리드 병합
+    remaining_df = try_merge_to_existing_incidents_hybrid(conn, new_df)
+
+    # [Step 2] 신규 군집화
+    if not remaining_df.empty:
+        cluster_remaining_complaints(conn, remaining_df)
+
+def next_batch_size(size, rows, elapsed):
+    # 이번 배치의 건당 처리 시간으로 목표 시간에 맞는 크기를 추정 (한 번에 절반~2배까지만 변경)
+    if rows < size or elapsed <= 0:
+        return size
+    estimated = rows * DRAIN_TARGET_SECONDS / elapsed
+    estimated = min(max(estimated, size * 0.5), size * 2)
+    return int(min(max(estimated, DRAIN_MIN_BATCH), NEW_COMPLAINT_LIMIT))
+
+def drain_backlog(after=0, batch_size=DRAIN_INITIAL_BATCH, sync_status=True):
+    """
+    정규화 id가 after보다 큰, 사건 번호 없는 민원을 더 읽을 것이 없을 때까지 배치 단위로 처리합니다.
+    - 읽기 전용 연결의 서버 측 커서(named cursor)로 필요한 만큼만 가져옴 (전체를 메모리에 올리지 않음)
+    - 정규화 id keyset으로 이어서 읽으므로, 커서를 다시 열어도 처리한 구간을 다시 읽지 않음
+    - 배치마다 처리 시간을 재서 다음 배치 크기를 조절하고 처리량(건/초)을 남김
+    반환값: (처리 건수, 마지막으로 읽은 정규화 id)
+    """
+    reader = get_db_connection()
+    writer = get_db_connection()
+    total = 0
+    size = batch_size
+    started = time.perf_counter()
 
-        except Exception as e:
-            logging.error(f"❌ 작업 중 에러 발생: {e}")
+    try:
+        while True:
+            pass_rows = 0
+            with reader.cursor(name="daily_backlog") as cursor:
+                cursor.execute(NEW_COMPLAINTS_SQL, {"after": after})
+                while pass_rows < DRAIN_PASS_ROWS:
+                    rows = cursor.fetchmany(size)
+                    if not rows: break
+
+                    new_df = pd.DataFrame(rows, columns=[col[0] for col in cursor.description])
+                    new_df['district_id'] = new_df['district_id'].fillna(0)
+                    after = int(new_df['normalization_id'].iloc[-1])
+                    new_df = new_df.drop(columns=['normalization_id'])
+
+                    logging.info(f"🚀 신규 민원 {len(new_df)}건 감지 및 처리 시작 (정규화 #{int(rows[0][0])} ~ #{after})")
+                    batch_started = time.perf_counter()
+                    process_batch(writer, new_df)
+                    elapsed = time.perf_counter() - batch_started
+
+                    total += len(rows)
+                    pass_rows += len(rows)
+                    total_elapsed = time.perf_counter() - started
+                    next_size = next_batch_size(size, len(rows), elapsed)
+                    logging.info(
+                        f"   📈 [처리량] 배치 {len(rows)}건 {elapsed:.1f}초 ({len(rows) / max(elapsed, 1e-9):.1f}건/초) | "
+                        f"누적 {total}건 {total_elapsed:.1f}초 ({total / max(total_elapsed, 1e-9):.1f}건/초) | 다음 배치 {next_size}건"
+                    )
+                    size = next_size
+            # 커서를 닫고 읽기 트랜잭션(스냅샷) 종료 → 그 사이 들어온 민원은 다음 커서에서 읽음
+            reader.commit()
+            if pass_rows == 0: break
+
+        if total:
+            logging.info("✅ 주기적 군집화 작업 완료")
+
+        # 상태 동기화
+        if sync_status:
+            sync_incident_status(writer)
+    finally:
+        reader.close()
+        writer.close()
+
+    return total, after
+
+def run_daily_job(after=0):
+    """
+    after=0: 전체 실행 (남아 있는 노이즈 민원까지 다시 보고 상태 동기화)
+    after>0: 알림으로 깨어난 실행 (지난번 이후 들어온 민원만 처리)
+    반환값: 다음 알림 실행에서 이어 읽을 정규화 id
+    """
+    try:
+        _, last_id = drain_backlog(after=after, sync_status=(after == 0))
+        return max(after, last_id)
+    except Exception as e:
+        logging.error(f"❌ 작업 중 에러 발생: {e}")
+        return after
+
+# ==========================================
+# 7. 신규 민원 알림 (LISTEN/NOTIFY)
+# ==========================================
+
+NOTIFY_CHANNEL = "complaint_normalized"
+
+# complaint_normalizations INSERT 문장마다 알림 1회 (같은 트랜잭션의 같은 알림은 PostgreSQL이 하나로 합침)
+# 재연결마다 실행되므로 DROP 없이 CREATE OR REPLACE 로 교체 (적재 중인 테이블을 오래 잠그지 않음)
+NOTIFY_SCHEMA_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_complaint_normalized() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{NOTIFY_CHANNEL}', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER complaint_normalizations_notify
+    AFTER INSERT ON complaint_normalizations
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_complaint_normalized();
+"""
+
+def open_listener():
+    # 알림 전용 연결 (autocommit이어야 트랜잭션 밖에서 알림을 바로 받음)
+    conn = get_db_connection()
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(NOTIFY_SCHEMA_SQL)
+        cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+    return conn
+
+def wait_for_notifications(conn, timeout):
+    """
+    알림이 올 때까지 최대 timeout초 대기합니다. (대기 중에는 DB에 쿼리하지 않음)
+    첫 알림 이후에는 NOTIFY_DEBOUNCE_SECONDS 동안 조용해지거나 NOTIFY_MAX_WAIT_SECONDS가 지날 때까지 모아서 반환합니다.
+    반환값: 받은 알림 수 (0이면 시간 초과)
+    """
+    if not select.select([conn], [], [], timeout)[0]:
+        return 0
+    conn.poll()
+    received = len(conn.notifies)
+    conn.notifies.clear()
+
+    deadline = time.monotonic() + NOTIFY_MAX_WAIT_SECONDS
+    while True:
+        remaining = min(NOTIFY_DEBOUNCE_SECONDS, deadline - time.monotonic())
+        if remaining <= 0 or not select.select([conn], [], [], remaining)[0]:
+            break
+        conn.poll()
+        received += len(conn.notifies)
+        conn.notifies.clear()
+    return received
 
 def wait_interval(duration):
     # logging.debug(f"{duration}초 대기 중...") # 굳이 안 남겨도 됨
     time.sleep(duration)
 
+def ensure_representatives():
+    # 사건 대표값 테이블/인덱스/트리거 준비 (실패해도 서비스는 계속 동작)
+    try:
+        conn = get_db_connection()
+    except Exception as e:
+        logging.error(f"❌ 사건 대표값 테이블 준비 실패 (DB 연결): {e}")
+        return
+    try:
+        incident_representatives.ensure_schema(conn)
+    except Exception as e:
+        logging.error(f"❌ 사건 대표값 테이블 준비 실패: {e}")
+    finally:
+        conn.close()
+
 if __name__ == "__main__":
+    # --drain: 대량 적재(migrate_data) 직후처럼 밀린 민원만 모두 처리하고 종료
+    drain_only = "--drain" in sys.argv
+
     logging.info("🤖 [Hybrid Cluster] 서버 서비스 시작")
+    ensure_representatives()
     logging.info(f"   - 하이브리드 점수 기준: {HYBRID_THRESHOLD}점")
     print("="*60 + "\n")
 
-    while True:
+    if drain_only:
         run_daily_job()
-        wait_interval(CHECK_INTERVAL)
\ No newline at end of file
+        sys.exit(0)
+
+    listener = None
+    watermark = 0
+    next_full_run = 0
+
+    while True:
+        if listener is None:
+            try:
+                listener = open_listener()
+                logging.info(f"👂 [알림 대기] '{NOTIFY_CHANNEL}' 채널 구독 (예비 폴링 {CHECK_INTERVAL}초)")
+            except Exception as e:
+                logging.error(f"❌ 알림 구독 실패, {LISTEN_RETRY_SECONDS}초 간격 폴링으로 동작: {e}")
+
+        # 예비 폴링: 놓친 알림, 노이즈로 남은 민원 재검토, 사건 상태 동기화
+        if time.monotonic() >= next_full_run:
+            watermark = max(watermark, run_daily_job())
+            next_full_run = time.monotonic() + (CHECK_INTERVAL if listener else LISTEN_RETRY_SECONDS)
+
+        if listener is None:
+            wait_interval(max(0, next_full_run - time.monotonic()))
+            continue
+
+        try:
+            received = wait_for_notifications(listener, max(0, next_full_run - time.monotonic()))
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            logging.error(f"❌ 알림 연결 끊김: {e}")
+            listener.close()
+            listener = None
+            next_full_run = 0
+            continue
+
+        if received:
+            watermark = run_daily_job(after=watermark)
\ No newline at end of file
@@ -0,0 +1,113 @@
+import argparse
+import time
+
+import numpy as np
+
+import cluster_math
+
+# ==========================================
+# cluster_math 벤치마크 (기존 이중 루프 vs 희소 행렬 곱)
+# ==========================================
+# 사용법: python bench_cluster_math.py --sizes 1000 10000 50000
+# - 작은 n에서 기존 구현과 결과가 같은지 먼저 확인합니다.
+# - 기존 구현은 O(n²)이라 큰 n에서는 앞쪽 일부 행만 돌려 전체 시간을 추정합니다.
+# - 희소 구현은 n × n 행렬을 만들지 않고 블록을 순회하며 같은 값을 계산합니다(메모리 제한 확인용).
+
+
+def legacy_similarity(keywords_list):
+    # Daily_cluster / init_clustering의 기존 구현
+    n = len(keywords_list)
+    key_sim = np.zeros((n, n))
+    keyword_sets = [set(k) if k else set() for k in keywords_list]
+    for i in range(n):
+        for j in range(i, n):
+            if i == j: key_sim[i][j] = 1.0; continue
+            u_len = len(keyword_sets[i].union(keyword_sets[j]))
+            sim = len(keyword_sets[i].intersection(keyword_sets[j])) / u_len if u_len > 0 else 0.0
+            key_sim[i][j] = key_sim[j][i] = sim
+    return key_sim
+
+
+def legacy_distance(keywords_list):
+    # incident_cluster의 기존 구현
+    n = len(keywords_list)
+    dist_matrix = np.ones((n, n))
+    for i in range(n):
+        for j in range(i, n):
+            set1 = keywords_list[i]
+            set2 = keywords_list[j]
+            if not set1 and not set2: dist = 0.5
+            elif not set1 or not set2: dist = 1.0
+            else:
+                inter = len(set1.intersection(set2))
+                union = len(set1.union(set2))
+                dist = 1.0 - (inter / union if union else 0)
+            dist_matrix[i, j] = dist
+            dist_matrix[j, i] = dist
+    return dist_matrix
+
+
+def make_keywords(n, vocab_size=3000, empty_ratio=0.05, seed=0):
+    # 실제 민원 키워드처럼 일부 단어에 몰리는 분포(Zipf)로 3~8개씩 생성
+    rng = np.random.default_rng(seed)
+    vocab = [f"키워드{i}" for i in range(vocab_size)]
+    weights = 1.0 / np.arange(1, vocab_size + 1)
+    weights /= weights.sum()
+    keywords_list = []
+    for _ in range(n):
+        if rng.random() < empty_ratio:
+            keywords_list.append(set())
+            continue
+        size = rng.integers(3, 9)
+        keywords_list.append({vocab[i] for i in rng.choice(vocab_size, size=size, p=weights)})
+    return keywords_list
+
+
+def check_equal(n=400):
+    keywords_list = make_keywords(n, vocab_size=60, empty_ratio=0.1, seed=1)
+    assert np.array_equal(legacy_similarity(keywords_list), cluster_math.jaccard_similarity(keywords_list, chunk_size=37))
+    assert np.array_equal(legacy_distance(keywords_list), cluster_math.jaccard_distance(keywords_list, chunk_size=37))
+    print(f"[*] 결과 일치 확인 (n={n})")
+
+
+def time_legacy(keywords_list, sample_rows):
+    # 앞쪽 sample_rows개 행의 (i, j≥i) 쌍만 돌리고 전체 쌍 수 비율로 추정
+    n = len(keywords_list)
+    sample_rows = min(sample_rows, n)
+    keyword_sets = [set(k) if k else set() for k in keywords_list]
+    started = time.perf_counter()
+    pairs = 0
+    for i in range(sample_rows):
+        for j in range(i, n):
+            u_len = len(keyword_sets[i].union(keyword_sets[j]))
+            _ = len(keyword_sets[i].intersection(keyword_sets[j])) / u_len if u_len > 0 else 0.0
+        pairs += n - i
+    elapsed = time.perf_counter() - started
+    total_pairs = n * (n + 1) / 2
+    return elapsed * total_pairs / pairs, sample_rows < n
+
+
+def time_sparse(keywords_list):
+    started = time.perf_counter()
+    matrix, sizes = cluster_math.keyword_matrix(keywords_list)
+    for _, _, intersection, union in cluster_math.iter_jaccard_blocks(matrix, sizes):
+        block = np.zeros(intersection.shape)
+        np.divide(intersection, union, out=block, where=union > 0)
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--legacy-sample-rows", type=int, default=200)
+    args = parser.parse_args()
+
+    check_equal()
+    print(f"{'n':>8} | {'기존(초)':>12} | {'희소(초)':>10} | {'배속':>8}")
+    for n in args.sizes:
+        keywords_list = make_keywords(n)
+        legacy_sec, estimated = time_legacy(keywords_list, args.legacy_sample_rows)
+        sparse_sec = time_sparse(keywords_list)
+        mark = "*" if estimated else " "
+        print(f"{n:>8} | {legacy_sec:>11.2f}{mark} | {sparse_sec:>10.2f} | {legacy_sec / sparse_sec:>7.1f}x")
+    print("* 일부 행만 실행해 추정한 값")
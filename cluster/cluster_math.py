@@ -0,0 +1,410 @@
+import numpy as np
+from scipy import sparse
+
+from embedding_store import EmbeddingStore
+
+# ==========================================
+# 군집화 공용 계산 모듈
+# ==========================================
+# 키워드 목록을 희소 이진 행렬(민원 × 키워드)로 만들고,
+# 교집합 크기를 희소 행렬 곱(X · Xᵀ)으로 한 번에 계산합니다.
+# 행 블록 단위로 계산하므로 중간 결과 메모리는 블록 크기로 제한됩니다.
+
+MAX_BLOCK_ELEMENTS = 1 << 24  # 블록 하나의 최대 원소 수 (float64 기준 약 128MB)
+
+
+def keyword_matrix(keywords_list):
+    """키워드 목록 → (희소 이진 행렬 CSR, 민원별 키워드 수). 중복 키워드는 한 번만 셉니다."""
+    vocab = {}
+    indptr = [0]
+    indices = []
+    for keywords in keywords_list:
+        cols = {vocab.setdefault(k, len(vocab)) for k in (keywords or ())}
+        indices.extend(sorted(cols))
+        indptr.append(len(indices))
+
+    n = len(keywords_list)
+    data = np.ones(len(indices), dtype=np.int32)
+    matrix = sparse.csr_matrix(
+        (data, np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+        shape=(n, max(len(vocab), 1))
+    )
+    sizes = np.diff(matrix.indptr).astype(np.int64)
+    return matrix, sizes
+
+
+def block_rows(n, chunk_size=None):
+    """n열짜리 행렬을 블록으로 나눌 때 블록당 행 수"""
+    if chunk_size:
+        return chunk_size
+    return max(1, MAX_BLOCK_ELEMENTS // max(n, 1))
+
+
+def iter_jaccard_blocks(matrix, sizes, chunk_size=None):
+    """
+    (start, stop, intersection, union) 블록을 순서대로 반환합니다.
+    intersection/union은 (stop - start) × n 크기의 정수 행렬입니다.
+    """
+    n = matrix.shape[0]
+    transposed = matrix.T.tocsc()
+    step = block_rows(n, chunk_size)
+
+    for start in range(0, n, step):
+        stop = min(start + step, n)
+        intersection = (matrix[start:stop] @ transposed).toarray()
+        union = sizes[start:stop, None] + sizes[None, :] - intersection
+        yield start, stop, intersection, union
+
+
+def jaccard_similarity(keywords_list, chunk_size=None):
+    """
+    키워드 Jaccard 유사도 행렬 (n × n).
+    - 대각선은 1.0
+    - 합집합이 비어 있으면(둘 다 키워드 없음) 0.0
+    Daily_cluster / init_clustering의 기존 이중 루프와 같은 값을 냅니다.
+    """
+    n = len(keywords_list)
+    sim = np.zeros((n, n))
+    if n == 0: return sim
+
+    matrix, sizes = keyword_matrix(keywords_list)
+    for start, stop, intersection, union in iter_jaccard_blocks(matrix, sizes, chunk_size):
+        np.divide(intersection, union, out=sim[start:stop], where=union > 0)
+    np.fill_diagonal(sim, 1.0)
+    return sim
+
+
+def jaccard_distance(keywords_list, chunk_size=None, both_empty=0.5, one_empty=1.0):
+    """
+    키워드 Jaccard 거리 행렬 (n × n), incident_cluster의 규칙을 따릅니다.
+    - 둘 다 키워드 없음: both_empty (대각선 포함)
+    - 한쪽만 없음: one_empty
+    - 그 외: 1 - 교집합/합집합
+    """
+    n = len(keywords_list)
+    dist = np.ones((n, n))
+    if n == 0: return dist
+
+    matrix, sizes = keyword_matrix(keywords_list)
+    empty = sizes == 0
+    for start, stop, intersection, union in iter_jaccard_blocks(matrix, sizes, chunk_size):
+        block = dist[start:stop]
+        np.divide(intersection, union, out=block, where=union > 0)
+        np.subtract(1.0, block, out=block)
+
+        row_empty = empty[start:stop, None]
+        block[row_empty & empty[None, :]] = both_empty
+        block[row_empty ^ empty[None, :]] = one_empty
+    return dist
+
+
+# ==========================================
+# 하이브리드 거리 이웃 그래프 (DBSCAN용 희소 입력)
+# ==========================================
+# n × n 거리 행렬 전체 대신, 거리가 eps 이하인 쌍만 담은 희소 행렬(CSR)을 만듭니다.
+# 행 블록마다 (임베딩 코사인, 키워드 Jaccard) → 거리를 계산하고 eps 이하만 남기므로
+# 메모리는 블록 크기 + 이웃 수에 비례합니다. DBSCAN(metric='precomputed')에 그대로 넣으면
+# 같은 eps의 밀집 행렬과 같은 라벨을 얻습니다.
+#
+# rule
+# - "hybrid"  : 1 - (cos·alpha + jaccard·(1 - alpha)), 음수는 0 (Daily_cluster / init_clustering)
+# - "incident": (1 - cos)·alpha + 키워드 거리·(1 - alpha) (incident_cluster, 빈 키워드 규칙 포함)
+
+# 임베딩은 EmbeddingStore(float32)로 다루며, 저장소에 양자화가 있으면
+# 근사 유사도로 eps + 허용 오차 안의 후보 쌍만 고른 뒤 그 쌍만 정확한 코사인으로 다시 계산합니다.
+
+MIN_GRAPH_DISTANCE = 1e-12  # 희소 행렬에서 거리 0인 이웃이 빠지지 않도록 저장하는 최솟값
+
+
+def _hybrid_block(cos, intersection, union, row_empty, col_empty, alpha, rule):
+    # row_empty / col_empty는 cos와 브로드캐스트되는 모양 (블록: [:, None] / [None, :], 쌍 목록: 1차원)
+    if rule == "hybrid":
+        key_sim = np.zeros(cos.shape)
+        np.divide(intersection, union, out=key_sim, where=union > 0)
+        dist = 1 - ((cos * alpha) + (key_sim * (1 - alpha)))
+        dist[dist < 0] = 0
+        return dist
+
+    if rule == "incident":
+        sem_dist = np.clip(1.0 - cos, 0, 2)
+        key_dist = np.ones(cos.shape)
+        np.divide(intersection, union, out=key_dist, where=union > 0)
+        np.subtract(1.0, key_dist, out=key_dist)
+        key_dist[row_empty & col_empty] = 0.5
+        key_dist[row_empty ^ col_empty] = 1.0
+        return (sem_dist * alpha) + (key_dist * (1 - alpha))
+
+    raise ValueError(f"알 수 없는 거리 규칙: {rule} (hybrid | incident)")
+
+
+def hybrid_radius_graph(embeddings, keywords_list, eps, alpha=0.6, rule="hybrid", chunk_size=None, quantization=None):
+    """
+    거리 ≤ eps인 (i, j) 쌍과 대각선만 담은 희소 거리 행렬 (n × n CSR).
+    DBSCAN(eps=eps, metric='precomputed').fit_predict(graph)로 사용합니다.
+    embeddings: EmbeddingStore 또는 (n, dim) 배열 (배열이면 quantization으로 저장소를 만듦)
+    """
+    n = len(embeddings)
+    if n == 0:
+        return sparse.csr_matrix((0, 0))
+
+    store = embeddings
+    if not isinstance(store, EmbeddingStore):
+        store = EmbeddingStore(embeddings, dim=np.shape(embeddings)[1], quantization=quantization)
+    unit_t = None if store.quantization else np.ascontiguousarray(store.unit().T)
+    matrix, sizes = keyword_matrix(keywords_list)
+    empty = sizes == 0
+
+    rows, cols, values = [], [], []
+    for start, stop, intersection, union in iter_jaccard_blocks(matrix, sizes, chunk_size):
+        block_index = np.arange(stop - start)
+        if unit_t is not None:
+            cos = store.unit(slice(start, stop)) @ unit_t
+        else:
+            cos = store.approx_similarity(slice(start, stop))
+        if rule == "incident":
+            # cosine_distances(X)는 임베딩이 0 벡터여도 자기 자신과의 거리를 0으로 둠
+            cos[block_index, block_index + start] = 1.0
+        dist = _hybrid_block(cos, intersection, union, empty[start:stop, None], empty[None, :], alpha, rule)
+
+        # 대각선(자기 자신과의 거리)은 eps보다 커도 실제 값으로 저장
+        # (키워드/임베딩이 비어 자기 거리가 eps를 넘는 민원을 밀집 행렬과 똑같이 다루기 위함)
+        # 양자화: 코사인 오차 margin이 거리에서는 alpha배이므로 그만큼 넓게 후보를 고름
+        within = dist <= eps + alpha * store.margin
+        within[block_index, block_index + start] = True
+        r, c = np.nonzero(within)
+
+        if unit_t is None:
+            # rescoring: 후보 쌍만 float32 정확 코사인으로 다시 계산해 eps 이하만 남김
+            exact = store.pair_similarity(r + start, c)
+            diagonal = r + start == c
+            if rule == "incident":
+                exact[diagonal] = 1.0
+            pair_dist = _hybrid_block(exact, intersection[r, c], union[r, c], empty[r + start], empty[c], alpha, rule)
+            keep = (pair_dist <= eps) | diagonal
+            r, c, pair_dist = r[keep], c[keep], pair_dist[keep]
+        else:
+            pair_dist = dist[r, c]
+
+        rows.append(r + start)
+        cols.append(c)
+        values.append(np.maximum(pair_dist, MIN_GRAPH_DISTANCE))
+
+    return sparse.csr_matrix(
+        (np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(n, n)
+    )
+
+# ==========================================
+# 활성 사건 중심점 인덱스 (incident_cluster 증분 매칭용)
+# ==========================================
+
+class CentroidIndex:
+    """
+    활성 사건의 중심점(정규화된 float32 행렬)과 키워드 포스팅(키워드 → 사건)을 들고,
+    신규 민원 묶음을 모든 사건과 행렬 곱 한 번으로 비교합니다.
+
+    거리 = (1 - cos)·alpha + 키워드 거리·(1 - alpha)  (hybrid_radius_graph의 "incident" 규칙과 같음)
+    민원은 입력 순서대로 매칭하며, 매칭된 사건의 건수가 anchor_limit 미만이면 중심점을 갱신(Anchoring)하고
+    같은 묶음의 남은 민원에 대해 그 사건 열만 다시 계산합니다.
+    """
+
+    def __init__(self, incident_ids, centroids, keyword_sets, counts, alpha=0.7, anchor_limit=10):
+        self.ids = list(incident_ids)
+        self.alpha = alpha
+        self.anchor_limit = anchor_limit
+
+        self.means = np.array(centroids, dtype=np.float32).reshape(len(self.ids), -1)
+        self.unit = self.means.copy()
+        self._normalize(slice(None))
+        self.counts = np.asarray(counts, dtype=np.int64).copy()
+
+        # 키워드 포스팅: 사건 × 키워드 희소 행렬의 전치(CSC 열 = 키워드별 사건 목록)
+        self._vocab = {}
+        keyword_sets = [set(k) if k else set() for k in keyword_sets]
+        for keywords in keyword_sets:
+            for k in keywords:
+                self._vocab.setdefault(k, len(self._vocab))
+        matrix, self._key_sizes = self._keyword_rows(keyword_sets)
+        self._postings = matrix.T.tocsc()
+        self._key_empty = self._key_sizes == 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _normalize(self, rows):
+        norms = np.linalg.norm(self.unit[rows], axis=-1, keepdims=True)
+        np.divide(self.unit[rows], norms, out=self.unit[rows], where=norms > 0)
+
+    def _keyword_rows(self, keyword_sets):
+        # 인덱스 어휘에 없는 키워드는 교집합에는 기여하지 않지만 크기(합집합)에는 포함
+        indptr, indices, sizes = [0], [], []
+        for keywords in keyword_sets:
+            keywords = set(keywords) if keywords else set()
+            indices.extend(sorted(self._vocab[k] for k in keywords if k in self._vocab))
+            indptr.append(len(indices))
+            sizes.append(len(keywords))
+        matrix = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int32), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(keyword_sets), max(len(self._vocab), 1))
+        )
+        return matrix, np.asarray(sizes, dtype=np.int64)
+
+    def _distances(self, unit_queries, query_keywords, query_sizes, cols=slice(None)):
+        sem_dist = 1.0 - unit_queries @ self.unit[cols].T
+        np.clip(sem_dist, 0, 2, out=sem_dist)
+
+        intersection = (query_keywords @ self._postings[:, cols]).toarray()
+        union = query_sizes[:, None] + self._key_sizes[None, cols] - intersection
+        key_dist = np.ones(intersection.shape, dtype=np.float32)
+        np.divide(intersection, union, out=key_dist, where=union > 0)
+        np.subtract(1.0, key_dist, out=key_dist)
+
+        query_empty = (query_sizes == 0)[:, None]
+        index_empty = self._key_empty[None, cols]
+        key_dist[query_empty & index_empty] = 0.5
+        key_dist[query_empty ^ index_empty] = 1.0
+        return sem_dist * self.alpha + key_dist * (1 - self.alpha)
+
+    def _anchor(self, col, vec):
+        count = self.counts[col]
+        if count < self.anchor_limit:
+            self.means[col] = (self.means[col] * count + vec) / (count + 1)
+            self.unit[col] = self.means[col]
+            self._normalize(col)
+        self.counts[col] = count + 1
+
+    def match(self, vectors, keywords_list, threshold, batch_size=None):
+        """
+        [(사건 ID 또는 None, 최소 거리)] (입력 순서)
+        최소 거리가 threshold 이하인 사건에 매칭하며, 거리가 같으면 먼저 등록된 사건을 고릅니다.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n = len(vectors)
+        if n == 0 or not self.ids:
+            return [(None, 1.0)] * n
+
+        results = []
+        step = block_rows(len(self.ids), batch_size)
+        for start in range(0, n, step):
+            stop = min(start + step, n)
+            batch = vectors[start:stop]
+            unit_batch = batch.copy()
+            norms = np.linalg.norm(unit_batch, axis=1, keepdims=True)
+            np.divide(unit_batch, norms, out=unit_batch, where=norms > 0)
+            batch_keywords, batch_sizes = self._keyword_rows(keywords_list[start:stop])
+
+            dist = self._distances(unit_batch, batch_keywords, batch_sizes)
+            for r in range(stop - start):
+                col = int(np.argmin(dist[r]))
+                min_dist = float(dist[r, col])
+                if min_dist >= 1.0 or min_dist > threshold:
+                    results.append((None, min(min_dist, 1.0)))
+                    continue
+
+                results.append((self.ids[col], min_dist))
+                moved = self.counts[col] < self.anchor_limit
+                self._anchor(col, batch[r])
+                if moved and r + 1 < stop - start:
+                    rest = slice(r + 1, None)
+                    dist[rest, col] = self._distances(
+                        unit_batch[rest], batch_keywords[r + 1:], batch_sizes[rest], cols=[col]
+                    )[:, 0]
+        return results
+
+# ==========================================
+# 문장(core_request) 거리 엔진
+# ==========================================
+# sequence: difflib.SequenceMatcher 비율 (기존 방식, O(n²·L²) 순수 파이썬)
+# tfidf   : 음절 n-gram(2~3) TF-IDF 코사인 거리, 희소 행렬 곱으로 블록 계산
+# shingle : 음절 n-gram 집합의 Jaccard 거리 (위 키워드 Jaccard와 같은 계산)
+#
+# 엔진마다 거리 분포가 다르므로 DBSCAN eps도 엔진별로 둡니다.
+# (compare_text_engines.py로 SequenceMatcher 결과와 가장 비슷해지는 값을 고름)
+
+TEXT_ENGINE_EPS = {
+    "sequence": 0.25,
+    "tfidf": 0.30,
+    "shingle": 0.50,
+}
+
+TEXT_NGRAM_RANGE = (2, 3)
+
+
+def _clean_texts(texts):
+    return [t if isinstance(t, str) else "" for t in texts]
+
+
+def _sequence_distance(texts):
+    from difflib import SequenceMatcher
+
+    n = len(texts)
+    dist_matrix = np.zeros((n, n))
+    for i in range(n):
+        for j in range(i, n):
+            if i == j:
+                dist_matrix[i][j] = 0.0
+                continue
+
+            sim = SequenceMatcher(None, texts[i], texts[j]).ratio()
+            dist = 1.0 - sim
+            dist_matrix[i][j] = dist_matrix[j][i] = dist
+
+    return dist_matrix
+
+
+def _tfidf_distance(texts, chunk_size=None):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    n = len(texts)
+    dist = np.ones((n, n))
+    try:
+        # 한글은 음절 하나가 문자 하나이므로 char n-gram = 음절 n-gram
+        matrix = TfidfVectorizer(analyzer="char_wb", ngram_range=TEXT_NGRAM_RANGE, sublinear_tf=True).fit_transform(texts)
+    except ValueError:
+        # 모든 문장이 비어 있으면 어휘가 없음
+        matrix = None
+
+    if matrix is not None:
+        transposed = matrix.T.tocsc()
+        step = block_rows(n, chunk_size)
+        for start in range(0, n, step):
+            stop = min(start + step, n)
+            np.subtract(1.0, (matrix[start:stop] @ transposed).toarray(), out=dist[start:stop])
+        np.clip(dist, 0.0, 1.0, out=dist)
+    return dist
+
+
+def _shingles(text, size):
+    compact = "".join(text.split())
+    if len(compact) <= size:
+        return {compact} if compact else set()
+    return {compact[i:i + size] for i in range(len(compact) - size + 1)}
+
+
+def _shingle_distance(texts, chunk_size=None):
+    shingle_sets = [_shingles(t, TEXT_NGRAM_RANGE[0]) for t in texts]
+    return 1.0 - jaccard_similarity(shingle_sets, chunk_size)
+
+
+def text_distance(texts, engine="tfidf", chunk_size=None):
+    """
+    문장 거리 행렬 (n × n, 0~1). 대각선과 빈 문장끼리는 0, 빈 문장과 나머지는 1로
+    SequenceMatcher와 같은 규칙을 따릅니다.
+    """
+    texts = _clean_texts(texts)
+    if engine == "sequence":
+        return _sequence_distance(texts)
+    if engine == "tfidf":
+        dist = _tfidf_distance(texts, chunk_size)
+    elif engine == "shingle":
+        dist = _shingle_distance(texts, chunk_size)
+    else:
+        raise ValueError(f"알 수 없는 문장 거리 엔진: {engine} (sequence | tfidf | shingle)")
+
+    empty = np.array([not t for t in texts], dtype=bool)
+    if empty.any():
+        dist[np.ix_(empty, ~empty)] = 1.0
+        dist[np.ix_(~empty, empty)] = 1.0
+        dist[np.ix_(empty, empty)] = 0.0
+    np.fill_diagonal(dist, 0.0)
+    return dist
@@ -0,0 +1,145 @@
+import argparse
+import time
+
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.metrics import adjusted_rand_score
+
+import cluster_math
+
+# ==========================================
+# 3단계(문장) 군집화 엔진 비교
+# ==========================================
+# SequenceMatcher(sequence) 라벨을 기준으로 tfidf / shingle 엔진의 라벨 일치도(ARI)와 속도를 비교하고,
+# 엔진별로 기준 라벨과 가장 비슷해지는 DBSCAN eps를 찾습니다.
+#
+# 사용법:
+#   python compare_text_engines.py                  # 합성 민원 문장
+#   python compare_text_engines.py --from-db         # DB의 core_request (지역구·대상별 그룹)
+#   python compare_text_engines.py --sizes 300 1000 2000
+
+EPS_GRID = np.round(np.arange(0.15, 0.81, 0.05), 2)
+
+TOPICS = [
+    ("불법 주정차", ["차량", "주차", "단속"]),
+    ("가로등 고장", ["가로등", "조명", "불빛"]),
+    ("도로 파손", ["도로", "포트홀", "노면"]),
+    ("쓰레기 무단투기", ["쓰레기", "투기", "폐기물"]),
+    ("공사장 소음", ["공사", "소음", "새벽"]),
+    ("보도블록 파손", ["보도블록", "인도", "보행"]),
+    ("불법 현수막", ["현수막", "광고물", "게시"]),
+    ("하수구 악취", ["하수구", "악취", "냄새"]),
+    ("놀이터 시설 고장", ["놀이터", "그네", "미끄럼틀"]),
+    ("버스정류장 파손", ["정류장", "의자", "유리"]),
+]
+DONGS = ["역삼동", "신사동", "논현동", "대치동", "삼성동", "청담동", "개포동", "일원동", "수서동", "세곡동"]
+SPOTS = ["사거리", "초등학교 정문 앞", "시장 입구", "아파트 후문", "공원 산책로", "주민센터 옆 골목", "대로변 상가 앞"]
+REQUESTS = ["조치 요청", "조치 바랍니다", "빠른 처리 부탁드립니다", "확인 후 해결 요청", "개선해 주세요", "정비 요청드립니다"]
+FILLERS = ["계속", "매일", "너무", "오랫동안", "여러 번", "심각하게", "밤마다"]
+
+
+def make_texts(n, seed=0):
+    """
+    합성 core_request 문장과 정답 사건 번호.
+    (주제, 동, 장소) 조합 하나를 사건으로 보고 표현만 바꿔 생성하며, 사건 크기는 한쪽으로 몰리게(Zipf) 뽑습니다.
+    """
+    rng = np.random.default_rng(seed)
+    incidents = [(t, d, s) for t in range(len(TOPICS)) for d in DONGS for s in SPOTS]
+    weights = 1.0 / np.arange(1, len(incidents) + 1)
+    weights /= weights.sum()
+    order = rng.permutation(len(incidents))
+
+    texts, truth = [], []
+    for incident_no in order[rng.choice(len(incidents), size=n, p=weights)]:
+        topic_no, dong, spot = incidents[incident_no]
+        topic, words = TOPICS[topic_no]
+        parts = [f"{dong} {spot}", topic]
+        if rng.random() < 0.6:
+            parts.insert(int(rng.integers(len(parts) + 1)), FILLERS[rng.integers(len(FILLERS))])
+        if rng.random() < 0.5:
+            parts.append(words[rng.integers(len(words))])
+        if rng.random() < 0.3:
+            parts[0], parts[1] = parts[1], parts[0]
+        parts.append(REQUESTS[rng.integers(len(REQUESTS))])
+        texts.append(" ".join(parts))
+        truth.append(int(incident_no))
+    return texts, np.array(truth)
+
+
+def load_groups_from_db(max_group):
+    import pandas as pd
+    import psycopg2
+    from init_clustering import DB_CONFIG
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        df = pd.read_sql("""
+            SELECT n.district_id, n.target_object, n.core_request
+            FROM complaint_normalizations n
+            WHERE n.is_current = true AND n.core_request IS NOT NULL
+        """, conn)
+    finally:
+        conn.close()
+
+    df['district_id'] = df['district_id'].fillna(0)
+    df['target_object'] = df['target_object'].fillna('기타')
+    return [
+        group['core_request'].tolist()[:max_group]
+        for _, group in df.groupby(['district_id', 'target_object'])
+        if len(group) >= 2
+    ]
+
+
+def combined_labels(dists, eps):
+    # 그룹별 DBSCAN 라벨을 하나로 이어 붙임 (그룹마다 라벨 번호가 겹치지 않게, 노이즈는 -1 유지)
+    combined = []
+    for i, dist in enumerate(dists):
+        labels = DBSCAN(eps=eps, min_samples=2, metric='precomputed').fit_predict(dist)
+        combined.append(np.where(labels >= 0, labels + (i << 20), -1))
+    return np.concatenate(combined)
+
+
+def compare(groups, truth=None):
+    base_eps = cluster_math.TEXT_ENGINE_EPS["sequence"]
+    timings = {}
+    distances = {}
+    for engine in ("sequence", "tfidf", "shingle"):
+        started = time.perf_counter()
+        distances[engine] = [cluster_math.text_distance(texts, engine=engine) for texts in groups]
+        timings[engine] = time.perf_counter() - started
+
+    reference = combined_labels(distances["sequence"], base_eps)
+
+    def score(engine, eps):
+        return adjusted_rand_score(reference, combined_labels(distances[engine], eps))
+
+    def truth_score(engine, eps):
+        if truth is None: return ""
+        return f" | 정답 대비 ARI={adjusted_rand_score(truth, combined_labels(distances[engine], eps)):.3f}"
+
+    total = sum(len(texts) for texts in groups)
+    print(f"\n[*] 그룹 {len(groups)}개 / 문장 {total}건")
+    print(f"   sequence : {timings['sequence']:8.2f}초 (기준, eps={base_eps}){truth_score('sequence', base_eps)}")
+    for engine in ("tfidf", "shingle"):
+        default_eps = cluster_math.TEXT_ENGINE_EPS[engine]
+        sweep = [(float(eps), score(engine, eps)) for eps in EPS_GRID]
+        best_eps, best_ari = max(sweep, key=lambda x: x[1])
+        speedup = timings["sequence"] / timings[engine] if timings[engine] else float("inf")
+        print(f"   {engine:<8} : {timings[engine]:8.2f}초 ({speedup:6.1f}x) | "
+              f"sequence 대비 ARI(eps={default_eps})={score(engine, default_eps):.3f}"
+              f"{truth_score(engine, default_eps)} | 최적 eps={best_eps} (ARI={best_ari:.3f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--from-db", action="store_true")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[300, 1000])
+    parser.add_argument("--max-group", type=int, default=3000)
+    args = parser.parse_args()
+
+    if args.from_db:
+        compare(load_groups_from_db(args.max_group))
+    else:
+        for size in args.sizes:
+            texts, truth = make_texts(size, seed=size)
+            compare([texts], truth)
@@ -0,0 +1,243 @@
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from embedding_store import EMBEDDING_DIM, EmbeddingStore
+
+# ==========================================
+# 오프라인 작업용 임베딩 스냅샷 (메모리 매핑)
+# ==========================================
+# init_clustering / incident_cluster / Cluster_Heatmap 같은 오프라인 작업이 실행할 때마다
+# 운영 DB에서 임베딩 전체를 다시 읽지 않도록, 로컬 디렉터리에 스냅샷을 둡니다.
+#
+#   manifest.json   : 행 수, 차원, 워터마크(마지막 complaint_normalizations.id), 갱신 시각
+#   embeddings.f32  : float32(little-endian) 행렬 (행 수 × 차원), np.memmap으로 읽음
+#   meta.pkl        : 행마다 정규화/민원 메타데이터 (embeddings의 같은 행과 대응)
+#
+# 갱신(refresh)은 워터마크 이후 새 정규화 행의 임베딩만 파일 끝에 이어 붙이고,
+# 자주 바뀌는 작은 열(is_current, incident_id)만 전체 행에 대해 다시 읽습니다.
+# 정규화 id는 커밋 순서와 다를 수 있으므로, 워터마크 이하인데 스냅샷에 없는 id(늦게 커밋된 행)도
+# 갱신마다 찾아서 함께 붙입니다. (그래서 행 순서가 id 순서와 다를 수 있음)
+# meta.pkl → manifest.json 순서로 바꾸므로, 그 사이에 중단되면 load()가 manifest의 행 수에 맞춰 meta를 자르고
+# 임베딩 파일이 manifest보다 짧으면 손상으로 보고 --full 재생성을 요구합니다.
+#
+# 사용법:
+#   python embedding_snapshot.py refresh [--dir 경로] [--full]
+#   python embedding_snapshot.py info [--dir 경로]
+
+SNAPSHOT_DIR = os.getenv(
+    "EMBEDDING_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_snapshot")
+)
+SNAPSHOT_DTYPE = "<f4"
+SNAPSHOT_FETCH_ROWS = 5000  # 새 행을 읽어 파일에 붙이는 단위
+META_DTYPES = {
+    "normalization_id": "int64", "complaint_id": "int64", "received_at": "object",
+    "district_id": "Int64", "district_name": "object", "target_object": "object", "core_request": "object",
+    "keywords_jsonb": "object", "is_current": "bool", "incident_id": "Int64", "has_embedding": "bool",
+}
+
+ROWS_SQL = """
+    SELECT n.id AS normalization_id, n.complaint_id, c.created_at AS received_at,
+           n.district_id, d.name AS district_name, n.target_object, n.core_request,
+           n.keywords_jsonb, n.is_current, c.incident_id,
+           vector_send(n.embedding) AS embedding
+    FROM complaint_normalizations n
+    JOIN complaints c ON c.id = n.complaint_id
+    LEFT JOIN districts d ON d.id = n.district_id
+"""
+
+NEW_ROWS_SQL = ROWS_SQL + """
+    WHERE n.id > %(watermark)s
+    ORDER BY n.id
+"""
+
+# 워터마크보다 먼저 받았어야 했지만 나중에 커밋되어 빠진 행
+MISSED_ROWS_SQL = ROWS_SQL + """
+    WHERE n.id = ANY(%(ids)s)
+    ORDER BY n.id
+"""
+
+# 이미 받은 행의 바뀌는 열만 (임베딩·본문 없이 정수/불리언만 읽음)
+STATE_SQL = """
+    SELECT n.id AS normalization_id, n.is_current, c.incident_id
+    FROM complaint_normalizations n
+    JOIN complaints c ON c.id = n.complaint_id
+    WHERE n.id <= %(watermark)s
+"""
+
+
+class Snapshot:
+
+    def __init__(self, path, manifest, meta, embeddings):
+        self.path = path
+        self.manifest = manifest
+        self.meta = meta
+        self.embeddings = embeddings
+
+    @property
+    def watermark(self):
+        return self.manifest["watermark"]
+
+    def __len__(self):
+        return len(self.meta)
+
+    def select(self, mask):
+        """조건에 맞는 행의 (메타데이터 DataFrame, float32 임베딩 행렬). 해당 행만 메모리로 읽습니다."""
+        rows = np.flatnonzero(np.asarray(mask, dtype=bool))
+        return self.meta.iloc[rows].reset_index(drop=True), np.asarray(self.embeddings[rows])
+
+
+def _paths(path):
+    return (os.path.join(path, "manifest.json"),
+            os.path.join(path, "embeddings.f32"),
+            os.path.join(path, "meta.pkl"))
+
+
+def _empty_manifest():
+    return {"rows": 0, "dim": EMBEDDING_DIM, "dtype": SNAPSHOT_DTYPE, "watermark": 0, "updated_at": None}
+
+
+def load(path=SNAPSHOT_DIR):
+    manifest_path, embeddings_path, meta_path = _paths(path)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"스냅샷이 없습니다: {path} (python embedding_snapshot.py refresh)")
+
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    meta = pd.read_pickle(meta_path)
+    rows = manifest["rows"]
+    row_bytes = manifest["dim"] * np.dtype(manifest["dtype"]).itemsize
+    file_rows = os.path.getsize(embeddings_path) // row_bytes if os.path.exists(embeddings_path) else 0
+    if len(meta) < rows or file_rows < rows:
+        raise ValueError(f"스냅샷이 손상되었습니다: manifest {rows}행, meta {len(meta)}행, 임베딩 {file_rows}행 "
+                         f"(python embedding_snapshot.py refresh --full)")
+    if len(meta) > rows:
+        # meta.pkl을 바꾼 뒤 manifest.json을 쓰기 전에 중단된 갱신 → manifest 기준으로 되돌림
+        # (뒤에 붙었던 행은 워터마크 이후/빠진 행이므로 다음 갱신이 다시 가져옴)
+        logging.warning(f"   💾 [스냅샷] meta {len(meta)}행이 manifest {rows}행보다 많아 manifest 기준으로 자름")
+        meta = meta.iloc[:rows].reset_index(drop=True)
+    shape = (rows, manifest["dim"])
+    if manifest["rows"]:
+        embeddings = np.memmap(embeddings_path, dtype=manifest["dtype"], mode="r", shape=shape)
+    else:
+        embeddings = np.zeros(shape, dtype=manifest["dtype"])
+    return Snapshot(path, manifest, meta, embeddings)
+
+
+def _write_atomic(path, write):
+    tmp = f"{path}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _append_rows(conn, f, sql, params, dim, dtype, parts):
+    # 서버 측 커서로 나눠 읽으면서 임베딩은 파일 끝에, 메타데이터는 parts에 추가
+    with conn.cursor(name="embedding_snapshot") as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(SNAPSHOT_FETCH_ROWS)
+            if not rows: break
+            part = pd.DataFrame(rows, columns=[col[0] for col in cursor.description])
+            values = part.pop("embedding")
+            part["has_embedding"] = values.notna()
+            f.write(EmbeddingStore.from_values(values, dim=dim).vectors.astype(dtype).tobytes())
+            parts.append(part)
+
+
+def refresh(conn, path=SNAPSHOT_DIR, full=False):
+    """
+    워터마크 이후 새 행과 워터마크 이하인데 빠진 행을 이어 붙이고, 바뀌는 열을 갱신한 뒤 스냅샷을 반환합니다.
+    full=True면 처음부터 다시 만듭니다.
+    """
+    os.makedirs(path, exist_ok=True)
+    manifest_path, embeddings_path, meta_path = _paths(path)
+    started = time.perf_counter()
+
+    if full or not os.path.exists(manifest_path):
+        manifest, meta = _empty_manifest(), None
+    else:
+        snapshot = load(path)
+        manifest, meta = snapshot.manifest, snapshot.meta
+        del snapshot
+
+    dim = manifest["dim"]
+    row_bytes = dim * np.dtype(manifest["dtype"]).itemsize
+    new_parts = []
+    missed_ids = []
+
+    if meta is not None and len(meta):
+        with conn.cursor() as cursor:
+            cursor.execute(STATE_SQL, {"watermark": manifest["watermark"]})
+            state = pd.DataFrame(cursor.fetchall(), columns=["normalization_id", "is_current", "incident_id"])
+        state = state.set_index("normalization_id")
+        missed_ids = [int(i) for i in state.index.difference(pd.Index(meta["normalization_id"]))]
+        state = state.reindex(meta["normalization_id"])
+        # DB에서 지워진 행은 현재 정규화가 아닌 것으로 표시 (파일에서 실제로 빼려면 --full로 다시 만들기)
+        meta["is_current"] = state["is_current"].eq(True).to_numpy()
+        meta["incident_id"] = state["incident_id"].to_numpy()
+
+    with open(embeddings_path, "r+b" if os.path.exists(embeddings_path) else "w+b") as f:
+        # 이전 갱신이 중간에 끊겨 manifest보다 길게 남은 부분은 버림
+        f.truncate(manifest["rows"] * row_bytes)
+        f.seek(0, os.SEEK_END)
+
+        if missed_ids:
+            logging.info(f"   💾 [스냅샷] 워터마크 이하 늦게 커밋된 행 {len(missed_ids)}건 추가")
+            _append_rows(conn, f, MISSED_ROWS_SQL, {"ids": missed_ids}, dim, manifest["dtype"], new_parts)
+        _append_rows(conn, f, NEW_ROWS_SQL, {"watermark": manifest["watermark"]}, dim, manifest["dtype"], new_parts)
+        f.flush()
+        os.fsync(f.fileno())
+    conn.commit()
+
+    frames = [m for m in [meta, *new_parts] if m is not None]
+    meta = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(META_DTYPES))
+    meta["is_current"] = meta["is_current"].eq(True)
+    meta = meta.astype(META_DTYPES)
+    meta["received_at"] = pd.to_datetime(meta["received_at"])
+
+    added = sum(len(part) for part in new_parts)
+    manifest = dict(manifest)
+    manifest["rows"] = len(meta)
+    if added:
+        manifest["watermark"] = max(manifest["watermark"], int(meta["normalization_id"].max()))
+    manifest["updated_at"] = datetime.now().isoformat(timespec="seconds")
+
+    _write_atomic(meta_path, lambda tmp: meta.to_pickle(tmp))
+
+    def write_manifest(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+    _write_atomic(manifest_path, write_manifest)
+
+    logging.info(f"   💾 [스냅샷] {added}건 추가 / 전체 {manifest['rows']}건 "
+                 f"(워터마크 #{manifest['watermark']}, {time.perf_counter() - started:.1f}초) → {path}")
+    return load(path)
+
+
+if __name__ == "__main__":
+    import psycopg2
+    from init_clustering import DB_CONFIG
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["refresh", "info"])
+    parser.add_argument("--dir", default=SNAPSHOT_DIR)
+    parser.add_argument("--full", action="store_true", help="처음부터 다시 만들기")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(message)s', datefmt='%H:%M:%S')
+    if args.command == "refresh":
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            refresh(conn, args.dir, full=args.full)
+        finally:
+            conn.close()
+    else:
+        snapshot = load(args.dir)
+        print(json.dumps(snapshot.manifest, ensure_ascii=False, indent=2))
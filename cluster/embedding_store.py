@@ -0,0 +1,151 @@
+import json
+import logging
+
+import numpy as np
+
+import vector_io
+
+# ==========================================
+# 임베딩 저장소 (고정 차원 float32 + 선택적 양자화)
+# ==========================================
+# 모든 군집화 스크립트가 임베딩을 같은 형태로 다루기 위한 공용 클래스입니다.
+# - 차원은 EMBEDDING_DIM으로 고정하고 로딩 시 검증 (스크립트마다 0벡터 크기가 1024/768로 달랐던 문제)
+# - float32 행렬 하나 + 행별 노름만 보관 (float64 대비 절반)
+# - 양자화(선택): int8(차원당 1바이트) / binary(부호 비트, 차원당 1비트)
+#   근사 유사도로 후보를 넉넉히(RESCORE_MARGIN) 고른 뒤, 후보 쌍만 float32로 다시 계산(rescoring)합니다.
+
+EMBEDDING_DIM = 1024
+QUANTIZATIONS = (None, "int8", "binary")
+RESCORE_MARGIN = {"int8": 0.02, "binary": 0.25}  # 근사 코사인 유사도의 허용 오차 (후보 선별용)
+MAX_PAIR_ELEMENTS = 1 << 22  # rescoring 시 한 번에 모을 (쌍 수 × 차원) 최대 원소 수
+
+# 바이트별 1비트 개수 (np.bitwise_count가 없는 numpy 2.0 미만용)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _bitwise_count(codes):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(codes)
+    return _POPCOUNT[codes]
+
+
+class EmbeddingStore:
+
+    def __init__(self, vectors, dim=EMBEDDING_DIM, quantization=None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != dim:
+            raise ValueError(f"임베딩 차원 불일치: {vectors.shape} (기대값: (n, {dim}))")
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"알 수 없는 양자화 방식: {quantization} (int8 | binary)")
+
+        self.dim = dim
+        self.vectors = np.ascontiguousarray(vectors)
+        self.norms = np.linalg.norm(self.vectors, axis=1)
+        self.quantization = quantization
+        self.margin = RESCORE_MARGIN.get(quantization, 0.0)
+        self.code_scales = None
+        self.codes = self._quantize() if quantization else None
+
+    @classmethod
+    def from_values(cls, values, dim=EMBEDDING_DIM, quantization=None):
+        """
+        DB에서 읽은 임베딩 값 목록 → 저장소
+        vector_send 바이너리, '[...]' 문자열, 리스트를 모두 받으며
+        읽을 수 없거나 차원이 다른 값은 0벡터로 두고 건수를 경고로 남깁니다.
+        """
+        values = list(values)
+        if values and all(isinstance(v, (bytes, memoryview)) or v is None for v in values):
+            try:
+                return cls(vector_io.decode_vectors(values, dim=dim), dim, quantization)
+            except ValueError:
+                pass
+
+        vectors = np.zeros((len(values), dim), dtype=np.float32)
+        invalid = 0
+        for i, value in enumerate(values):
+            if value is None:
+                continue
+            try:
+                if isinstance(value, (bytes, memoryview)):
+                    row = vector_io.decode_vectors([value])[0]
+                elif isinstance(value, str):
+                    row = np.asarray(json.loads(value), dtype=np.float32)
+                else:
+                    row = np.asarray(value, dtype=np.float32)
+                if row.shape != (dim,):
+                    raise ValueError(row.shape)
+                vectors[i] = row
+            except (ValueError, TypeError):
+                invalid += 1
+        if invalid:
+            logging.warning(f"   ⚠️ 임베딩 {invalid}건을 읽지 못했거나 차원이 {dim}이 아니어서 0벡터로 처리")
+        return cls(vectors, dim, quantization)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def subset(self, rows):
+        return EmbeddingStore(self.vectors[rows], self.dim, self.quantization)
+
+    def _quantize(self):
+        if self.quantization == "binary":
+            return np.packbits(self.vectors > 0, axis=1)
+        # int8: 단위 벡터를 행별 최대 절댓값이 127이 되도록 확대해 반올림 (배율은 code_scales에 보관)
+        codes = np.empty(self.vectors.shape, dtype=np.int8)
+        self.code_scales = np.zeros(len(self), dtype=np.float32)
+        step = max(1, MAX_PAIR_ELEMENTS // self.dim)
+        for start in range(0, len(self), step):
+            unit = self.unit(slice(start, start + step))
+            peak = np.abs(unit).max(axis=1)
+            scale = np.divide(peak, 127, out=np.zeros_like(peak), where=peak > 0)
+            codes[start:start + step] = np.rint(np.divide(unit, scale[:, None], out=np.zeros_like(unit), where=scale[:, None] > 0))
+            self.code_scales[start:start + step] = scale
+        return codes
+
+    def unit(self, rows=slice(None)):
+        """정규화된 float32 행 (노름이 0인 행은 0벡터)"""
+        norms = self.norms[rows][..., None]
+        return np.divide(self.vectors[rows], norms, out=np.zeros_like(self.vectors[rows]), where=norms > 0)
+
+    def similarity(self, rows, cols=slice(None)):
+        """rows × cols 코사인 유사도 (float32 정확값)"""
+        return self.unit(rows) @ self.unit(cols).T
+
+    def approx_similarity(self, rows, cols=slice(None)):
+        """rows × cols 근사 코사인 유사도 (양자화 코드로 계산, 양자화가 없으면 정확값)"""
+        if self.quantization is None:
+            return self.similarity(rows, cols)
+        a, b = self.codes[rows], self.codes[cols]
+        out = np.empty((len(a), len(b)), dtype=np.float32)
+        if self.quantization == "int8":
+            # 열 블록 단위로만 float32로 바꿔 곱함 (코드 전체를 float32로 펼치지 않음)
+            a = a.astype(np.float32)
+            step = max(1, MAX_PAIR_ELEMENTS // self.dim)
+            for start in range(0, len(b), step):
+                out[:, start:start + step] = a @ b[start:start + step].astype(np.float32).T
+            out *= self.code_scales[rows][:, None] * self.code_scales[cols][None, :]
+            return out
+
+        # binary: 해밍 거리 → 각도 → 코사인 (부호가 같은 비트 비율로 각도를 추정)
+        step = max(1, MAX_PAIR_ELEMENTS // max(len(b) * a.shape[1], 1))
+        for start in range(0, len(a), step):
+            hamming = _bitwise_count(a[start:start + step, None, :] ^ b[None, :, :]).sum(axis=-1, dtype=np.int32)
+            out[start:start + step] = np.cos(np.pi * hamming / self.dim)
+        # 0벡터는 정확값과 같이 유사도 0
+        out[self.norms[rows] == 0] = 0
+        out[:, self.norms[cols] == 0] = 0
+        return out
+
+    def pair_similarity(self, rows, cols):
+        """(rows[k], cols[k]) 쌍마다 float32 정확 코사인 유사도 (rescoring용)"""
+        rows = np.asarray(rows)
+        cols = np.asarray(cols)
+        out = np.empty(len(rows), dtype=np.float32)
+        step = max(1, MAX_PAIR_ELEMENTS // self.dim)
+        for start in range(0, len(rows), step):
+            r, c = rows[start:start + step], cols[start:start + step]
+            dots = np.einsum("ij,ij->i", self.vectors[r], self.vectors[c])
+            norms = self.norms[r] * self.norms[c]
+            np.divide(dots, norms, out=out[start:start + step], where=norms > 0)
+            out[start:start + step][norms == 0] = 0
+        return out
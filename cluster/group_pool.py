@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# ==========================================
+# 그룹별 군집화 병렬 실행 (프로세스 풀 + 공유 메모리)
+# ==========================================
+# 지역구(·대상)별 그룹은 서로 독립이므로 그룹마다 워커 프로세스에서 계산합니다.
+# - 전체 임베딩 행렬은 공유 메모리에 한 번만 올리고, 워커는 그룹의 행 번호만 받아 그 부분을 읽습니다.
+#   (그룹마다 임베딩을 피클로 복사해 보내지 않음)
+# - 워커는 계산만 하고 결과(라벨 등)를 돌려주며, DB 저장은 호출한 쪽이 한 트랜잭션으로 처리합니다.
+# - 행 수가 적거나 워커가 1개면 같은 함수를 현재 프로세스에서 순서대로 실행합니다.
+# - 컨테이너에서 돌릴 때는 /dev/shm이 임베딩 행렬보다 커야 합니다. (docker 기본 64MB → shm_size 지정)
+#   남은 공간이 모자라면 (공유 메모리에 쓰다 SIGBUS로 죽지 않도록) 임시 디렉터리의 파일(np.memmap)로 대신 공유합니다.
+
+CLUSTER_WORKERS = int(os.getenv("CLUSTER_WORKERS", os.cpu_count() or 1))  # 1이면 직렬 실행
+PARALLEL_MIN_ROWS = 2000  # 전체 행 수가 이보다 적으면 프로세스 풀을 띄우지 않음
+
+SHM_PATH = "/dev/shm"
+
+_worker = {}
+
+
+def _attach(kind, name, shape, dtype):
+    # 워커 시작 시 한 번만 공유 메모리(또는 임시 파일)에 연결 (해제는 만든 쪽에서 unlink/삭제)
+    if kind == "file":
+        _worker["embeddings"] = np.memmap(name, dtype=dtype, mode="r", shape=shape)
+        return
+    shm = shared_memory.SharedMemory(name=name)
+    _worker["shm"] = shm
+    _worker["embeddings"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _shm_fits(nbytes):
+    # /dev/shm이 없는 OS는 확인할 수 없으므로 공유 메모리를 그대로 사용
+    try:
+        return shutil.disk_usage(SHM_PATH).free > nbytes
+    except OSError:
+        return True
+
+
+def _map_parallel(func, tasks, workers, initargs):
+    with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=initargs) as pool:
+        # 큰 그룹부터 넣어야 마지막에 한 워커만 오래 도는 일이 줄어듦
+        order = sorted(range(len(tasks)), key=lambda i: -len(tasks[i][0]))
+        futures = {i: pool.submit(_run, func, tasks[i][0], tasks[i][1]) for i in order}
+        return [futures[i].result() for i in range(len(tasks))]
+
+
+def _run(func, rows, payload):
+    return func(_worker["embeddings"][rows], payload)
+
+
+def map_groups(func, embeddings, tasks, workers=None):
+    """
+    tasks: [(행 번호 배열, payload)] — func(그룹 임베딩, payload)를 그룹마다 실행
+    반환값: tasks 순서대로 func의 결과 목록
+    func는 모듈 최상위 함수여야 합니다. (워커로 피클 전달)
+    """
+    workers = CLUSTER_WORKERS if workers is None else workers
+    workers = min(workers, len(tasks))
+    if workers <= 1 or len(embeddings) < PARALLEL_MIN_ROWS:
+        return [func(embeddings[rows], payload) for rows, payload in tasks]
+
+    embeddings = np.ascontiguousarray(embeddings)
+    if not _shm_fits(embeddings.nbytes):
+        fd, path = tempfile.mkstemp(prefix="group_pool_", suffix=".bin")
+        os.close(fd)
+        try:
+            mapped = np.memmap(path, dtype=embeddings.dtype, mode="w+", shape=embeddings.shape)
+            mapped[:] = embeddings
+            mapped.flush()
+            del mapped
+            return _map_parallel(func, tasks, workers, ("file", path, embeddings.shape, embeddings.dtype.str))
+        finally:
+            os.remove(path)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(embeddings.nbytes, 1))
+    try:
+        np.ndarray(embeddings.shape, dtype=embeddings.dtype, buffer=shm.buf)[:] = embeddings
+        return _map_parallel(func, tasks, workers, ("shm", shm.name, embeddings.shape, embeddings.dtype.str))
+    finally:
+        shm.close()
+        shm.unlink()
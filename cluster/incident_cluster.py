@@ -1,12 +1,15 @@
+import argparse
 import psycopg2
 import pandas as pd
-import numpy as np
 import json
 import ast
 from sklearn.cluster import DBSCAN
-from sklearn.metrics.pairwise import cosine_distances
 from collections import Counter
 from datetime import datetime
+import cluster_math
+import embedding_snapshot
+import incident_representatives
+from embedding_store import EmbeddingStore
 
 # ==========================================
 # 1. DB 설정
@@ -22,12 +25,6 @@ DB_CONFIG = {
 # ==========================================
 # 2. 데이터 파싱 유틸리티
 # ==========================================
-def parse_vector(val):
-    if isinstance(val, str):
-        try: return np.array(json.loads(val))
-        except: return np.zeros(768)
-    return np.array(val) if val is not None else np.zeros(768)
-
 def parse_keywords(val):
     if not val: return set()
     raw_set = set()
@@ -41,42 +38,7 @@ def parse_keywords(val):
     return {word for word in raw_set if len(word) > 1}
 
 # ==========================================
-# 3. 거리 계산 로직 (하이브리드)
-# ==========================================
-def calculate_hybrid_distance(vec1, vec2, kws1, kws2):
-    # 1. 의미 거리 (Cosine)
-    sem_dist = cosine_distances([vec1], [vec2])[0][0]
-    
-    # 2. 키워드 거리 (Jaccard)
-    if not kws1 and not kws2: key_dist = 0.5
-    elif not kws1 or not kws2: key_dist = 1.0
-    else:
-        intersection = len(kws1.intersection(kws2))
-        union = len(kws1.union(kws2))
-        key_dist = 1.0 - (intersection / union if union > 0 else 0)
-        
-    return (sem_dist * 0.7) + (key_dist * 0.3)
-
-def calculate_jaccard_matrix(keywords_list):
-    """DBSCAN용 매트릭스 계산 (누락되었던 함수 복구)"""
-    n = len(keywords_list)
-    dist_matrix = np.ones((n, n))
-    for i in range(n):
-        for j in range(i, n):
-            set1 = keywords_list[i]
-            set2 = keywords_list[j]
-            if not set1 and not set2: dist = 0.5
-            elif not set1 or not set2: dist = 1.0 
-            else:
-                inter = len(set1.intersection(set2))
-                union = len(set1.union(set2))
-                dist = 1.0 - (inter / union if union else 0)
-            dist_matrix[i, j] = dist
-            dist_matrix[j, i] = dist
-    return dist_matrix
-
-# ==========================================
-# 4. 타이틀 및 키워드 생성
+# 3. 타이틀 및 키워드 생성
 # ==========================================
 def generate_title_only(group):
     sorted_group = group.sort_values('received_at')
@@ -90,48 +52,53 @@ def get_representative_keyword(keywords_list):
     return str(top_kw).replace('[','').replace(']','').replace("'","").strip()
 
 # ==========================================
-# 5. 메인 로직: 증분 업데이트 (Anchoring & Global Clustering)
+# 4. 메인 로직: 증분 업데이트 (Anchoring & Global Clustering)
 # ==========================================
-def run_incremental_clustering():
+def run_incremental_clustering(use_snapshot=False):
     conn = psycopg2.connect(**DB_CONFIG)
     cur = conn.cursor()
     print(f"🚀 [Upgrade] 부서 통합 & 중심점 고정(Anchoring) 로직 시작 ({datetime.now()})")
 
     # 1. 활성 사건 로드
-    sql_active = """
-        SELECT c.incident_id, n.embedding, n.keywords_jsonb
-        FROM complaints c
-        JOIN complaint_normalizations n ON c.id = n.complaint_id
-        WHERE c.incident_id IS NOT NULL AND c.status != 'CLOSED' 
-    """
-    active_df = pd.read_sql(sql_active, conn)
-    active_df['vec'] = active_df['embedding'].apply(parse_vector)
-    active_df['kws'] = active_df['keywords_jsonb'].apply(parse_keywords)
-    
-    incident_centroids = {}
-    if not active_df.empty:
-        for iid, group in active_df.groupby('incident_id'):
-            # 현재의 중심점 계산
-            mean_vec = np.mean(np.stack(group['vec'].values), axis=0)
-            all_kws = set().union(*group['kws'].tolist())
-            # [솔루션 2] 부서 정보 제거 (Global)
-            incident_centroids[iid] = {'vec': mean_vec, 'kws': all_kws, 'count': len(group)}
+    # OPEN 사건별 대표값(중심점, 키워드 합집합, 민원 수)을 그대로 사용 (소속 민원 전체를 읽지 않음)
+    incident_representatives.ensure_schema(conn)
+    representatives = incident_representatives.load(conn)
+
+    incident_index = None
+    if representatives:
+        # [솔루션 2] 부서 정보 제거 (Global)
+        incident_index = cluster_math.CentroidIndex(
+            [row[0] for row in representatives],
+            EmbeddingStore([row[1] for row in representatives]).vectors,
+            [parse_keywords(row[2]) for row in representatives],
+            [row[3] for row in representatives],
+            alpha=0.7,
+            anchor_limit=10
+        )
             
-    print(f"   👉 활성화된 사건 {len(incident_centroids)}개 로드 완료.")
+    print(f"   👉 활성화된 사건 {len(incident_index) if incident_index else 0}개 로드 완료.")
 
     # 2. 신규 민원 로드
     sql_new = """
-        SELECT c.id, c.created_at as received_at, n.embedding, n.keywords_jsonb, n.core_request
+        SELECT c.id, c.created_at as received_at, vector_send(n.embedding) AS embedding, n.keywords_jsonb, n.core_request
         FROM complaints c
         JOIN complaint_normalizations n ON c.id = n.complaint_id
         WHERE c.incident_id IS NULL AND n.embedding IS NOT NULL
     """
-    new_df = pd.read_sql(sql_new, conn)
+    if use_snapshot:
+        # 임베딩은 로컬 스냅샷(memmap)에서, DB에서는 새 행과 바뀐 상태 열만 받아 옴
+        snapshot = embedding_snapshot.refresh(conn)
+        meta = snapshot.meta
+        new_df, embeddings = snapshot.select(meta['is_current'] & meta['incident_id'].isna() & meta['has_embedding'])
+        new_df = new_df.rename(columns={'complaint_id': 'id'})
+    else:
+        new_df = pd.read_sql(sql_new, conn)
     if new_df.empty:
         print("🎉 신규 민원 없음. 종료.")
         conn.close(); return
 
-    new_df['vec'] = new_df['embedding'].apply(parse_vector)
+    # 임베딩은 고정 차원 float32 저장소로 (pgvector 바이너리, 차원 불일치는 0벡터)
+    store = EmbeddingStore(embeddings) if use_snapshot else EmbeddingStore.from_values(new_df.pop('embedding'))
     new_df['kws'] = new_df['keywords_jsonb'].apply(parse_keywords)
 
     print(f"   👉 신규 민원 {len(new_df)}건 처리 시작 (부서 구분 없음)")
@@ -141,21 +108,14 @@ def run_incremental_clustering():
     unassigned_indices = []
     MATCH_THRESHOLD = 0.15 
 
-    for idx, row in new_df.iterrows():
-        vec = row['vec']
-        kws = row['kws']
-        
-        best_match_id = None
-        min_dist = 1.0
-        
-        # [솔루션 2] 모든 사건과 비교
-        for iid, info in incident_centroids.items():
-            dist = calculate_hybrid_distance(vec, info['vec'], kws, info['kws'])
-            if dist < min_dist:
-                min_dist = dist
-                best_match_id = iid
-        
-        if best_match_id and min_dist <= MATCH_THRESHOLD:
+    if incident_index:
+        # [솔루션 2] 모든 사건과 한 번에 비교, [솔루션 1] Anchoring(10개 미만일 때만 중심점 갱신)은 인덱스가 처리
+        matches = incident_index.match(store.vectors, new_df['kws'].tolist(), MATCH_THRESHOLD)
+    else:
+        matches = [(None, 1.0)] * len(new_df)
+
+    for (idx, row), (best_match_id, min_dist) in zip(new_df.iterrows(), matches):
+        if best_match_id is not None:
             # DB 업데이트
             cur.execute("UPDATE complaints SET incident_id = %s WHERE id = %s", (best_match_id, row['id']))
             cur.execute("""
@@ -163,20 +123,6 @@ def run_incremental_clustering():
                 SET complaint_count = complaint_count + 1, last_occurred = GREATEST(last_occurred, %s)
                 WHERE id = %s
             """, (row['received_at'], best_match_id))
-            
-            # [솔루션 1] Anchoring: 10개 미만일 때만 학습, 그 뒤론 고정
-            current_count = incident_centroids[best_match_id]['count']
-            
-            if current_count < 10:
-                prev_vec = incident_centroids[best_match_id]['vec']
-                new_n = current_count + 1
-                new_vec = (prev_vec * current_count + vec) / new_n
-                
-                incident_centroids[best_match_id]['vec'] = new_vec
-                incident_centroids[best_match_id]['count'] = new_n
-            else:
-                incident_centroids[best_match_id]['count'] += 1
-                
             assigned_count += 1
         else:
             unassigned_indices.append(idx)
@@ -189,17 +135,14 @@ def run_incremental_clustering():
 
     if not remaining_df.empty:
         # [솔루션 2] groupby 제거 -> 전체 군집화
-        vectors = np.stack(remaining_df['vec'].values)
-        sem_dist = cosine_distances(vectors)
-        
-        # [수정] 누락되었던 함수 호출 복구
+        vectors = store.subset(unassigned_indices)
         kws_list = remaining_df['kws'].tolist()
-        key_dist = calculate_jaccard_matrix(kws_list)
-        
-        final_dist = (sem_dist * 0.7) + (key_dist * 0.3)
+
+        # 의미 거리 0.7 + 키워드 거리 0.3, 거리 ≤ eps인 이웃만 담은 희소 그래프
+        final_graph = cluster_math.hybrid_radius_graph(vectors, kws_list, eps=0.13, alpha=0.7, rule="incident")
         
         dbscan = DBSCAN(eps=0.13, min_samples=1, metric='precomputed')
-        labels = dbscan.fit_predict(final_dist)
+        labels = dbscan.fit_predict(final_graph)
         
         remaining_df['cluster_label'] = labels
         
@@ -227,4 +170,8 @@ def run_incremental_clustering():
     print(f"\n✅ [완료] 병합: {assigned_count}건 / 신규 생성: {new_incidents_count}개")
 
 if __name__ == "__main__":
-    run_incremental_clustering()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--snapshot", action="store_true", help="임베딩을 로컬 스냅샷에서 읽기 (cluster/embedding_snapshot.py)")
+    args = parser.parse_args()
+
+    run_incremental_clustering(use_snapshot=args.snapshot)
\ No newline at end of file
@@ -0,0 +1,388 @@
+import logging
+import sys
+
+import psycopg2
+
+from embedding_store import EMBEDDING_DIM
+
+# ==========================================
+# 사건 대표값 테이블 (incident_representatives)
+# ==========================================
+# OPEN 사건마다 중심점(소속 민원 임베딩 평균), 키워드 합집합, 민원 수, 대표 지역구를 한 행으로 유지합니다.
+# - 임베딩 합(embedding_sum)과 민원 수를 들고 있어서, 민원이 사건에 들어오거나 빠질 때
+#   트리거가 그 민원의 임베딩만 더하고 빼서 중심점을 갱신합니다. (사건 전체 AVG 재계산 없음)
+# - 키워드/지역구는 사건별 등장 민원 수 테이블로 관리해 빠지는 민원도 정확히 반영합니다.
+# - 트리거 대상: complaints INSERT/UPDATE/DELETE, complaint_normalizations INSERT/UPDATE/DELETE,
+#   incidents.status 변경. 모두 같은 트랜잭션 안에서 처리됩니다. (백엔드에서 연결/종결해도 반영됨)
+# - 민원 삭제와 사건 재오픈은 드물어서 해당 사건만 처음부터 다시 계산합니다.
+# - 종결된 사건은 행이 삭제되므로 매칭은 OPEN 사건 수에만 비례합니다.
+# - centroid 에 HNSW 인덱스가 있어 신규 민원마다 가까운 사건 후보만 빠르게 찾습니다.
+#
+# 사용법: python incident_representatives.py [ensure|rebuild]
+
+REPRESENTATIVE_DIM = EMBEDDING_DIM
+
+ZERO_VECTOR_SQL = f"array_fill(0::real, ARRAY[{REPRESENTATIVE_DIM}])::vector({REPRESENTATIVE_DIM})"
+
+SCHEMA_SQL = f"""
+CREATE TABLE IF NOT EXISTS incident_representatives (
+    incident_id BIGINT PRIMARY KEY REFERENCES incidents(id) ON DELETE CASCADE,
+    centroid vector({REPRESENTATIVE_DIM}) NOT NULL,
+    embedding_sum vector({REPRESENTATIVE_DIM}) NOT NULL,
+    keywords TEXT[] NOT NULL DEFAULT '{{}}',
+    complaint_count INTEGER NOT NULL,
+    district_id BIGINT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS incident_representatives_centroid_hnsw_idx
+    ON incident_representatives USING hnsw (centroid vector_cosine_ops);
+
+-- 사건별 키워드/지역구 등장 민원 수 (0이 되면 삭제)
+CREATE TABLE IF NOT EXISTS incident_representative_keywords (
+    incident_id BIGINT NOT NULL REFERENCES incident_representatives(incident_id) ON DELETE CASCADE,
+    keyword TEXT NOT NULL,
+    member_count INTEGER NOT NULL,
+    PRIMARY KEY (incident_id, keyword)
+);
+
+CREATE TABLE IF NOT EXISTS incident_representative_districts (
+    incident_id BIGINT NOT NULL REFERENCES incident_representatives(incident_id) ON DELETE CASCADE,
+    district_id BIGINT NOT NULL,
+    member_count INTEGER NOT NULL,
+    PRIMARY KEY (incident_id, district_id)
+);
+
+-- 사건 하나에 들어오거나(+1) 빠지는(-1) 민원 한 건의 기여분
+DO $$
+BEGIN
+    IF to_regtype('incident_representative_change') IS NULL THEN
+        CREATE TYPE incident_representative_change AS (
+            incident_id BIGINT,
+            delta INTEGER,
+            embedding vector,
+            keywords_jsonb JSONB,
+            district_id BIGINT
+        );
+    END IF;
+END $$;
+
+-- 임베딩 합 / 민원 수 = 중심점
+CREATE OR REPLACE FUNCTION incident_representative_centroid(total vector, members INTEGER) RETURNS vector AS $$
+    SELECT CASE
+        WHEN members > 0 THEN (
+            SELECT array_agg(u.v / members ORDER BY u.i)::vector
+            FROM unnest(total::real[]) WITH ORDINALITY AS u(v, i)
+        )
+        ELSE total
+    END
+$$ LANGUAGE sql IMMUTABLE;
+
+-- 변경분을 OPEN 사건의 합/민원 수/키워드·지역구 카운트에 더하고 빼서 반영
+CREATE OR REPLACE FUNCTION apply_incident_representative_changes(changes incident_representative_change[]) RETURNS void AS $$
+DECLARE
+    ids BIGINT[];
+BEGIN
+    IF changes IS NULL OR cardinality(changes) = 0 THEN
+        RETURN;
+    END IF;
+
+    SELECT array_agg(DISTINCT c.incident_id) INTO ids FROM unnest(changes) AS c;
+
+    INSERT INTO incident_representatives AS r (incident_id, centroid, embedding_sum, complaint_count, updated_at)
+    SELECT d.incident_id,
+           incident_representative_centroid(d.embedding_sum, d.complaint_count),
+           d.embedding_sum, d.complaint_count, now()
+    FROM (
+        SELECT c.incident_id,
+               COALESCE(SUM(c.embedding) FILTER (WHERE c.delta > 0), {ZERO_VECTOR_SQL})
+                 - COALESCE(SUM(c.embedding) FILTER (WHERE c.delta < 0), {ZERO_VECTOR_SQL}) AS embedding_sum,
+               SUM(c.delta)::INTEGER AS complaint_count
+        FROM unnest(changes) AS c
+        JOIN incidents i ON i.id = c.incident_id AND i.status = 'OPEN'
+        GROUP BY c.incident_id
+    ) AS d
+    ON CONFLICT (incident_id) DO UPDATE
+        SET embedding_sum = r.embedding_sum + EXCLUDED.embedding_sum,
+            complaint_count = r.complaint_count + EXCLUDED.complaint_count,
+            centroid = incident_representative_centroid(
+                r.embedding_sum + EXCLUDED.embedding_sum,
+                r.complaint_count + EXCLUDED.complaint_count
+            ),
+            updated_at = now();
+
+    DELETE FROM incident_representatives WHERE incident_id = ANY(ids) AND complaint_count <= 0;
+
+    INSERT INTO incident_representative_keywords AS k (incident_id, keyword, member_count)
+    SELECT c.incident_id, kw.keyword, SUM(c.delta)
+    FROM unnest(changes) AS c
+    JOIN incident_representatives r ON r.incident_id = c.incident_id
+    CROSS JOIN LATERAL (
+        SELECT DISTINCT e.keyword
+        FROM jsonb_array_elements_text(
+            CASE WHEN jsonb_typeof(c.keywords_jsonb) = 'array' THEN c.keywords_jsonb ELSE '[]'::jsonb END
+        ) AS e(keyword)
+    ) AS kw
+    GROUP BY c.incident_id, kw.keyword
+    ON CONFLICT (incident_id, keyword) DO UPDATE
+        SET member_count = k.member_count + EXCLUDED.member_count;
+
+    INSERT INTO incident_representative_districts AS d (incident_id, district_id, member_count)
+    SELECT c.incident_id, c.district_id, SUM(c.delta)
+    FROM unnest(changes) AS c
+    JOIN incident_representatives r ON r.incident_id = c.incident_id
+    WHERE c.district_id IS NOT NULL
+    GROUP BY c.incident_id, c.district_id
+    ON CONFLICT (incident_id, district_id) DO UPDATE
+        SET member_count = d.member_count + EXCLUDED.member_count;
+
+    DELETE FROM incident_representative_keywords WHERE incident_id = ANY(ids) AND member_count <= 0;
+    DELETE FROM incident_representative_districts WHERE incident_id = ANY(ids) AND member_count <= 0;
+
+    -- 키워드 합집합과 최빈 지역구 (동률이면 작은 district_id, 기존 MODE() 와 동일)
+    UPDATE incident_representatives r
+    SET keywords = COALESCE((
+            SELECT array_agg(k.keyword ORDER BY k.keyword)
+            FROM incident_representative_keywords k
+            WHERE k.incident_id = r.incident_id
+        ), '{{}}'),
+        district_id = (
+            SELECT d.district_id
+            FROM incident_representative_districts d
+            WHERE d.incident_id = r.incident_id
+            ORDER BY d.member_count DESC, d.district_id
+            LIMIT 1
+        )
+    WHERE r.incident_id = ANY(ids);
+END;
+$$ LANGUAGE plpgsql;
+
+-- 주어진 사건들의 대표값을 처음부터 다시 계산 (OPEN이 아니거나 소속 민원이 없으면 삭제만 됨)
+CREATE OR REPLACE FUNCTION refresh_incident_representatives(ids BIGINT[]) RETURNS void AS $$
+DECLARE
+    target BIGINT;
+BEGIN
+    IF ids IS NULL OR cardinality(ids) = 0 THEN
+        RETURN;
+    END IF;
+
+    DELETE FROM incident_representatives WHERE incident_id = ANY(ids);
+
+    -- 사건 하나씩 모아서 넣어야 전체 재계산 때 메모리가 사건 크기에만 비례함
+    FOREACH target IN ARRAY ids LOOP
+        PERFORM apply_incident_representative_changes(ARRAY(
+            SELECT ROW(c.incident_id, 1, n.embedding, n.keywords_jsonb, n.district_id)::incident_representative_change
+            FROM complaints c
+            JOIN complaint_normalizations n ON n.complaint_id = c.id AND n.is_current = true
+            WHERE c.incident_id = target AND n.embedding IS NOT NULL
+        ));
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 민원의 사건 연결이 바뀌면 이전 사건에서 빼고 새 사건에 더함
+CREATE OR REPLACE FUNCTION complaints_update_incident_representatives() RETURNS trigger AS $$
+BEGIN
+    PERFORM apply_incident_representative_changes(ARRAY(
+        SELECT ROW(x.incident_id, x.delta, n.embedding, n.keywords_jsonb, n.district_id)::incident_representative_change
+        FROM old_rows o
+        JOIN new_rows nw ON nw.id = o.id
+        CROSS JOIN LATERAL (VALUES (o.incident_id, -1), (nw.incident_id, 1)) AS x(incident_id, delta)
+        JOIN complaint_normalizations n ON n.complaint_id = o.id AND n.is_current = true
+        WHERE o.incident_id IS DISTINCT FROM nw.incident_id
+          AND x.incident_id IS NOT NULL
+          AND n.embedding IS NOT NULL
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 처음부터 사건이 지정된 채로 들어온 민원
+CREATE OR REPLACE FUNCTION complaints_insert_incident_representatives() RETURNS trigger AS $$
+BEGIN
+    PERFORM apply_incident_representative_changes(ARRAY(
+        SELECT ROW(nw.incident_id, 1, n.embedding, n.keywords_jsonb, n.district_id)::incident_representative_change
+        FROM new_rows nw
+        JOIN complaint_normalizations n ON n.complaint_id = nw.id AND n.is_current = true
+        WHERE nw.incident_id IS NOT NULL AND n.embedding IS NOT NULL
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 민원 삭제 시점엔 정규화 행이 이미 지워졌을 수 있어 해당 사건을 다시 계산
+CREATE OR REPLACE FUNCTION complaints_delete_incident_representatives() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_incident_representatives(ARRAY(
+        SELECT DISTINCT o.incident_id FROM old_rows o WHERE o.incident_id IS NOT NULL
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 사건에 연결된 민원의 정규화가 새로 생기거나(재정규화 포함) 바뀌거나 지워진 경우
+CREATE OR REPLACE FUNCTION normalizations_insert_incident_representatives() RETURNS trigger AS $$
+BEGIN
+    PERFORM apply_incident_representative_changes(ARRAY(
+        SELECT ROW(c.incident_id, 1, nw.embedding, nw.keywords_jsonb, nw.district_id)::incident_representative_change
+        FROM new_rows nw
+        JOIN complaints c ON c.id = nw.complaint_id
+        WHERE c.incident_id IS NOT NULL AND nw.is_current = true AND nw.embedding IS NOT NULL
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION normalizations_update_incident_representatives() RETURNS trigger AS $$
+BEGIN
+    PERFORM apply_incident_representative_changes(ARRAY(
+        SELECT ROW(c.incident_id, x.delta, x.embedding, x.keywords_jsonb, x.district_id)::incident_representative_change
+        FROM old_rows o
+        JOIN new_rows nw ON nw.id = o.id
+        CROSS JOIN LATERAL (VALUES
+            (o.complaint_id, -1, o.is_current, o.embedding, o.keywords_jsonb, o.district_id),
+            (nw.complaint_id, 1, nw.is_current, nw.embedding, nw.keywords_jsonb, nw.district_id)
+        ) AS x(complaint_id, delta, is_current, embedding, keywords_jsonb, district_id)
+        JOIN complaints c ON c.id = x.complaint_id
+        WHERE (o.complaint_id, o.is_current, o.embedding, o.keywords_jsonb, o.district_id)
+              IS DISTINCT FROM (nw.complaint_id, nw.is_current, nw.embedding, nw.keywords_jsonb, nw.district_id)
+          AND c.incident_id IS NOT NULL
+          AND x.is_current = true
+          AND x.embedding IS NOT NULL
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION normalizations_delete_incident_representatives() RETURNS trigger AS $$
+BEGIN
+    PERFORM apply_incident_representative_changes(ARRAY(
+        SELECT ROW(c.incident_id, -1, o.embedding, o.keywords_jsonb, o.district_id)::incident_representative_change
+        FROM old_rows o
+        JOIN complaints c ON c.id = o.complaint_id
+        WHERE c.incident_id IS NOT NULL AND o.is_current = true AND o.embedding IS NOT NULL
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 사건 상태가 바뀌면 (종결 → 삭제, 재오픈 → 다시 계산)
+CREATE OR REPLACE FUNCTION incidents_refresh_incident_representatives() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_incident_representatives(ARRAY(
+        SELECT n.id
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        WHERE o.status IS DISTINCT FROM n.status
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 전이 테이블(REFERENCING)은 이벤트 하나짜리 트리거에만 쓸 수 있어 이벤트별로 나눔
+CREATE OR REPLACE TRIGGER complaints_incident_representatives
+    AFTER UPDATE ON complaints
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION complaints_update_incident_representatives();
+
+CREATE OR REPLACE TRIGGER complaints_insert_incident_representatives
+    AFTER INSERT ON complaints
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION complaints_insert_incident_representatives();
+
+CREATE OR REPLACE TRIGGER complaints_delete_incident_representatives
+    AFTER DELETE ON complaints
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION complaints_delete_incident_representatives();
+
+CREATE OR REPLACE TRIGGER normalizations_insert_incident_representatives
+    AFTER INSERT ON complaint_normalizations
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION normalizations_insert_incident_representatives();
+
+CREATE OR REPLACE TRIGGER normalizations_update_incident_representatives
+    AFTER UPDATE ON complaint_normalizations
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION normalizations_update_incident_representatives();
+
+CREATE OR REPLACE TRIGGER normalizations_delete_incident_representatives
+    AFTER DELETE ON complaint_normalizations
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION normalizations_delete_incident_representatives();
+
+CREATE OR REPLACE TRIGGER incidents_incident_representatives
+    AFTER UPDATE ON incidents
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION incidents_refresh_incident_representatives();
+"""
+
+REBUILD_SQL = """
+    DELETE FROM incident_representatives
+    WHERE incident_id NOT IN (SELECT id FROM incidents WHERE status = 'OPEN');
+    SELECT refresh_incident_representatives(ARRAY(SELECT id FROM incidents WHERE status = 'OPEN'));
+"""
+
+# incident_cluster 매칭용 (OPEN 사건 전체 대표값)
+LOAD_SQL = """
+    SELECT incident_id, centroid::real[], keywords, complaint_count
+    FROM incident_representatives
+    ORDER BY incident_id
+"""
+
+
+SUM_COLUMN_EXISTS_SQL = """
+    SELECT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'incident_representatives' AND column_name = 'embedding_sum'
+    )
+"""
+
+
+# 테이블/인덱스/트리거 생성 (여러 번 호출해도 안전)
+def ensure_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('incident_representatives') IS NOT NULL")
+        existed = cur.fetchone()[0]
+        if existed:
+            cur.execute(SUM_COLUMN_EXISTS_SQL)
+            if not cur.fetchone()[0]:
+                # 임베딩 합 컬럼이 없던 이전 버전 테이블: 파생 테이블이라 지우고 다시 만듦
+                logging.info("   🧭 [대표값] 이전 형식의 incident_representatives 재생성")
+                cur.execute("DROP TABLE incident_representatives CASCADE")
+                existed = False
+        cur.execute(SCHEMA_SQL)
+        if not existed:
+            # 처음 만들 때는 기존 OPEN 사건 전체를 채움
+            logging.info("   🧭 [대표값] incident_representatives 생성 및 초기 계산")
+            cur.execute(REBUILD_SQL)
+    conn.commit()
+
+
+# 전체 다시 계산 (임베딩 재생성 등으로 어긋났을 때)
+def rebuild(conn):
+    with conn.cursor() as cur:
+        cur.execute(REBUILD_SQL)
+        cur.execute("SELECT COUNT(*) FROM incident_representatives")
+        count = cur.fetchone()[0]
+    conn.commit()
+    logging.info(f"   🧭 [대표값] OPEN 사건 {count}개 재계산 완료")
+
+
+def load(conn):
+    with conn.cursor() as cur:
+        cur.execute(LOAD_SQL)
+        return cur.fetchall()
+
+
+if __name__ == "__main__":
+    from Daily_cluster import DB_CONFIG
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(message)s', datefmt='%H:%M:%S')
+    command = sys.argv[1] if len(sys.argv) > 1 else "ensure"
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        ensure_schema(conn)
+        if command == "rebuild":
+            rebuild(conn)
+    finally:
+        conn.close()
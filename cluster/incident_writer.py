@@ -0,0 +1,69 @@
+from psycopg2.extras import execute_values
+
+# ==========================================
+# 사건 일괄 저장 (incidents INSERT + 민원 연결)
+# ==========================================
+# 군집 결과를 모아 두었다가 flush 한 번에 저장합니다. (커밋은 호출한 쪽에서)
+# 1. 새 사건 id를 시퀀스에서 한 번에 받아 옴 → RETURNING 순서에 기대지 않고 군집과 id를 짝지음
+# 2. incidents는 execute_values 다중 행 INSERT
+# 3. 민원 연결은 UPDATE ... FROM (VALUES ...) 한 문장
+# 사건이 1만 개여도 DB 왕복은 페이지 수만큼(몇 번)입니다.
+
+WRITE_PAGE_SIZE = 5000  # 문장 하나에 넣을 최대 행 수
+
+ALLOCATE_IDS_SQL = "SELECT nextval(pg_get_serial_sequence('incidents', 'id')) FROM generate_series(1, %s)"
+
+INSERT_INCIDENTS_SQL = """
+    INSERT INTO incidents (id, title, status, complaint_count, keywords, district_id, opened_at)
+    VALUES %s
+"""
+INSERT_INCIDENTS_TEMPLATE = "(%s, %s, 'OPEN', %s, %s, %s, NOW())"
+
+LINK_COMPLAINTS_SQL = """
+    UPDATE complaints c
+    SET incident_id = v.incident_id, incident_linked_at = NOW(), incident_link_score = v.score
+    FROM (VALUES %s) AS v(complaint_id, incident_id, score)
+    WHERE c.id = v.complaint_id
+"""
+LINK_COMPLAINTS_TEMPLATE = "(%s::bigint, %s::bigint, %s::float8)"
+
+
+class IncidentWriter:
+
+    def __init__(self, link_score=0.95):
+        self.link_score = link_score
+        self.pending = []
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, title, complaint_ids, keywords, district_id):
+        self.pending.append((title, [int(i) for i in complaint_ids], keywords, district_id))
+
+    def flush(self, cursor):
+        """
+        모아 둔 사건을 저장하고 비웁니다.
+        반환값: [(사건 id, 제목, 민원 수)] — add 순서대로
+        """
+        if not self.pending:
+            return []
+        pending, self.pending = self.pending, []
+
+        cursor.execute(ALLOCATE_IDS_SQL, (len(pending),))
+        incident_ids = [row[0] for row in cursor.fetchall()]
+
+        execute_values(
+            cursor, INSERT_INCIDENTS_SQL,
+            [(inc_id, title, len(complaint_ids), keywords, district_id)
+             for inc_id, (title, complaint_ids, keywords, district_id) in zip(incident_ids, pending)],
+            template=INSERT_INCIDENTS_TEMPLATE, page_size=WRITE_PAGE_SIZE
+        )
+        execute_values(
+            cursor, LINK_COMPLAINTS_SQL,
+            [(complaint_id, inc_id, self.link_score)
+             for inc_id, (_, complaint_ids, _, _) in zip(incident_ids, pending)
+             for complaint_id in complaint_ids],
+            template=LINK_COMPLAINTS_TEMPLATE, page_size=WRITE_PAGE_SIZE
+        )
+
+        return [(inc_id, title, len(complaint_ids)) for inc_id, (title, complaint_ids, _, _) in zip(incident_ids, pending)]
@@ -1,15 +1,18 @@
+import argparse
 import psycopg2
 import pandas as pd
 import numpy as np
-import json
 import logging
 import re
 from collections import Counter
 from datetime import datetime
-from difflib import SequenceMatcher
 from sklearn.cluster import DBSCAN
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.metrics import silhouette_score
+import cluster_math
+import embedding_snapshot
+import group_pool
+from embedding_store import EmbeddingStore
+from incident_writer import IncidentWriter
 
 DB_CONFIG = {
     "host": "0.0.0.0",
@@ -23,56 +26,96 @@ logging.basicConfig(level=logging.INFO, format='🚀 %(message)s')
 
 LARGE_CLUSTER_THRESHOLD = 30
 
+# 3단계 문장 거리 엔진: sequence(기존 SequenceMatcher) | tfidf | shingle
+# tfidf/shingle은 빠르지만 sequence와 결과가 다르므로(compare_text_engines.py로 비교) 확인 후 직접 선택
+TEXT_ENGINE = "sequence"
+TEXT_EPS = cluster_math.TEXT_ENGINE_EPS[TEXT_ENGINE]
+
+# 1·2단계 임베딩 양자화: None(float32) | "int8" | "binary" (후보만 근사 후 재계산)
+EMBEDDING_QUANTIZATION = None
+
 def get_db_connection():
     return psycopg2.connect(**DB_CONFIG)
 
-def parse_embedding(emb_str):
-    try:
-        if isinstance(emb_str, str): return np.array(json.loads(emb_str))
-        elif isinstance(emb_str, list): return np.array(emb_str)
-        return np.zeros(1024)
-    except: return np.zeros(1024)
-
 def clean_text_for_title(text):
     text = re.sub(r'[^\w\s가-힣]', ' ', text)
     return ' '.join(text.split())
 
-def calculate_hybrid_distance(embeddings, keywords_list, alpha=0.6):
-    n = len(embeddings)
-    emb_sim = cosine_similarity(embeddings)
-    key_sim = np.zeros((n, n))
-    keyword_sets = [set(k) if k else set() for k in keywords_list]
-
-    for i in range(n):
-        for j in range(i, n):
-            if i == j: key_sim[i][j] = 1.0; continue
-            u_len = len(keyword_sets[i].union(keyword_sets[j]))
-            sim = len(keyword_sets[i].intersection(keyword_sets[j])) / u_len if u_len > 0 else 0.0
-            key_sim[i][j] = key_sim[j][i] = sim
-            
-    dist = 1 - ((emb_sim * alpha) + (key_sim * (1 - alpha)))
+# 거리 ≤ eps인 이웃만 담은 희소 그래프 (n × n 밀집 행렬을 만들지 않음)
+def calculate_hybrid_graph(embeddings, keywords_list, eps, alpha=0.6):
+    return cluster_math.hybrid_radius_graph(embeddings, keywords_list, eps=eps, alpha=alpha, quantization=EMBEDDING_QUANTIZATION)
+
+def calculate_text_distance(texts):
+    # 3단계 문장 거리 (엔진은 TEXT_ENGINE, cluster_math 참고)
+    return cluster_math.text_distance(texts, engine=TEXT_ENGINE)
+
+# 그룹(지역구·대상) 하나의 1~3단계 군집화 (DB 접근 없음, 프로세스 풀 워커에서도 실행)
+# 반환값: ([(그룹 내 위치 배열, 노이즈 여부)], [실루엣 점수]) — 위치 배열 순서대로 저장하면 직렬 실행과 같음
+def cluster_group(embeddings, payload):
+    keywords_list, texts = payload
+    parts = []
+    scores = []
+
+    if len(texts) < 2:
+        return [(np.arange(len(texts)), True)], scores
+
+    l1_graph = calculate_hybrid_graph(embeddings, keywords_list, eps=0.2, alpha=0.7)
+    l1_labels = DBSCAN(eps=0.2, min_samples=2, metric='precomputed').fit_predict(l1_graph)  
+
+    for l1_lab in set(l1_labels):
+        if l1_lab == -1:
+            parts.append((np.where(l1_labels == -1)[0], True))
+            continue
+
+        l1_indices = np.where(l1_labels == l1_lab)[0]
+        final_groups_to_save = []
+        if len(l1_indices) >= LARGE_CLUSTER_THRESHOLD:
+            l2_emb = embeddings[l1_indices]
+            l2_kw = [keywords_list[i] for i in l1_indices]            
+            l2_graph = calculate_hybrid_graph(l2_emb, l2_kw, eps=0.15, alpha=0.7)         
+            l2_labels = DBSCAN(eps=0.15, min_samples=2, metric='precomputed').fit_predict(l2_graph)
+
+            for l2_lab in set(l2_labels):
+                l2_indices = l1_indices[np.where(l2_labels == l2_lab)[0]]
+                
+                if l2_lab == -1:
+                    parts.append((l2_indices, True))
 
-    dist[dist < 0] = 0
+                else:
+                    final_groups_to_save.append(l2_indices)
 
-    return dist
+        else:
+            final_groups_to_save.append(l1_indices)
 
-def calculate_text_distance(texts):
-    n = len(texts)
-    dist_matrix = np.zeros((n, n))
+        for candidate_indices in final_groups_to_save:
+            if len(candidate_indices) < 2:
+                parts.append((candidate_indices, True))
 
-    for i in range(n):
-        for j in range(i, n):
-            if i == j:
-                dist_matrix[i][j] = 0.0
                 continue
 
-            sim = SequenceMatcher(None, texts[i], texts[j]).ratio()
-            dist = 1.0 - sim
-            dist_matrix[i][j] = dist_matrix[j][i] = dist
+            texts_in_group = [texts[i] for i in candidate_indices]
+            text_dist_matrix = calculate_text_distance(texts_in_group)
+        
+            l3_labels = DBSCAN(eps=TEXT_EPS, min_samples=2, metric='precomputed').fit_predict(text_dist_matrix)
+
+          
+            try:
+                valid_mask = l3_labels != -1
+                unique_core_labels = set(l3_labels[valid_mask])
+              
+                if len(unique_core_labels) >= 2 and np.sum(valid_mask) >= 2:
+                    score = silhouette_score(text_dist_matrix[valid_mask][:, valid_mask], l3_labels[valid_mask], metric='precomputed')
+                    scores.append(score)
+
+            except Exception as e:
+                pass
 
-    return dist_matrix
+            for l3_lab in set(l3_labels):
+                parts.append((candidate_indices[np.where(l3_labels == l3_lab)[0]], l3_lab == -1))
 
-def main():
+    return parts, scores
+
+def main(use_snapshot=False):
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -80,7 +123,7 @@ def main():
 
     try:
         sql = """
-            SELECT n.complaint_id as id, n.core_request, n.embedding,
+            SELECT n.complaint_id as id, n.core_request, vector_send(n.embedding) AS embedding,
                    n.keywords_jsonb, n.district_id, n.target_object, d.name as district_name
             FROM complaint_normalizations n
             JOIN complaints c ON n.complaint_id = c.id
@@ -88,9 +131,17 @@ def main():
             WHERE c.incident_id IS NULL AND n.is_current = true
         """
 
-        df = pd.read_sql(sql, conn)
+        if use_snapshot:
+            # 임베딩은 로컬 스냅샷(memmap)에서, DB에서는 새 행과 바뀐 상태 열만 받아 옴
+            snapshot = embedding_snapshot.refresh(conn)
+            meta = snapshot.meta
+            df, embeddings = snapshot.select(meta['is_current'] & meta['incident_id'].isna())
+            df = df.rename(columns={'complaint_id': 'id'})
+        else:
+            df = pd.read_sql(sql, conn)
         if df.empty: return
 
+        df = df.reset_index(drop=True)
         df['district_id'] = df['district_id'].fillna(0)
         df['target_object'] = df['target_object'].fillna('기타')
         df['district_name'] = df['district_name'].fillna('서울시')
@@ -102,86 +153,29 @@ def main():
 
         scores = []
 
-
-        for (dist_id, target), group in grouped:
-            if len(group) < 2:
-                save_incident(cursor, group, is_noise=True)
-                total_noise += 1
-
-                continue
-
-            embeddings = np.array([parse_embedding(e) for e in group['embedding']])
-            keywords_list = [k if k else [] for k in group['keywords_jsonb'].tolist()]
-            
-            l1_dist = calculate_hybrid_distance(embeddings, keywords_list, alpha=0.7)
-            l1_labels = DBSCAN(eps=0.2, min_samples=2, metric='precomputed').fit_predict(l1_dist)  
-
-            for l1_lab in set(l1_labels):
-                if l1_lab == -1:
-                    sub_df = group.iloc[np.where(l1_labels == -1)[0]]
-                    save_incident(cursor, sub_df, is_noise=True)
-                    total_noise += len(sub_df)
-                    continue
-
-                l1_indices = np.where(l1_labels == l1_lab)[0]
-                l1_df = group.iloc[l1_indices]
-                final_groups_to_save = []
-                if len(l1_df) >= LARGE_CLUSTER_THRESHOLD:
-                    l2_emb = embeddings[l1_indices]
-                    l2_kw = [keywords_list[i] for i in l1_indices]            
-                    l2_dist = calculate_hybrid_distance(l2_emb, l2_kw, alpha=0.7)         
-                    l2_labels = DBSCAN(eps=0.15, min_samples=2, metric='precomputed').fit_predict(l2_dist)
-
-                    for l2_lab in set(l2_labels):
-                        l2_sub_indices = np.where(l2_labels == l2_lab)[0]
-                        l2_df = l1_df.iloc[l2_sub_indices]
-                        
-                        if l2_lab == -1:
-                            save_incident(cursor, l2_df, is_noise=True)
-                            total_noise += len(l2_df)
-
-                        else:
-                            final_groups_to_save.append(l2_df)
-
+        # 그룹별 계산은 프로세스 풀에서 병렬로 (임베딩은 공유 메모리), 저장은 아래에서 한 트랜잭션으로
+        # 임베딩은 pgvector 바이너리로 받아 float32 행렬 하나로 (NULL·차원 불일치는 0벡터)
+        if not use_snapshot:
+            embeddings = EmbeddingStore.from_values(df.pop('embedding')).vectors
+        groups = [group for _, group in grouped]
+        tasks = [
+            (group.index.to_numpy(), ([k if k else [] for k in group['keywords_jsonb'].tolist()], group['core_request'].tolist()))
+            for group in groups
+        ]
+        results = group_pool.map_groups(cluster_group, embeddings, tasks)
+
+        writer = IncidentWriter()
+        for group, (parts, group_scores) in zip(groups, results):
+            scores.extend(group_scores)
+            for positions, is_noise in parts:
+                save_incident(writer, group.iloc[positions], is_noise=is_noise)
+                if is_noise:
+                    total_noise += len(positions)
                 else:
-                    final_groups_to_save.append(l1_df)
-
-                for candidate_df in final_groups_to_save:
-                    if len(candidate_df) < 2:
-                        save_incident(cursor, candidate_df, is_noise=True)
-
-                        continue
-
-                    texts = candidate_df['core_request'].tolist()
-                    text_dist_matrix = calculate_text_distance(texts)
-                
-                    l3_labels = DBSCAN(eps=0.25, min_samples=2, metric='precomputed').fit_predict(text_dist_matrix)
-
-                  
-                    try:
-                        valid_mask = l3_labels != -1
-                        unique_core_labels = set(l3_labels[valid_mask])
-                      
-                        if len(unique_core_labels) >= 2 and np.sum(valid_mask) >= 2:
-                            score = silhouette_score(text_dist_matrix[valid_mask][:, valid_mask], l3_labels[valid_mask], metric='precomputed')
-                            scores.append(score)
-
-                    except Exception as e:
-                        pass
-
-                    for l3_lab in set(l3_labels):
-                        l3_indices = np.where(l3_labels == l3_lab)[0]
-                        final_df = candidate_df.iloc[l3_indices]
-
-                      
-                        if l3_lab == -1:
-                            save_incident(cursor, final_df, is_noise=True)
-                            total_noise += len(final_df)
-
-                        else:
-                            save_incident(cursor, final_df, is_noise=False)
-                            total_clusters += 1
+                    total_clusters += 1
 
+        # 모든 사건 INSERT + 민원 연결을 한 번에 저장
+        writer.flush(cursor)
         conn.commit()
 
         avg_score = sum(scores) / len(scores) if scores else 0
@@ -210,13 +204,12 @@ def main():
         cursor.close()
         conn.close()
 
-def save_incident(cursor, df, is_noise=False):
+# 사건 저장 대기열(writer)에 추가 (노이즈는 민원 1건당 사건 1개, 실제 저장은 writer.flush에서 한 번에)
+def save_incident(writer, df, is_noise=False):
     if is_noise:
         iterator = df.iterrows()
-        count_per_incident = 1
     else:
         iterator = [(None, df)]
-        count_per_incident = len(df)
 
     for _, row_data in iterator:
         if is_noise:
@@ -247,21 +240,12 @@ def save_incident(cursor, df, is_noise=False):
             
         d_id = int(row_item['district_id']) if row_item['district_id'] > 0 else None
         
-        cursor.execute("""
-            INSERT INTO incidents (title, status, complaint_count, keywords, district_id, opened_at)
-            VALUES (%s, 'OPEN', %s, %s, %s, NOW())
-            RETURNING id
-        """, (final_title, count_per_incident, main_keyword, d_id))
-        inc_id = cursor.fetchone()[0]
-      
-        ids = tuple(target_df['id'].tolist())
-        cursor.execute(f"""
-            UPDATE complaints
-            SET incident_id = %s, incident_linked_at = NOW(), incident_link_score = 0.95
-            WHERE id IN %s
-        """, (inc_id, ids))
+        writer.add(final_title, target_df['id'].tolist(), main_keyword, d_id)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--snapshot", action="store_true", help="임베딩을 로컬 스냅샷에서 읽기 (embedding_snapshot.py)")
+    args = parser.parse_args()
 
-    main()
\ No newline at end of file
+    main(use_snapshot=args.snapshot)
\ No newline at end of file
@@ -0,0 +1,44 @@
+import numpy as np
+
+# ==========================================
+# pgvector 임베딩 로딩 (바이너리 → float32 행렬)
+# ==========================================
+# SQL에서 embedding 대신 vector_send(embedding)을 조회하면 pgvector 바이너리 형식(bytea)으로 받습니다.
+#   [dim: int16][unused: int16][값: float32 × dim] (모두 big-endian)
+# 문자열 '[0.1, ...]'을 json.loads → 파이썬 리스트 → float64 배열로 한 행씩 바꾸는 대신,
+# 전체 행을 한 번에 미리 할당한 float32 행렬로 옮깁니다.
+#
+# 사용 예:
+#   df = pd.read_sql("SELECT ..., vector_send(n.embedding) AS embedding FROM ...", conn)
+#   embeddings = vector_io.decode_vectors(df.pop('embedding'))
+
+
+def vector_dim(value):
+    return int.from_bytes(bytes(value[:2]), "big")
+
+
+def decode_vectors(values, dim=None):
+    """
+    values: vector_send 결과 목록 (memoryview/bytes, NULL은 None → 0벡터)
+    dim: 생략하면 첫 번째 값의 차원
+    반환값: (len(values), dim) float32 행렬
+    """
+    values = list(values)
+    present = [i for i, value in enumerate(values) if value is not None]
+    if dim is None:
+        dim = vector_dim(values[present[0]]) if present else 0
+
+    out = np.zeros((len(values), dim), dtype=np.float32)
+    if not present:
+        return out
+
+    record = np.dtype([("dim", ">i2"), ("unused", ">i2"), ("values", ">f4", (dim,))])
+    raw = b"".join(values[i] for i in present)
+    if len(raw) != len(present) * record.itemsize:
+        raise ValueError(f"임베딩 차원이 {dim}이 아닌 값이 있습니다.")
+    records = np.frombuffer(raw, dtype=record)
+    if (records["dim"] != dim).any():
+        raise ValueError(f"임베딩 차원이 {dim}이 아닌 값이 있습니다.")
+
+    out[present] = records["values"]
+    return out
@@ -1,11 +1,16 @@
+import argparse
 import psycopg2
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-import json
+import os
+import sys
 from sklearn.manifold import TSNE
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cluster'))
+import embedding_snapshot
+import vector_io
+
 DB_CONFIG = { "host": "localhost", "dbname": "postgres", "user": "postgres", "password": "0000", "port": "5432" }
 
 import platform
@@ -13,18 +18,11 @@ if platform.system() == 'Darwin': plt.rc('font', family='AppleGothic')
 else: plt.rc('font', family='Malgun Gothic')
 plt.rc('axes', unicode_minus=False)
 
-def parse_vector(val):
-    if isinstance(val, str):
-        try: return np.array(json.loads(val))
-        except: return np.zeros(1024)
-    return np.array(val) if val is not None else np.zeros(1024)
-
-def plot_final_polished():
-    conn = psycopg2.connect(**DB_CONFIG)
+def plot_final_polished(use_snapshot=False):
     print("📥 데이터 불러오는 중...")
     
     sql = """
-        SELECT c.id, c.incident_id, n.embedding
+        SELECT c.id, c.incident_id, vector_send(n.embedding) AS embedding
         FROM complaints c
         JOIN complaint_normalizations n ON c.id = n.complaint_id
         WHERE c.incident_id IS NOT NULL AND n.embedding IS NOT NULL
@@ -32,17 +30,26 @@ def plot_final_polished():
     
     import warnings
     warnings.filterwarnings('ignore')
-    df = pd.read_sql(sql, conn)
-    conn.close()
+    if use_snapshot:
+        # DB에 접속하지 않고 마지막으로 갱신한 로컬 스냅샷만 읽음 (갱신: embedding_snapshot.py refresh)
+        snapshot = embedding_snapshot.load()
+        meta = snapshot.meta
+        df, matrix = snapshot.select(meta['is_current'] & meta['incident_id'].notna() & meta['has_embedding'])
+        df = df[['complaint_id', 'incident_id']].rename(columns={'complaint_id': 'id'})
+    else:
+        conn = psycopg2.connect(**DB_CONFIG)
+        df = pd.read_sql(sql, conn)
+        conn.close()
     
     if df.empty: 
         print("❌ 군집화된 데이터가 없습니다.")
         return
 
-    df['vec'] = df['embedding'].apply(parse_vector)
+    # pgvector 바이너리 → float32 행렬 (행마다 json 파싱하지 않음)
+    if not use_snapshot:
+        matrix = vector_io.decode_vectors(df.pop('embedding'))
     
     print("🎨 t-SNE 좌표 계산 중... (n_iter 옵션 제거)")
-    matrix = np.vstack(df['vec'].values)
     tsne = TSNE(n_components=2, random_state=42, perplexity=40)
     visual_data = tsne.fit_transform(matrix)
     
@@ -80,4 +87,8 @@ def plot_final_polished():
     print("✅ 저장 완료: final_polished_result.png")
 
 if __name__ == "__main__":
-    plot_final_polished()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--snapshot", action="store_true", help="임베딩을 로컬 스냅샷에서 읽기 (cluster/embedding_snapshot.py)")
+    args = parser.parse_args()
+
+    plot_final_polished(use_snapshot=args.snapshot)
\ No newline at end of file
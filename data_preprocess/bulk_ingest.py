@@ -0,0 +1,591 @@
+import argparse
+import ast
+import csv
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+import requests
+
+# ==========================================
+# 구조화 CSV → DB 일괄 이관 (COPY + 배치 임베딩)
+# ==========================================
+# 한 행마다 complaints INSERT → Ollama 임베딩 1건 → complaint_normalizations INSERT → COMMIT 하던 방식 대신
+# 1. CSV를 INGEST_CHUNK_ROWS 행씩 나눠 읽고, 청크마다 INGEST_WORKERS개 워커 중 하나가 처리
+# 2. 청크의 search_text를 EMBED_BATCH_SIZE개씩 /api/embed 한 번으로, 최대 EMBED_WORKERS개 요청을 동시에 보내 임베딩
+# 3. 청크 전체를 COPY로 임시 스테이징 테이블에 올린 뒤
+# 4. complaints / complaint_normalizations를 INSERT ... SELECT로 넣고 청크마다 한 번 커밋합니다.
+#
+# 재실행(멱등성):
+# - 행마다 원본 식별 해시(source_hash: 접수일·제목·본문)와 내용 해시(content_hash: 사용하는 모든 열)를 계산
+# - ingest_sources(source_hash → complaint_id)에 이미 있고 내용이 같으면 임베딩 없이 건너뜀,
+#   내용이 바뀌었으면 기존 민원/정규화를 갱신(upsert), 없으면 새로 추가
+# - 끝난 청크는 ingest_checkpoints에 데이터와 같은 트랜잭션으로 기록 → 다시 실행하면 그 청크는 읽기만 하고 넘어감
+# - 임베딩 실패나 DB 오류로 들어가지 못한 행은 <CSV 이름>_dead_letter.csv에 사유와 함께 남기고 다음 청크를 계속 처리
+#   (DB 오류가 나면 청크를 반씩 나눠 다시 넣어 문제 있는 행만 남김, 실패가 있던 청크는 체크포인트를 남기지 않으므로 다시 실행하면 실패한 행만 다시 시도됨)
+#
+# 사용법:
+#   python bulk_ingest.py 강동구_structured_final.csv [--district-id 2] [--adopt-existing]
+#   --adopt-existing: 이 모듈 이전 방식으로 이미 들어간 민원을 (생성일·제목·본문)으로 찾아 ingest_sources에 연결
+#                     (처음 한 번만 필요, 중복 이관 방지)
+
+DB_CONFIG = {
+    "host": "localhost",
+    "database": "postgres",
+    "user": "postgres",
+    "password": "0000",
+    "port": 5432
+}
+
+OLLAMA_EMBED_URL = os.getenv("OLLAMA_EMBED_URL", "http://localhost:11434/api/embed")
+EMBED_MODEL = "mxbai-embed-large"
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 32))  # /api/embed 요청 하나에 넣는 텍스트 수
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", 4))  # 동시에 보내는 임베딩 요청 수 (Ollama 부하 상한)
+EMBED_TIMEOUT = 120
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", 2000))  # 청크(= 트랜잭션) 하나의 행 수
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))  # 동시에 처리하는 청크 수 (워커마다 DB 연결 1개)
+DEFAULT_DISTRICT_ID = 2
+
+IDENTITY_COLUMNS = ["req_date", "req_title", "req_content"]
+CONTENT_COLUMNS = [
+    "req_date", "req_title", "req_content", "resp_date", "resp_content", "resp_dept",
+    "search_text", "topic", "category", "keywords",
+]
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS ingest_sources (
+    source_hash TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    complaint_id BIGINT NOT NULL REFERENCES complaints(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+    source_key TEXT NOT NULL,
+    ingested_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ingest_sources_complaint_idx ON ingest_sources (complaint_id);
+
+-- 행마다 임베딩 모델 기록 (AI 서버가 저장 벡터를 재사용할지 판단). 이미 있으면 잠금 없이 넘어감
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'complaint_normalizations' AND column_name = 'embedding_model'
+    ) THEN
+        ALTER TABLE complaint_normalizations ADD COLUMN embedding_model TEXT;
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+    source_key TEXT NOT NULL,
+    first_row INTEGER NOT NULL,
+    row_count INTEGER NOT NULL,
+    inserted INTEGER NOT NULL,
+    updated INTEGER NOT NULL,
+    unchanged INTEGER NOT NULL,
+    finished_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (source_key, first_row, row_count)
+);
+"""
+
+STAGING_COLUMNS = [
+    "seq", "source_hash", "content_hash", "received_at", "title", "body", "answer", "status", "address_text",
+    "updated_at", "closed_at", "neutral_summary", "core_request", "target_object", "keywords_jsonb", "embedding",
+    "resp_dept",
+]
+
+CREATE_STAGING_SQL = """
+    CREATE TEMP TABLE ingest_staging (
+        seq INTEGER,
+        source_hash TEXT,
+        content_hash TEXT,
+        complaint_id BIGINT,
+        is_new BOOLEAN NOT NULL DEFAULT false,
+        received_at TIMESTAMP,
+        title TEXT,
+        body TEXT,
+        answer TEXT,
+        status TEXT,
+        address_text TEXT,
+        updated_at TIMESTAMP,
+        closed_at TIMESTAMP,
+        neutral_summary TEXT,
+        core_request TEXT,
+        target_object TEXT,
+        keywords_jsonb JSONB,
+        embedding vector,
+        resp_dept TEXT
+    ) ON COMMIT DROP
+"""
+
+COPY_STAGING_SQL = f"COPY ingest_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+# 이미 들어간 원본 행은 기존 민원 id를 붙이고, 그 사이 다른 워커가 같은 내용으로 넣은 행은 버림
+MATCH_EXISTING_SQL = """
+    UPDATE ingest_staging s SET complaint_id = i.complaint_id
+    FROM ingest_sources i
+    WHERE i.source_hash = s.source_hash;
+
+    DELETE FROM ingest_staging s
+    USING ingest_sources i
+    WHERE i.source_hash = s.source_hash AND i.content_hash = s.content_hash;
+"""
+
+# 새 행은 민원 id를 시퀀스에서 미리 받아 두면 RETURNING 순서에 기대지 않고 정규화 행과 짝지을 수 있음
+ALLOCATE_IDS_SQL = """
+    UPDATE ingest_staging
+    SET complaint_id = nextval(pg_get_serial_sequence('complaints', 'id')), is_new = true
+    WHERE complaint_id IS NULL
+"""
+
+# 새 원본 해시를 선점 (동시에 같은 행을 넣으려는 워커가 있으면 먼저 커밋한 쪽만 남음)
+CLAIM_SOURCES_SQL = """
+    WITH claimed AS (
+        INSERT INTO ingest_sources (source_hash, content_hash, complaint_id, source_key)
+        SELECT source_hash, content_hash, complaint_id, %(source_key)s
+        FROM ingest_staging
+        WHERE is_new
+        ON CONFLICT (source_hash) DO NOTHING
+        RETURNING source_hash
+    )
+    DELETE FROM ingest_staging s
+    WHERE s.is_new AND NOT EXISTS (SELECT 1 FROM claimed c WHERE c.source_hash = s.source_hash)
+"""
+
+INSERT_COMPLAINTS_SQL = """
+    INSERT INTO complaints (
+        id, received_at, title, body, answer, district_id, status, address_text,
+        created_at, updated_at, closed_at,
+        current_department_id, applicant_id, tag
+    )
+    SELECT complaint_id, received_at, title, body, answer, %(district_id)s, status::complaint_status, address_text,
+           received_at, updated_at, closed_at,
+           3, 1, 'OTHER'
+    FROM ingest_staging
+    WHERE is_new
+    ORDER BY seq
+"""
+
+INSERT_NORMALIZATIONS_SQL = """
+    INSERT INTO complaint_normalizations (
+        complaint_id, neutral_summary, core_request,
+        target_object, keywords_jsonb, embedding, embedding_model, resp_dept, created_at
+    )
+    SELECT complaint_id, neutral_summary, core_request,
+           target_object, keywords_jsonb, embedding, %(embed_model)s, resp_dept, received_at
+    FROM ingest_staging
+    WHERE is_new
+    ORDER BY seq
+"""
+
+# 내용이 바뀐 기존 행: 답변/부서/종결 정보와 현재 정규화만 덮어씀 (처리 중인 민원의 상태는 종결로만 바꿈)
+UPDATE_EXISTING_SQL = """
+    UPDATE complaints c
+    SET answer = s.answer,
+        address_text = s.address_text,
+        status = CASE WHEN s.status = 'CLOSED' THEN 'CLOSED'::complaint_status ELSE c.status END,
+        updated_at = s.updated_at,
+        closed_at = s.closed_at
+    FROM ingest_staging s
+    WHERE c.id = s.complaint_id AND NOT s.is_new;
+
+    UPDATE complaint_normalizations n
+    SET neutral_summary = s.neutral_summary,
+        core_request = s.core_request,
+        target_object = s.target_object,
+        keywords_jsonb = s.keywords_jsonb,
+        embedding = s.embedding,
+        embedding_model = %(embed_model)s,
+        resp_dept = s.resp_dept
+    FROM ingest_staging s
+    WHERE n.complaint_id = s.complaint_id AND n.is_current = true AND NOT s.is_new;
+
+    UPDATE ingest_sources i
+    SET content_hash = s.content_hash, updated_at = now()
+    FROM ingest_staging s
+    WHERE i.source_hash = s.source_hash AND NOT s.is_new;
+"""
+
+COUNT_STAGING_SQL = "SELECT count(*) FILTER (WHERE is_new), count(*) FILTER (WHERE NOT is_new) FROM ingest_staging"
+
+INSERT_CHECKPOINT_SQL = """
+    INSERT INTO ingest_checkpoints (source_key, first_row, row_count, inserted, updated, unchanged)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT DO NOTHING
+"""
+
+SELECT_CHECKPOINTS_SQL = "SELECT first_row, row_count FROM ingest_checkpoints WHERE source_key = %s"
+
+SELECT_KNOWN_SQL = "SELECT source_hash, content_hash FROM ingest_sources WHERE source_hash = ANY(%s)"
+
+# 이전 방식(COUNT(*) 오프셋)으로 들어간 민원을 원본 행과 연결 (생성일은 세 이관 스크립트 모두 req_date)
+ADOPT_EXISTING_SQL = """
+    INSERT INTO ingest_sources (source_hash, content_hash, complaint_id, source_key)
+    SELECT DISTINCT ON (v.source_hash) v.source_hash, v.content_hash, c.id, v.source_key
+    FROM (VALUES %s) AS v(source_hash, content_hash, source_key, created_at, title, body)
+    JOIN complaints c
+      ON c.created_at = v.created_at AND c.title = v.title AND c.body IS NOT DISTINCT FROM v.body
+    WHERE NOT EXISTS (SELECT 1 FROM ingest_sources i WHERE i.complaint_id = c.id)
+    ORDER BY v.source_hash, c.id
+    ON CONFLICT (source_hash) DO NOTHING
+"""
+ADOPT_EXISTING_TEMPLATE = "(%s, %s, %s, %s::timestamp, %s, %s)"
+
+_local = threading.local()
+
+
+# 키워드의 불필요한 부분 삭제
+def clean_keywords(raw_value):
+    if pd.isna(raw_value) or str(raw_value).strip() == "":
+        return []
+    try:
+        return ast.literal_eval(str(raw_value))
+    except (ValueError, SyntaxError):
+        return [k.strip() for k in str(raw_value).split(',')]
+
+
+def detect_encoding(path):
+    # 청크로 읽으면 중간에서야 디코딩 오류가 나므로 미리 파일 전체를 확인
+    try:
+        with open(path, encoding="utf-8-sig") as f:
+            for _ in f:
+                pass
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "cp949"
+
+
+def source_fingerprint(path):
+    """체크포인트 키: 파일 이름 + 내용 해시 (파일이 바뀌면 체크포인트를 새로 씀)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return f"{os.path.basename(path)}:{digest.hexdigest()[:16]}"
+
+
+def _row_hash(frame, columns):
+    values = frame.reindex(columns=columns).fillna("").astype(str).apply(lambda col: col.str.strip())
+    return ["\x1f".join(row).encode("utf-8") for row in values.itertuples(index=False)]
+
+
+def add_hashes(chunk):
+    chunk = chunk.copy()
+    chunk["source_hash"] = [hashlib.sha256(v).hexdigest() for v in _row_hash(chunk, IDENTITY_COLUMNS)]
+    chunk["content_hash"] = [hashlib.sha256(v).hexdigest() for v in _row_hash(chunk, CONTENT_COLUMNS)]
+    return chunk
+
+
+def ensure_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA_SQL)
+    conn.commit()
+
+
+class DeadLetter:
+    """들어가지 못한 원본 행을 사유와 함께 CSV로 남김 (워커 스레드에서 같이 씀)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def write(self, rows, reason):
+        if rows.empty:
+            return
+        rows = rows.assign(error=str(reason)[:500], failed_at=datetime.now().isoformat(timespec="seconds"))
+        with self._lock:
+            exists = os.path.exists(self.path)
+            rows.to_csv(self.path, mode="a", header=not exists, index=False,
+                        encoding="utf-8" if exists else "utf-8-sig")
+            self.count += len(rows)
+
+
+def _session():
+    # 스레드마다 연결을 재사용 (requests.Session은 스레드 간 공유하지 않음)
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def _embed_request(texts):
+    res = _session().post(
+        OLLAMA_EMBED_URL,
+        json={"model": EMBED_MODEL, "input": [f"doc: {text}" for text in texts]},
+        timeout=EMBED_TIMEOUT
+    )
+    res.raise_for_status()
+    embeddings = res.json()["embeddings"]
+    if len(embeddings) != len(texts):
+        raise ValueError(f"임베딩 개수 불일치: {len(embeddings)} / {len(texts)}")
+    return embeddings
+
+
+def _embed_batch(texts):
+    try:
+        return _embed_request(texts)
+    except Exception as e:
+        print(f"Embedding Error (배치 {len(texts)}건, 한 건씩 다시 시도): {e}")
+
+    # 배치가 실패하면 한 건씩 다시 요청해 실패한 행만 None으로 남김
+    embeddings = []
+    for text in texts:
+        try:
+            embeddings.extend(_embed_request([text]))
+        except Exception as e:
+            print(f"Embedding Error: {e}")
+            embeddings.append(None)
+    return embeddings
+
+
+def embed_texts(texts, pool):
+    """texts 순서대로 임베딩 목록 (실패한 항목은 None)"""
+    batches = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+    return [embedding for batch in pool.map(_embed_batch, batches) for embedding in batch]
+
+
+def _timestamp(value):
+    return None if pd.isna(value) else value.isoformat()
+
+
+def _staging_rows(chunk, embeddings):
+    for seq, (row, vector) in enumerate(zip(chunk.itertuples(index=False), embeddings)):
+        req_time = _timestamp(row.req_date)
+        resp_time = _timestamp(row.resp_date)
+        yield (
+            seq, row.source_hash, row.content_hash, req_time, row.req_title, row.req_content, row.resp_content,
+            'CLOSED' if resp_time else 'RECEIVED', row.resp_dept,
+            resp_time or req_time, resp_time,
+            row.search_text, row.topic, row.category,
+            json.dumps(clean_keywords(row.keywords), ensure_ascii=False),
+            json.dumps(vector), row.resp_dept,
+        )
+
+
+def load_chunk(conn, chunk, embeddings, source_key, district_id=DEFAULT_DISTRICT_ID, checkpoint=None):
+    """
+    임베딩까지 끝난 행을 스테이징 → 두 테이블로 넣거나 갱신하고 커밋합니다.
+    checkpoint=(first_row, row_count, unchanged)면 같은 트랜잭션에 청크 완료를 기록합니다.
+    반환값: (새로 넣은 행 수, 갱신한 행 수)
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(_staging_rows(chunk, embeddings))
+    buffer.seek(0)
+
+    inserted = updated = 0
+    try:
+        with conn.cursor() as cur:
+            if len(chunk):
+                cur.execute(CREATE_STAGING_SQL)
+                cur.copy_expert(COPY_STAGING_SQL, buffer)
+                cur.execute(MATCH_EXISTING_SQL)
+                cur.execute(ALLOCATE_IDS_SQL)
+                cur.execute(CLAIM_SOURCES_SQL, {"source_key": source_key})
+                cur.execute(INSERT_COMPLAINTS_SQL, {"district_id": district_id})
+                cur.execute(INSERT_NORMALIZATIONS_SQL, {"embed_model": EMBED_MODEL})
+                cur.execute(UPDATE_EXISTING_SQL, {"embed_model": EMBED_MODEL})
+                cur.execute(COUNT_STAGING_SQL)
+                inserted, updated = cur.fetchone()
+            if checkpoint is not None:
+                first_row, row_count, unchanged = checkpoint
+                cur.execute(INSERT_CHECKPOINT_SQL, (
+                    source_key, first_row, row_count, inserted, updated, unchanged + len(chunk) - inserted - updated
+                ))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return inserted, updated
+
+
+def load_rows(conn, chunk, embeddings, source_key, district_id, dead_letter, raw):
+    """
+    load_chunk가 DB 오류로 실패한 행을 반씩 나눠 다시 넣습니다. (나눈 부분마다 따로 커밋)
+    한 행까지 줄여도 실패하거나 연결이 끊기면 그 행들만 dead letter로 보냅니다.
+    반환값: (새로 넣은 행 수, 갱신한 행 수, 실패한 행 수)
+    """
+    try:
+        inserted, updated = load_chunk(conn, chunk, embeddings, source_key, district_id)
+        return inserted, updated, 0
+    except psycopg2.Error as e:
+        if conn.closed or len(chunk) <= 1:
+            dead_letter.write(raw.loc[chunk.index], f"DB 오류: {e}")
+            return 0, 0, len(chunk)
+
+    middle = len(chunk) // 2
+    first = load_rows(conn, chunk.iloc[:middle], embeddings[:middle], source_key, district_id, dead_letter, raw)
+    second = load_rows(conn, chunk.iloc[middle:], embeddings[middle:], source_key, district_id, dead_letter, raw)
+    return tuple(a + b for a, b in zip(first, second))
+
+
+def adopt_existing(conn, chunk, source_key):
+    rows = [
+        (row.source_hash, row.content_hash, source_key, _timestamp(row.req_date), row.req_title, row.req_content)
+        for row in chunk.itertuples(index=False) if not pd.isna(row.req_date)
+    ]
+    if not rows:
+        return
+    with conn.cursor() as cur:
+        execute_values(cur, ADOPT_EXISTING_SQL, rows, template=ADOPT_EXISTING_TEMPLATE, page_size=len(rows))
+    conn.commit()
+
+
+def read_chunks(csv_file, chunk_rows=INGEST_CHUNK_ROWS):
+    """CSV를 chunk_rows 행씩 읽어 (CSV 안의 시작 행 번호, 원본 문자열 DataFrame)을 돌려줌"""
+    reader = pd.read_csv(csv_file, encoding=detect_encoding(csv_file), chunksize=chunk_rows, dtype=str)
+    start = 0
+    for chunk in reader:
+        yield start, chunk
+        start += len(chunk)
+
+
+def prepare_chunk(chunk):
+    # 해시는 원본 문자열로 계산한 뒤 날짜 변환
+    chunk = add_hashes(chunk)
+    chunk['req_date'] = pd.to_datetime(chunk['req_date'], errors='coerce')
+    chunk['resp_date'] = pd.to_datetime(chunk['resp_date'], errors='coerce')
+    return chunk.replace({np.nan: None})
+
+
+def _connection(db_config, connections):
+    conn = getattr(_local, "conn", None)
+    if conn is None or conn.closed:
+        conn = psycopg2.connect(**db_config)
+        _local.conn = conn
+        connections.append(conn)
+    return conn
+
+
+def process_chunk(ctx, start, raw):
+    """청크 하나를 끝까지 처리 (워커 스레드). 반환값: 건수 dict"""
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "failed": 0}
+    conn = _connection(ctx["db_config"], ctx["connections"])
+    started = time.perf_counter()
+    # 이미 dead letter로 보낸 행 (청크 전체가 실패해도 두 번 쓰지 않음)
+    dead_index = pd.Index([])
+    try:
+        chunk = prepare_chunk(raw)
+        # 같은 청크 안의 중복 원본 행은 한 번만
+        unique = chunk.drop_duplicates("source_hash", keep="last")
+        stats["unchanged"] += len(chunk) - len(unique)
+
+        if ctx["adopt_existing"]:
+            adopt_existing(conn, unique, ctx["source_key"])
+
+        with conn.cursor() as cur:
+            cur.execute(SELECT_KNOWN_SQL, (unique["source_hash"].tolist(),))
+            known = dict(cur.fetchall())
+        conn.commit()
+        todo = unique[unique["source_hash"].map(known) != unique["content_hash"]]
+        stats["unchanged"] += len(unique) - len(todo)
+
+        embeddings = embed_texts(todo["search_text"].tolist(), ctx["embed_pool"])
+        ok = np.array([vector is not None for vector in embeddings], dtype=bool)
+        stats["failed"] = int((~ok).sum())
+        ctx["dead_letter"].write(raw.loc[todo.index[~ok]], "임베딩 실패")
+        dead_index = todo.index[~ok]
+
+        # 실패한 행이 있으면 체크포인트를 남기지 않음 → 다시 실행할 때 그 행만 다시 임베딩
+        checkpoint = (start, len(raw), stats["unchanged"]) if not stats["failed"] else None
+        rows, vectors = todo[ok], [v for v in embeddings if v is not None]
+        db_failed = 0
+        try:
+            stats["inserted"], stats["updated"] = load_chunk(
+                conn, rows, vectors, ctx["source_key"], ctx["district_id"], checkpoint
+            )
+        except psycopg2.Error as e:
+            if conn.closed:
+                raise
+            # 문제 있는 행만 골라내고 나머지는 넣음 (체크포인트 없음 → 다시 실행하면 실패한 행만 다시 시도)
+            print(f"⚠️ [{start}~{start + len(raw)}행] DB 오류, 행을 나눠 다시 시도: {e}")
+            stats["inserted"], stats["updated"], db_failed = load_rows(
+                conn, rows, vectors, ctx["source_key"], ctx["district_id"], ctx["dead_letter"], raw
+            )
+            stats["failed"] += db_failed
+        # 그 사이 다른 워커가 같은 내용으로 넣은 행
+        stats["unchanged"] += int(ok.sum()) - stats["inserted"] - stats["updated"] - db_failed
+    except Exception as e:
+        if not conn.closed:
+            conn.rollback()
+        stats = {"inserted": 0, "updated": 0, "unchanged": 0, "failed": len(raw)}
+        ctx["dead_letter"].write(raw.drop(index=dead_index), f"DB 오류: {e}")
+        print(f"❌ [{start}~{start + len(raw)}행] 청크 실패 → dead letter 기록: {e}")
+        return stats
+
+    print(f"✅ [{start}~{start + len(raw)}행] 추가 {stats['inserted']} / 갱신 {stats['updated']} / "
+          f"변경 없음 {stats['unchanged']} / 실패 {stats['failed']} ({time.perf_counter() - started:.1f}초)")
+    return stats
+
+
+def ingest(csv_file, db_config=DB_CONFIG, district_id=DEFAULT_DISTRICT_ID, adopt=False, workers=INGEST_WORKERS):
+    source_key = source_fingerprint(csv_file)
+    conn = psycopg2.connect(**db_config)
+    try:
+        ensure_schema(conn)
+        with conn.cursor() as cur:
+            cur.execute(SELECT_CHECKPOINTS_SQL, (source_key,))
+            done = set(cur.fetchall())
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"🚀 {source_key} 이관 시작 (완료된 청크 {len(done)}개는 건너뜀)")
+
+    dead_letter = DeadLetter(f"{os.path.splitext(csv_file)[0]}_dead_letter.csv")
+    totals = {"inserted": 0, "updated": 0, "unchanged": 0, "failed": 0, "skipped_chunks": 0}
+    connections = []
+    started = time.perf_counter()
+
+    def collect(futures):
+        for future in futures:
+            for key, value in future.result().items():
+                totals[key] += value
+
+    try:
+        with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as embed_pool, \
+             ThreadPoolExecutor(max_workers=workers) as chunk_pool:
+            ctx = {
+                "db_config": db_config, "district_id": district_id, "source_key": source_key,
+                "adopt_existing": adopt, "embed_pool": embed_pool, "dead_letter": dead_letter,
+                "connections": connections,
+            }
+            pending = set()
+            for start, raw in read_chunks(csv_file):
+                if (start, len(raw)) in done:
+                    totals["skipped_chunks"] += 1
+                    continue
+                # 읽어 둔 청크가 워커 수의 두 배를 넘지 않도록 (메모리 상한)
+                if len(pending) >= workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                pending.add(chunk_pool.submit(process_chunk, ctx, start, raw))
+            collect(pending)
+    finally:
+        for conn in connections:
+            conn.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✨ 이관 프로세스 종료 ({elapsed:.1f}초): 추가 {totals['inserted']} / 갱신 {totals['updated']} / "
+          f"변경 없음 {totals['unchanged']} / 실패 {totals['failed']} / 건너뛴 청크 {totals['skipped_chunks']}")
+    if dead_letter.count:
+        print(f"⚠️ 실패한 {dead_letter.count}건 → {dead_letter.path} (다시 실행하면 해당 청크만 재시도)")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv_file")
+    parser.add_argument("--district-id", type=int, default=DEFAULT_DISTRICT_ID)
+    parser.add_argument("--adopt-existing", action="store_true",
+                        help="이전 방식으로 들어간 민원을 원본 행과 연결 (처음 한 번)")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    args = parser.parse_args()
+
+    ingest(args.csv_file, district_id=args.district_id, adopt=args.adopt_existing, workers=args.workers)
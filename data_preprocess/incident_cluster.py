@@ -1,13 +1,21 @@
+import argparse
 import psycopg2
 import pandas as pd
-import numpy as np
 import json
 import ast
+import os
+import sys
 from sklearn.cluster import DBSCAN
-from sklearn.metrics.pairwise import cosine_distances
 from collections import Counter
 from datetime import datetime
 
+# 군집화 공용 계산 모듈 (cluster/cluster_math.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cluster'))
+import cluster_math
+import embedding_snapshot
+import incident_representatives
+from embedding_store import EmbeddingStore
+
 DB_CONFIG = {
     "host": "localhost",
     "dbname": "postgres",
@@ -16,12 +24,6 @@ DB_CONFIG = {
     "port": "5432"
 }
 
-def parse_vector(val):
-    if isinstance(val, str):
-        try: return np.array(json.loads(val))
-        except: return np.zeros(768)
-    return np.array(val) if val is not None else np.zeros(768)
-
 def parse_keywords(val):
     if not val: return set()
     raw_set = set()
@@ -34,34 +36,6 @@ def parse_keywords(val):
         raw_set = set(val)
     return {word for word in raw_set if len(word) > 1}
 
-def calculate_hybrid_distance(vec1, vec2, kws1, kws2):
-    sem_dist = cosine_distances([vec1], [vec2])[0][0]
-    if not kws1 and not kws2: key_dist = 0.5
-    elif not kws1 or not kws2: key_dist = 1.0
-    else:
-        intersection = len(kws1.intersection(kws2))
-        union = len(kws1.union(kws2))
-        key_dist = 1.0 - (intersection / union if union > 0 else 0)
-        
-    return (sem_dist * 0.7) + (key_dist * 0.3)
-
-def calculate_jaccard_matrix(keywords_list):
-    n = len(keywords_list)
-    dist_matrix = np.ones((n, n))
-    for i in range(n):
-        for j in range(i, n):
-            set1 = keywords_list[i]
-            set2 = keywords_list[j]
-            if not set1 and not set2: dist = 0.5
-            elif not set1 or not set2: dist = 1.0 
-            else:
-                inter = len(set1.intersection(set2))
-                union = len(set1.union(set2))
-                dist = 1.0 - (inter / union if union else 0)
-            dist_matrix[i, j] = dist
-            dist_matrix[j, i] = dist
-    return dist_matrix
-
 def generate_title_only(group):
     sorted_group = group.sort_values('received_at')
     raw_summary = sorted_group.iloc[0]['core_request']
@@ -73,42 +47,45 @@ def get_representative_keyword(keywords_list):
     top_kw = Counter(all_kws).most_common(1)[0][0]
     return str(top_kw).replace('[','').replace(']','').replace("'","").strip()
 
-def run_incremental_clustering():
+def run_incremental_clustering(use_snapshot=False):
     conn = psycopg2.connect(**DB_CONFIG)
     cur = conn.cursor()
     print(f"🚀 [Upgrade] 부서 통합 & 중심점 고정(Anchoring) 로직 시작 ({datetime.now()})")
 
-    sql_active = """
-        SELECT c.incident_id, n.embedding, n.keywords_jsonb
-        FROM complaints c
-        JOIN complaint_normalizations n ON c.id = n.complaint_id
-        WHERE c.incident_id IS NOT NULL AND c.status != 'CLOSED' 
-    """
-    active_df = pd.read_sql(sql_active, conn)
-    active_df['vec'] = active_df['embedding'].apply(parse_vector)
-    active_df['kws'] = active_df['keywords_jsonb'].apply(parse_keywords)
-    
-    incident_centroids = {}
-    if not active_df.empty:
-        for iid, group in active_df.groupby('incident_id'):
-            mean_vec = np.mean(np.stack(group['vec'].values), axis=0)
-            all_kws = set().union(*group['kws'].tolist())
-            incident_centroids[iid] = {'vec': mean_vec, 'kws': all_kws, 'count': len(group)}
+    incident_representatives.ensure_schema(conn)
+    representatives = incident_representatives.load(conn)
+
+    incident_index = None
+    if representatives:
+        incident_index = cluster_math.CentroidIndex(
+            [row[0] for row in representatives],
+            EmbeddingStore([row[1] for row in representatives]).vectors,
+            [parse_keywords(row[2]) for row in representatives],
+            [row[3] for row in representatives],
+            alpha=0.7,
+            anchor_limit=10
+        )
             
-    print(f"   👉 활성화된 사건 {len(incident_centroids)}개 로드 완료.")
+    print(f"   👉 활성화된 사건 {len(incident_index) if incident_index else 0}개 로드 완료.")
 
     sql_new = """
-        SELECT c.id, c.created_at as received_at, n.embedding, n.keywords_jsonb, n.core_request
+        SELECT c.id, c.created_at as received_at, vector_send(n.embedding) AS embedding, n.keywords_jsonb, n.core_request
         FROM complaints c
         JOIN complaint_normalizations n ON c.id = n.complaint_id
         WHERE c.incident_id IS NULL AND n.embedding IS NOT NULL
     """
-    new_df = pd.read_sql(sql_new, conn)
+    if use_snapshot:
+        snapshot = embedding_snapshot.refresh(conn)
+        meta = snapshot.meta
+        new_df, embeddings = snapshot.select(meta['is_current'] & meta['incident_id'].isna() & meta['has_embedding'])
+        new_df = new_df.rename(columns={'complaint_id': 'id'})
+    else:
+        new_df = pd.read_sql(sql_new, conn)
     if new_df.empty:
         print("🎉 신규 민원 없음. 종료.")
         conn.close(); return
 
-    new_df['vec'] = new_df['embedding'].apply(parse_vector)
+    store = EmbeddingStore(embeddings) if use_snapshot else EmbeddingStore.from_values(new_df.pop('embedding'))
     new_df['kws'] = new_df['keywords_jsonb'].apply(parse_keywords)
 
     print(f"   👉 신규 민원 {len(new_df)}건 처리 시작 (부서 구분 없음)")
@@ -117,39 +94,19 @@ def run_incremental_clustering():
     unassigned_indices = []
     MATCH_THRESHOLD = 0.15 
 
-    for idx, row in new_df.iterrows():
-        vec = row['vec']
-        kws = row['kws']
-        
-        best_match_id = None
-        min_dist = 1.0
-        
-        for iid, info in incident_centroids.items():
-            dist = calculate_hybrid_distance(vec, info['vec'], kws, info['kws'])
-            if dist < min_dist:
-                min_dist = dist
-                best_match_id = iid
-        
-        if best_match_id and min_dist <= MATCH_THRESHOLD:
+    if incident_index:
+        matches = incident_index.match(store.vectors, new_df['kws'].tolist(), MATCH_THRESHOLD)
+    else:
+        matches = [(None, 1.0)] * len(new_df)
+
+    for (idx, row), (best_match_id, min_dist) in zip(new_df.iterrows(), matches):
+        if best_match_id is not None:
             cur.execute("UPDATE complaints SET incident_id = %s WHERE id = %s", (best_match_id, row['id']))
             cur.execute("""
                 UPDATE incidents 
                 SET complaint_count = complaint_count + 1, last_occurred = GREATEST(last_occurred, %s)
                 WHERE id = %s
             """, (row['received_at'], best_match_id))
-            
-            current_count = incident_centroids[best_match_id]['count']
-            
-            if current_count < 10:
-                prev_vec = incident_centroids[best_match_id]['vec']
-                new_n = current_count + 1
-                new_vec = (prev_vec * current_count + vec) / new_n
-                
-                incident_centroids[best_match_id]['vec'] = new_vec
-                incident_centroids[best_match_id]['count'] = new_n
-            else:
-                incident_centroids[best_match_id]['count'] += 1
-                
             assigned_count += 1
         else:
             unassigned_indices.append(idx)
@@ -160,15 +117,12 @@ def run_incremental_clustering():
     new_incidents_count = 0
 
     if not remaining_df.empty:
-        vectors = np.stack(remaining_df['vec'].values)
-        sem_dist = cosine_distances(vectors)
+        vectors = store.subset(unassigned_indices)
         kws_list = remaining_df['kws'].tolist()
-        key_dist = calculate_jaccard_matrix(kws_list)
-        
-        final_dist = (sem_dist * 0.7) + (key_dist * 0.3)
+        final_graph = cluster_math.hybrid_radius_graph(vectors, kws_list, eps=0.13, alpha=0.7, rule="incident")
         
         dbscan = DBSCAN(eps=0.13, min_samples=1, metric='precomputed')
-        labels = dbscan.fit_predict(final_dist)
+        labels = dbscan.fit_predict(final_graph)
         
         remaining_df['cluster_label'] = labels
         
@@ -196,4 +150,8 @@ def run_incremental_clustering():
     print(f"\n✅ [완료] 병합: {assigned_count}건 / 신규 생성: {new_incidents_count}개")
 
 if __name__ == "__main__":
-    run_incremental_clustering()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--snapshot", action="store_true", help="임베딩을 로컬 스냅샷에서 읽기 (cluster/embedding_snapshot.py)")
+    args = parser.parse_args()
+
+    run_incremental_clustering(use_snapshot=args.snapshot)
\ No newline at end of file